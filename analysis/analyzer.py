@@ -1,6 +1,8 @@
 """
 物件数据分析模块
-使用聚类分析、决策树等方法查找高分物件的特性
+使用聚类分析、决策树等方法查找高分物件的特性。
+预处理、反響分级、聚类、各模型是阶段图（analysis.stages）中的阶段，
+结果按数据哈希和参数缓存，同一数据上重复调用或只改参数时不再从头计算
 """
 import os
 import sys
@@ -23,6 +25,10 @@ from sklearn.metrics import classification_report, confusion_matrix
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.models import Property, get_session, get_engine
+from database.flags import FLAG_COLUMNS, flag_matrix
+from database.loader import apply_dtypes, load_properties
+from analysis.stages import StageGraph
+from config import ANALYSIS_CACHE_DIR, ANALYTICS_BACKEND, DUCKDB_SOURCE
 
 # 设置matplotlib中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
@@ -30,40 +36,420 @@ plt.rcParams['axes.unicode_minus'] = False
 
 warnings.filterwarnings('ignore')
 
+# 分析用到的列（数据库/Parquet只读取这些列）
+ANALYSIS_COLUMNS = [
+    'id', 'address_city', 'area_name', 'railway_line', 'station', 'walk_minutes',
+    'property_type', 'structure', 'total_floors', 'built_year', 'floor_plan', 'area_sqm',
+    'rent', 'management_fee', 'deposit_months', 'key_money_months',
+    'facility_flags', 'condition_flags', 'estimated_response',
+]
+
+
+def _preprocess(df: pd.DataFrame) -> Dict:
+    """
+    阶段 preprocessed：缺失值填充、位掩码展开、分类变量编码（在副本上修改，不改动输入）
+    Returns:
+        {'df', 'label_encoders', 'numeric_features', 'categorical_features'}
+    """
+    df = df.copy()
+
+    # 选择用于分析的特征
+    numeric_features = [
+        'walk_minutes', 'total_floors', 'built_year',
+        'area_sqm', 'rent', 'management_fee',
+        'estimated_response'
+    ]
+
+    categorical_features = [
+        'address_city', 'railway_line', 'station',
+        'property_type', 'structure', 'floor_plan'
+    ]
+
+    # 筛选存在的列
+    numeric_features = [f for f in numeric_features if f in df.columns]
+    categorical_features = [f for f in categorical_features if f in df.columns]
+
+    # 处理数值特征的缺失值（用中位数填充）
+    for col in numeric_features:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+        df[col] = df[col].fillna(df[col].median())
+
+    # 处理分类特征的缺失值（用众数填充）
+    for col in categorical_features:
+        fill = df[col].mode().iloc[0] if not df[col].mode().empty else 'Unknown'
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and fill not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([fill])
+        df[col] = df[col].fillna(fill)
+
+    # 設備/入居条件位掩码展开为0/1特征（只保留出现过的标签）
+    for col, kind in FLAG_COLUMNS.items():
+        if col in df.columns and df[col].notna().any():
+            flags = flag_matrix(df[col], kind)
+            df = df.join(flags.loc[:, flags.any()])
+
+    # 编码分类变量
+    label_encoders = {}
+    for col in categorical_features:
+        le = LabelEncoder()
+        df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
+        label_encoders[col] = le
+
+    return {'df': df, 'label_encoders': label_encoders,
+            'numeric_features': numeric_features, 'categorical_features': categorical_features}
+
+
+def _response_categories(pre: Dict) -> Optional[Dict]:
+    """
+    阶段 categories：推定反響数分级
+    高分: 30+件/月，中高: 20-29件/月，中等: 10-19件/月，低分: <10件/月
+    Returns:
+        {'response_category', 'response_category_encoded', 'encoder'}；没有 estimated_response 时为None
+    """
+    df = pre['df']
+    if 'estimated_response' not in df.columns:
+        return None
+    response = df['estimated_response']
+    category = pd.Series(np.select(
+        [response.isna(), response >= 30, response >= 20, response >= 10],
+        ['Unknown', 'High', 'Medium-High', 'Medium'], 'Low'
+    ), index=df.index, dtype=object)
+
+    le = LabelEncoder()
+    encoded = pd.Series(le.fit_transform(category), index=df.index)
+    return {'response_category': category, 'response_category_encoded': encoded, 'encoder': le}
+
+
+def _cluster(pre: Dict, n_clusters: int) -> Optional[Dict]:
+    """
+    阶段 clusters：K-Means聚类
+    Returns:
+        {'features', 'labels', 'centers', 'scaler'}；可用特征不足2个时为None
+    """
+    df = pre['df']
+    potential_features = [
+        'walk_minutes', 'area_sqm', 'rent', 'built_year',
+        'address_city_encoded', 'floor_plan_encoded'
+    ]
+    cluster_features = [f for f in potential_features if f in df.columns and df[f].notna().sum() > 0]
+    if len(cluster_features) < 2:
+        return None
+
+    # 准备数据（只取聚类列，不复制整张表）
+    X = df[cluster_features]
+    X = X.fillna(X.median())
+
+    # 标准化
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    # 执行聚类
+    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    labels = pd.Series(kmeans.fit_predict(X_scaled), index=df.index)
+    return {'features': cluster_features, 'labels': labels, 'centers': kmeans.cluster_centers_,
+            'scaler': scaler}
+
+
+# 多分类模型（决策树/随机森林）的候选特征
+CLASSIFIER_FEATURES = [
+    'walk_minutes', 'area_sqm', 'rent', 'built_year',
+    'management_fee', 'total_floors',
+    'address_city_encoded', 'floor_plan_encoded',
+    'railway_line_encoded', 'structure_encoded'
+]
+
+
+def _classifier_features(df: pd.DataFrame, candidates) -> List[str]:
+    """非空值超过一半的候选特征"""
+    return [f for f in candidates if f in df.columns and df[f].notna().sum() > len(df) * 0.5]
+
+
+def _decision_tree(pre: Dict, categories: Optional[Dict]) -> Optional[Dict]:
+    """
+    阶段 decision_tree：按反響分级训练决策树
+    Returns:
+        {'model', 'feature_cols', 'importance', 'train_score', 'test_score', 'cv_scores'}；
+        特征不足或没有目标变量时为None
+    """
+    df = pre['df']
+    feature_cols = _classifier_features(df, CLASSIFIER_FEATURES)
+    if len(feature_cols) < 2 or categories is None:
+        return None
+
+    X = df[feature_cols].fillna(0)
+    y = categories['response_category_encoded']
+
+    # 分割数据
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # 训练决策树
+    dt = DecisionTreeClassifier(
+        max_depth=5,
+        min_samples_split=10,
+        min_samples_leaf=5,
+        random_state=42
+    )
+    dt.fit(X_train, y_train)
+
+    return {
+        'model': dt,
+        'feature_cols': feature_cols,
+        'importance': dict(zip(feature_cols, dt.feature_importances_)),
+        'train_score': dt.score(X_train, y_train),
+        'test_score': dt.score(X_test, y_test),
+        # 交叉验证
+        'cv_scores': cross_val_score(dt, X, y, cv=5),
+    }
+
+
+# 二分类决策树的候选特征（可视化用的中文名称）
+BINARY_TREE_FEATURES = {
+    'walk_minutes': '駅徒歩(分)',
+    'area_sqm': '面積(㎡)',
+    'rent': '賃料(円)',
+    'built_year': '築年',
+    'management_fee': '管理費',
+    'total_floors': '総階数',
+    'address_city_encoded': '区域',
+    'floor_plan_encoded': '間取り',
+}
+
+
+def _binary_tree(pre: Dict, threshold: float) -> Dict:
+    """
+    阶段 binary_tree：高反響（>=threshold）/低反響二分类决策树
+    Returns:
+        {'model', 'feature_names', 'results', 'report'}；特征不足时 model 为None，results 只有类别分布
+    """
+    df = pre['df']
+
+    # 二分类目标变量
+    y = (df['estimated_response'] >= threshold).astype(int)
+    high_count = int(y.sum())
+    low_count = len(df) - high_count
+    output = {'model': None, 'feature_names': [], 'report': '',
+              'results': {'threshold': threshold, 'high_response_count': high_count,
+                          'low_response_count': low_count}}
+
+    feature_cols = _classifier_features(df, BINARY_TREE_FEATURES)
+    if len(feature_cols) < 2:
+        return output
+    feature_names = [BINARY_TREE_FEATURES[f] for f in feature_cols]
+
+    X = df[feature_cols].fillna(0)
+
+    # 分割数据
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    # 训练决策树（限制深度便于可视化）
+    dt = DecisionTreeClassifier(
+        max_depth=4,
+        min_samples_split=50,
+        min_samples_leaf=20,
+        random_state=42,
+        class_weight='balanced'  # 处理类别不平衡
+    )
+    dt.fit(X_train, y_train)
+
+    y_pred = dt.predict(X_test)
+    cv_scores = cross_val_score(dt, X, y, cv=5, scoring='accuracy')
+
+    output.update(model=dt, feature_names=feature_names,
+                  report=classification_report(y_test, y_pred, target_names=['低反響', '高反響']))
+    output['results'] = {
+        'threshold': threshold,
+        'train_accuracy': dt.score(X_train, y_train),
+        'test_accuracy': dt.score(X_test, y_test),
+        'cv_accuracy_mean': cv_scores.mean(),
+        'cv_accuracy_std': cv_scores.std(),
+        'feature_importance': dict(zip(feature_names, dt.feature_importances_)),
+        'confusion_matrix': confusion_matrix(y_test, y_pred).tolist(),
+        'high_response_count': high_count,
+        'low_response_count': low_count
+    }
+    return output
+
+
+def _random_forest(pre: Dict, categories: Optional[Dict]) -> Optional[Dict]:
+    """
+    阶段 random_forest：按反響分级训练随机森林
+    Returns:
+        {'model', 'feature_cols', 'importance', 'train_score', 'test_score'}；特征不足时为None
+    """
+    df = pre['df']
+    feature_cols = _classifier_features(df, CLASSIFIER_FEATURES)
+    if len(feature_cols) < 2 or categories is None:
+        return None
+
+    X = df[feature_cols].fillna(0)
+    y = categories['response_category_encoded']
+
+    # 分割数据
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # 训练随机森林
+    rf = RandomForestClassifier(
+        n_estimators=100,
+        max_depth=10,
+        min_samples_split=10,
+        random_state=42
+    )
+    rf.fit(X_train, y_train)
+
+    return {
+        'model': rf,
+        'feature_cols': feature_cols,
+        'importance': dict(zip(feature_cols, rf.feature_importances_)),
+        'train_score': rf.score(X_train, y_train),
+        'test_score': rf.score(X_test, y_test),
+    }
+
+
+def _high_response(pre: Dict) -> Dict:
+    """阶段 high_response：高反响物件（20件以上/月）与全体的对比"""
+    df = pre['df']
+    high_response = df[df['estimated_response'] >= 20] if 'estimated_response' in df.columns else df
+    all_properties = df
+
+    insights = {
+        'high_response_count': len(high_response),
+        'total_count': len(all_properties),
+        'features': {}
+    }
+    if len(high_response) == 0:
+        return insights
+
+    # 分析各特征
+    numeric_cols = ['walk_minutes', 'area_sqm', 'rent', 'built_year', 'management_fee']
+    categorical_cols = ['address_city', 'floor_plan', 'railway_line', 'station']
+
+    for col in numeric_cols:
+        if col in df.columns and df[col].notna().sum() > 0:
+            high_mean = high_response[col].mean()
+            all_mean = all_properties[col].mean()
+            diff_pct = (high_mean - all_mean) / all_mean * 100 if all_mean != 0 else 0
+
+            insights['features'][col] = {
+                'high_response_mean': high_mean,
+                'all_mean': all_mean,
+                'diff_percent': diff_pct
+            }
+
+    for col in categorical_cols:
+        if col in df.columns and df[col].notna().sum() > 0:
+            # 高反响物件的分布
+            high_dist = high_response[col].value_counts(normalize=True).head(5)
+            all_dist = all_properties[col].value_counts(normalize=True).head(5)
+
+            insights['features'][col] = {
+                'high_response_top5': high_dist.to_dict(),
+                'all_top5': all_dist.to_dict()
+            }
+
+    return insights
+
+
+def build_stage_graph(cache_dir: Optional[str] = ANALYSIS_CACHE_DIR) -> StageGraph:
+    """
+    分析流程的阶段图（根输入 data 为加载的物件数据）:
+    data -> preprocessed -> categories / clusters(n_clusters) / binary_tree(threshold) / high_response
+    preprocessed + categories -> decision_tree / random_forest
+    """
+    graph = StageGraph(cache_dir)
+    graph.add('preprocessed', _preprocess, inputs=['data'])
+    graph.add('categories', _response_categories, inputs=['preprocessed'])
+    graph.add('clusters', _cluster, inputs=['preprocessed'], params={'n_clusters': 4})
+    graph.add('decision_tree', _decision_tree, inputs=['preprocessed', 'categories'])
+    graph.add('binary_tree', _binary_tree, inputs=['preprocessed'], params={'threshold': 5.0})
+    graph.add('random_forest', _random_forest, inputs=['preprocessed', 'categories'])
+    graph.add('high_response', _high_response, inputs=['preprocessed'])
+    return graph
+
 
 class PropertyAnalyzer:
     """物件数据分析类"""
 
-    def __init__(self):
-        """初始化分析器"""
+    def __init__(self, backend: Optional[str] = None, duckdb_source: Optional[str] = None,
+                 cache_dir: Optional[str] = ANALYSIS_CACHE_DIR):
+        """
+        初始化分析器
+        Args:
+            backend: 分组统计的后端 pandas / duckdb，默认 config.ANALYTICS_BACKEND
+            duckdb_source: duckdb读取的数据源 sqlite / parquet，默认 config.DUCKDB_SOURCE
+            cache_dir: 各阶段结果的磁盘缓存目录，None时只缓存在内存中
+        """
+        self.backend = backend or ANALYTICS_BACKEND
+        if self.backend not in ('pandas', 'duckdb'):
+            raise ValueError(f"未知的分析后端: {self.backend}（pandas / duckdb）")
+        self.duckdb_source = duckdb_source or DUCKDB_SOURCE
+        self._duck = None
         self.session = get_session()
         self.df: Optional[pd.DataFrame] = None
         self.df_processed: Optional[pd.DataFrame] = None
         self.label_encoders: Dict[str, LabelEncoder] = {}
         self.scaler = StandardScaler()
+        self.graph = build_stage_graph(cache_dir)
+
+    @property
+    def duck(self):
+        """DuckDB后端（首次使用时连接）"""
+        if self._duck is None:
+            from analysis.duckdb_backend import DuckDBBackend
+            self._duck = DuckDBBackend(source=self.duckdb_source)
+        return self._duck
+
+    def response_by(self, dimension: str) -> pd.Series:
+        """按分组列的平均推定反響数（降序）"""
+        if self.backend == 'duckdb':
+            result = self.duck.response_by(dimension)
+            return result.set_index(dimension)['mean'].rename('estimated_response')
+        if self.df_processed is None:
+            self.preprocess_data()
+        return (self.df_processed.groupby(dimension, observed=True)['estimated_response']
+                .mean().sort_values(ascending=False))
 
-    def load_data(self) -> pd.DataFrame:
+    def load_data(self, columns: Optional[List[str]] = None, where=None) -> pd.DataFrame:
         """
-        从数据库加载数据
+        从数据库加载数据（只查询需要的列，分类列为category）
+        Args:
+            columns: 需要的列，默认 ANALYSIS_COLUMNS
+            where: SQLAlchemy条件，如 Property.area_name == '新宿区'
         Returns:
             物件数据DataFrame
         """
         print("正在从数据库加载数据...")
-        properties = self.session.query(Property).all()
+        self.df = load_properties(columns or ANALYSIS_COLUMNS, where=where)
 
-        if not properties:
+        if self.df.empty:
             print("数据库中没有数据，请先运行爬虫抓取数据")
-            return pd.DataFrame()
-
-        # 转换为DataFrame
-        data = [prop.to_dict() for prop in properties]
-        self.df = pd.DataFrame(data)
+            return self.df
 
         print(f"加载了 {len(self.df)} 条物件数据")
         print(f"数据列: {list(self.df.columns)}")
 
         return self.df
 
+    def load_from_parquet(self, columns: Optional[List[str]] = None,
+                          filters: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        从Parquet快照加载数据（python main.py export 导出），不读取正在写入的数据库
+        Args:
+            columns: 需要的列，默认 ANALYSIS_COLUMNS
+            filters: 分区列条件，如 {'area_name': ['新宿区', '渋谷区']}
+        Returns:
+            物件数据DataFrame
+        """
+        from database.export import load_parquet
+
+        self.df = apply_dtypes(load_parquet(columns or ANALYSIS_COLUMNS, filters=filters))
+        print(f"从Parquet快照加载了 {len(self.df)} 条物件数据")
+        return self.df
+
     def load_from_csv(self, filepath: str) -> pd.DataFrame:
         """
         从CSV文件加载数据（用于测试）
@@ -89,49 +475,18 @@ class PropertyAnalyzer:
             raise ValueError("请先加载数据")
 
         print("\n开始数据预处理...")
-        df = self.df.copy()
-
-        # 选择用于分析的特征
-        numeric_features = [
-            'walk_minutes', 'total_floors', 'built_year',
-            'area_sqm', 'rent', 'management_fee',
-            'estimated_response'
-        ]
-
-        categorical_features = [
-            'address_city', 'railway_line', 'station',
-            'property_type', 'structure', 'floor_plan'
-        ]
-
-        # 筛选存在的列
-        numeric_features = [f for f in numeric_features if f in df.columns]
-        categorical_features = [f for f in categorical_features if f in df.columns]
-
-        print(f"数值特征: {numeric_features}")
-        print(f"分类特征: {categorical_features}")
-
-        # 处理数值特征的缺失值（用中位数填充）
-        for col in numeric_features:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                df[col] = df[col].fillna(df[col].median())
-
-        # 处理分类特征的缺失值（用众数填充）
-        for col in categorical_features:
-            if col in df.columns:
-                df[col] = df[col].fillna(df[col].mode().iloc[0] if not df[col].mode().empty else 'Unknown')
-
-        # 编码分类变量
-        for col in categorical_features:
-            if col in df.columns:
-                le = LabelEncoder()
-                df[f'{col}_encoded'] = le.fit_transform(df[col].astype(str))
-                self.label_encoders[col] = le
-
-        self.df_processed = df
+        self.graph.set_input('data', self.df)
+        pre = self.graph.run('preprocessed')
+
+        print(f"数值特征: {pre['numeric_features']}")
+        print(f"分类特征: {pre['categorical_features']}")
+
+        self.label_encoders.update(pre['label_encoders'])
+        # 浅复制：之后只在上面追加列（反響分级/聚类标签），不改动阶段缓存中的结果
+        self.df_processed = pre['df'].copy(deep=False)
         print("数据预处理完成")
 
-        return df
+        return self.df_processed
 
     def create_response_categories(self) -> pd.DataFrame:
         """
@@ -141,38 +496,15 @@ class PropertyAnalyzer:
         if self.df_processed is None:
             self.preprocess_data()
 
-        df = self.df_processed.copy()
-
-        if 'estimated_response' not in df.columns:
+        categories = self.graph.run('categories')
+        if categories is None:
             print("警告：数据中没有 estimated_response 列")
-            return df
-
-        # 根据推定反響数分类
-        # 高分: 30+件/月
-        # 中高: 20-29件/月
-        # 中等: 10-19件/月
-        # 低分: <10件/月
-        def categorize_response(x):
-            if pd.isna(x):
-                return 'Unknown'
-            elif x >= 30:
-                return 'High'
-            elif x >= 20:
-                return 'Medium-High'
-            elif x >= 10:
-                return 'Medium'
-            else:
-                return 'Low'
-
-        df['response_category'] = df['estimated_response'].apply(categorize_response)
-
-        # 编码分类
-        le = LabelEncoder()
-        df['response_category_encoded'] = le.fit_transform(df['response_category'])
-        self.label_encoders['response_category'] = le
+            return self.df_processed
 
-        self.df_processed = df
-        return df
+        for col in ('response_category', 'response_category_encoded'):
+            self.df_processed[col] = categories[col]
+        self.label_encoders['response_category'] = categories['encoder']
+        return self.df_processed
 
     def perform_clustering(self, n_clusters: int = 4) -> Tuple[pd.DataFrame, np.ndarray]:
         """
@@ -187,35 +519,15 @@ class PropertyAnalyzer:
         if self.df_processed is None:
             self.preprocess_data()
 
-        df = self.df_processed.copy()
-
-        # 选择聚类特征
-        cluster_features = []
-        potential_features = [
-            'walk_minutes', 'area_sqm', 'rent', 'built_year',
-            'address_city_encoded', 'floor_plan_encoded'
-        ]
-
-        for f in potential_features:
-            if f in df.columns and df[f].notna().sum() > 0:
-                cluster_features.append(f)
-
-        if len(cluster_features) < 2:
+        result = self.graph.run('clusters', n_clusters=n_clusters)
+        if result is None:
             print("特征不足，无法进行聚类分析")
-            return df, np.array([])
-
-        print(f"聚类特征: {cluster_features}")
-
-        # 准备数据
-        X = df[cluster_features].copy()
-        X = X.fillna(X.median())
-
-        # 标准化
-        X_scaled = self.scaler.fit_transform(X)
+            return self.df_processed, np.array([])
 
-        # 执行聚类
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        df['cluster'] = kmeans.fit_predict(X_scaled)
+        print(f"聚类特征: {result['features']}")
+        self.scaler = result['scaler']
+        df = self.df_processed
+        df['cluster'] = result['labels']
 
         # 分析每个聚类
         print("\n聚类分析结果:")
@@ -235,8 +547,7 @@ class PropertyAnalyzer:
             if 'walk_minutes' in df.columns:
                 print(f"  平均徒歩分数: {cluster_data['walk_minutes'].mean():.1f} 分")
 
-        self.df_processed = df
-        return df, kmeans.cluster_centers_
+        return df, result['centers']
 
     def build_decision_tree(self) -> Tuple[DecisionTreeClassifier, Dict]:
         """
@@ -251,64 +562,30 @@ class PropertyAnalyzer:
             self.preprocess_data()
 
         self.create_response_categories()
-        df = self.df_processed.copy()
-
-        # 准备特征
-        feature_cols = []
-        potential_features = [
-            'walk_minutes', 'area_sqm', 'rent', 'built_year',
-            'management_fee', 'total_floors',
-            'address_city_encoded', 'floor_plan_encoded',
-            'railway_line_encoded', 'structure_encoded'
-        ]
-
-        for f in potential_features:
-            if f in df.columns and df[f].notna().sum() > len(df) * 0.5:
-                feature_cols.append(f)
-
-        if len(feature_cols) < 2 or 'response_category_encoded' not in df.columns:
+        result = self.graph.run('decision_tree')
+        if result is None:
             print("特征不足或目标变量缺失，无法构建决策树")
             return None, {}
 
-        print(f"使用特征: {feature_cols}")
-
-        # 准备数据
-        X = df[feature_cols].fillna(0)
-        y = df['response_category_encoded']
-
-        # 分割数据
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-
-        # 训练决策树
-        dt = DecisionTreeClassifier(
-            max_depth=5,
-            min_samples_split=10,
-            min_samples_leaf=5,
-            random_state=42
-        )
-        dt.fit(X_train, y_train)
+        print(f"使用特征: {result['feature_cols']}")
 
         # 评估模型
-        train_score = dt.score(X_train, y_train)
-        test_score = dt.score(X_test, y_test)
         print(f"\n模型评估:")
-        print(f"  训练集准确率: {train_score:.3f}")
-        print(f"  测试集准确率: {test_score:.3f}")
+        print(f"  训练集准确率: {result['train_score']:.3f}")
+        print(f"  测试集准确率: {result['test_score']:.3f}")
 
         # 特征重要性
-        feature_importance = dict(zip(feature_cols, dt.feature_importances_))
+        feature_importance = result['importance']
         print("\n特征重要性排序:")
         for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
             if importance > 0.01:
                 print(f"  {feature}: {importance:.3f}")
 
         # 交叉验证
-        cv_scores = cross_val_score(dt, X, y, cv=5)
+        cv_scores = result['cv_scores']
         print(f"\n交叉验证得分: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
 
-        return dt, feature_importance
+        return result['model'], feature_importance
 
     def build_binary_classification_tree(self, threshold: float = 5.0) -> Tuple[DecisionTreeClassifier, Dict]:
         """
@@ -325,96 +602,48 @@ class PropertyAnalyzer:
         if self.df_processed is None:
             self.preprocess_data()
 
-        df = self.df_processed.copy()
-
-        if 'estimated_response' not in df.columns:
+        if 'estimated_response' not in self.df_processed.columns:
             print("警告：数据中没有 estimated_response 列")
             return None, {}
 
-        # 创建二分类目标变量
-        df['is_high_response'] = (df['estimated_response'] >= threshold).astype(int)
+        output = self.graph.run('binary_tree', threshold=threshold)
+        results = output['results']
 
         # 统计类别分布
-        high_count = df['is_high_response'].sum()
-        low_count = len(df) - high_count
-        print(f"高反響物件: {high_count} ({high_count/len(df)*100:.1f}%)")
-        print(f"低反響物件: {low_count} ({low_count/len(df)*100:.1f}%)")
-
-        # 准备特征
-        feature_cols = []
-        feature_names = []  # 用于可视化的中文名称
-        potential_features = {
-            'walk_minutes': '駅徒歩(分)',
-            'area_sqm': '面積(㎡)',
-            'rent': '賃料(円)',
-            'built_year': '築年',
-            'management_fee': '管理費',
-            'total_floors': '総階数',
-            'address_city_encoded': '区域',
-            'floor_plan_encoded': '間取り',
-        }
-
-        for f, name in potential_features.items():
-            if f in df.columns and df[f].notna().sum() > len(df) * 0.5:
-                feature_cols.append(f)
-                feature_names.append(name)
-
-        if len(feature_cols) < 2:
+        high_count, low_count = results['high_response_count'], results['low_response_count']
+        total = high_count + low_count
+        print(f"高反響物件: {high_count} ({high_count/total*100:.1f}%)")
+        print(f"低反響物件: {low_count} ({low_count/total*100:.1f}%)")
+
+        dt = output['model']
+        if dt is None:
             print("特征不足，无法构建决策树")
             return None, {}
 
+        feature_names = output['feature_names']
         print(f"使用特征: {feature_names}")
 
-        # 准备数据
-        X = df[feature_cols].fillna(0)
-        y = df['is_high_response']
-
-        # 分割数据
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
-
-        # 训练决策树（限制深度便于可视化）
-        dt = DecisionTreeClassifier(
-            max_depth=4,
-            min_samples_split=50,
-            min_samples_leaf=20,
-            random_state=42,
-            class_weight='balanced'  # 处理类别不平衡
-        )
-        dt.fit(X_train, y_train)
-
-        # 评估模型
-        train_score = dt.score(X_train, y_train)
-        test_score = dt.score(X_test, y_test)
-
-        # 预测并生成分类报告
-        y_pred = dt.predict(X_test)
-
         print(f"\n===== 模型评估结果 =====")
-        print(f"训练集准确率: {train_score:.1%}")
-        print(f"测试集准确率: {test_score:.1%}")
+        print(f"训练集准确率: {results['train_accuracy']:.1%}")
+        print(f"测试集准确率: {results['test_accuracy']:.1%}")
 
         print(f"\n分类报告:")
-        print(classification_report(y_test, y_pred, target_names=['低反響', '高反響']))
+        print(output['report'])
 
         # 混淆矩阵
-        cm = confusion_matrix(y_test, y_pred)
+        cm = results['confusion_matrix']
         print(f"\n混淆矩阵:")
         print(f"              预测低反響  预测高反響")
         print(f"实际低反響      {cm[0][0]:5d}      {cm[0][1]:5d}")
         print(f"实际高反響      {cm[1][0]:5d}      {cm[1][1]:5d}")
 
         # 特征重要性
-        feature_importance = dict(zip(feature_names, dt.feature_importances_))
         print("\n特征重要性排序:")
-        for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
+        for feature, importance in sorted(results['feature_importance'].items(), key=lambda x: x[1], reverse=True):
             if importance > 0.01:
                 print(f"  {feature}: {importance:.1%}")
 
-        # 交叉验证
-        cv_scores = cross_val_score(dt, X, y, cv=5, scoring='accuracy')
-        print(f"\n5折交叉验证准确率: {cv_scores.mean():.1%} (+/- {cv_scores.std() * 2:.1%})")
+        print(f"\n5折交叉验证准确率: {results['cv_accuracy_mean']:.1%} (+/- {results['cv_accuracy_std'] * 2:.1%})")
 
         # 可视化决策树
         output_dir = "data/analysis"
@@ -435,19 +664,6 @@ class PropertyAnalyzer:
         plt.close()
         print(f"\n决策树图已保存: {tree_path}")
 
-        # 保存评估结果
-        results = {
-            'threshold': threshold,
-            'train_accuracy': train_score,
-            'test_accuracy': test_score,
-            'cv_accuracy_mean': cv_scores.mean(),
-            'cv_accuracy_std': cv_scores.std(),
-            'feature_importance': feature_importance,
-            'confusion_matrix': cm.tolist(),
-            'high_response_count': high_count,
-            'low_response_count': low_count
-        }
-
         return dt, results
 
     def build_random_forest(self) -> Tuple[RandomForestClassifier, Dict]:
@@ -462,58 +678,24 @@ class PropertyAnalyzer:
             self.preprocess_data()
 
         self.create_response_categories()
-        df = self.df_processed.copy()
-
-        # 准备特征
-        feature_cols = []
-        potential_features = [
-            'walk_minutes', 'area_sqm', 'rent', 'built_year',
-            'management_fee', 'total_floors',
-            'address_city_encoded', 'floor_plan_encoded',
-            'railway_line_encoded', 'structure_encoded'
-        ]
-
-        for f in potential_features:
-            if f in df.columns and df[f].notna().sum() > len(df) * 0.5:
-                feature_cols.append(f)
-
-        if len(feature_cols) < 2 or 'response_category_encoded' not in df.columns:
+        result = self.graph.run('random_forest')
+        if result is None:
             print("特征不足，无法构建随机森林")
             return None, {}
 
-        # 准备数据
-        X = df[feature_cols].fillna(0)
-        y = df['response_category_encoded']
-
-        # 分割数据
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-
-        # 训练随机森林
-        rf = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=10,
-            random_state=42
-        )
-        rf.fit(X_train, y_train)
-
         # 评估
-        train_score = rf.score(X_train, y_train)
-        test_score = rf.score(X_test, y_test)
         print(f"\n模型评估:")
-        print(f"  训练集准确率: {train_score:.3f}")
-        print(f"  测试集准确率: {test_score:.3f}")
+        print(f"  训练集准确率: {result['train_score']:.3f}")
+        print(f"  测试集准确率: {result['test_score']:.3f}")
 
         # 特征重要性
-        feature_importance = dict(zip(feature_cols, rf.feature_importances_))
+        feature_importance = result['importance']
         print("\n特征重要性排序:")
         for feature, importance in sorted(feature_importance.items(), key=lambda x: x[1], reverse=True):
             if importance > 0.01:
                 print(f"  {feature}: {importance:.3f}")
 
-        return rf, feature_importance
+        return result['model'], feature_importance
 
     def analyze_high_response_properties(self) -> Dict:
         """
@@ -523,68 +705,41 @@ class PropertyAnalyzer:
         """
         print("\n分析高反响物件特征...")
 
-        if self.df_processed is None:
-            self.preprocess_data()
+        if self.backend == 'duckdb':
+            insights = self.duck.high_response_insights()
+        else:
+            insights = self._high_response_insights()
 
-        self.create_response_categories()
-        df = self.df_processed.copy()
-
-        # 筛选高反响物件（20件以上/月）
-        high_response = df[df['estimated_response'] >= 20] if 'estimated_response' in df.columns else df
-        all_properties = df
-
-        if len(high_response) == 0:
+        if not insights.get('high_response_count'):
             print("没有高反响物件数据")
             return {}
 
-        print(f"\n高反响物件数量: {len(high_response)} / {len(all_properties)} ({len(high_response)/len(all_properties)*100:.1f}%)")
-
-        insights = {
-            'high_response_count': len(high_response),
-            'total_count': len(all_properties),
-            'features': {}
-        }
-
-        # 分析各特征
-        numeric_cols = ['walk_minutes', 'area_sqm', 'rent', 'built_year', 'management_fee']
-        categorical_cols = ['address_city', 'floor_plan', 'railway_line', 'station']
+        high_count, total = insights['high_response_count'], insights['total_count']
+        print(f"\n高反响物件数量: {high_count} / {total} ({high_count/total*100:.1f}%)")
 
         print("\n--- 数值特征对比 ---")
-        for col in numeric_cols:
-            if col in df.columns and df[col].notna().sum() > 0:
-                high_mean = high_response[col].mean()
-                all_mean = all_properties[col].mean()
-                diff_pct = (high_mean - all_mean) / all_mean * 100 if all_mean != 0 else 0
-
-                insights['features'][col] = {
-                    'high_response_mean': high_mean,
-                    'all_mean': all_mean,
-                    'diff_percent': diff_pct
-                }
-
+        for col, data in insights['features'].items():
+            if 'diff_percent' in data:
                 print(f"\n{col}:")
-                print(f"  高反响物件平均: {high_mean:.2f}")
-                print(f"  全体平均: {all_mean:.2f}")
-                print(f"  差异: {diff_pct:+.1f}%")
+                print(f"  高反响物件平均: {data['high_response_mean']:.2f}")
+                print(f"  全体平均: {data['all_mean']:.2f}")
+                print(f"  差异: {data['diff_percent']:+.1f}%")
 
         print("\n--- 分类特征分布 ---")
-        for col in categorical_cols:
-            if col in df.columns and df[col].notna().sum() > 0:
-                # 高反响物件的分布
-                high_dist = high_response[col].value_counts(normalize=True).head(5)
-                all_dist = all_properties[col].value_counts(normalize=True).head(5)
-
-                insights['features'][col] = {
-                    'high_response_top5': high_dist.to_dict(),
-                    'all_top5': all_dist.to_dict()
-                }
-
+        for col, data in insights['features'].items():
+            if 'high_response_top5' in data:
                 print(f"\n{col} (高反响物件 Top 5):")
-                for val, pct in high_dist.items():
+                for val, pct in data['high_response_top5'].items():
                     print(f"  {val}: {pct*100:.1f}%")
 
         return insights
 
+    def _high_response_insights(self) -> Dict:
+        """pandas后端：在预处理后的数据上对比高反响物件与全体"""
+        if self.df_processed is None:
+            self.preprocess_data()
+        return self.graph.run('high_response')
+
     def visualize_results(self, output_dir: str = "data/analysis"):
         """
         生成可视化图表
@@ -596,7 +751,8 @@ class PropertyAnalyzer:
         if self.df_processed is None:
             self.preprocess_data()
 
-        df = self.df_processed.copy()
+        # 只读取，不修改
+        df = self.df_processed
 
         # 1. 推定反響数分布
         if 'estimated_response' in df.columns:
@@ -645,7 +801,7 @@ class PropertyAnalyzer:
         # 5. 区域别反響数
         if 'address_city' in df.columns and 'estimated_response' in df.columns:
             plt.figure(figsize=(14, 8))
-            area_response = df.groupby('address_city')['estimated_response'].mean().sort_values(ascending=False)
+            area_response = self.response_by('address_city')
             area_response.head(20).plot(kind='bar')
             plt.xlabel('市区町村')
             plt.ylabel('平均推定反響数（件/月）')
@@ -659,7 +815,7 @@ class PropertyAnalyzer:
         # 6. 間取り别反響数
         if 'floor_plan' in df.columns and 'estimated_response' in df.columns:
             plt.figure(figsize=(12, 6))
-            layout_response = df.groupby('floor_plan')['estimated_response'].mean().sort_values(ascending=False)
+            layout_response = self.response_by('floor_plan')
             layout_response.head(15).plot(kind='bar')
             plt.xlabel('間取り')
             plt.ylabel('平均推定反響数（件/月）')
@@ -831,6 +987,8 @@ class PropertyAnalyzer:
         # 9. 生成报告
         self.generate_report()
 
+        print("\n阶段执行记录:")
+        print(self.graph.summary())
         print("\n分析完成!")
 
 
@@ -0,0 +1,241 @@
+"""
+DuckDB 分析后端（可选）
+直接读取SQLite数据库或Parquet快照，把分析器中的分组统计（区域/間取り别反響数、
+高反響物件占比与特征对比、特征统计）作为向量化SQL执行，不再先把全表读入pandas。
+缺失值的填充与 PropertyAnalyzer.preprocess_data 相同（数值→中位数、分类→众数），两个后端的结果可直接比较。
+用法: python -m analysis.duckdb_backend [--source parquet] [--compare]
+"""
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy.engine import make_url
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATABASE_URL, DUCKDB_SOURCE, PARQUET_DIR
+from database.export import LIVE_IDS_FILE
+
+try:
+    import duckdb
+except ImportError:  # duckdb为可选依赖，只有 ANALYTICS_BACKEND=duckdb 时需要
+    duckdb = None
+
+
+# 高反響物件的阈值（件/月，与 analyze_high_response_properties 一致）
+HIGH_RESPONSE_THRESHOLD = 20
+
+NUMERIC_COLUMNS = ['walk_minutes', 'area_sqm', 'rent', 'built_year', 'management_fee']
+CATEGORICAL_COLUMNS = ['address_city', 'floor_plan', 'railway_line', 'station']
+
+# SQLite扩展不可用（离线环境无法INSTALL）时，通过loader读取到DuckDB的列
+FALLBACK_COLUMNS = ['id', 'area_name', 'property_type', 'total_floors', 'estimated_response',
+                    'deposit_months', 'key_money_months'] + NUMERIC_COLUMNS + CATEGORICAL_COLUMNS
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise RuntimeError("DuckDB分析后端需要安装 duckdb（pip install duckdb）")
+
+
+class DuckDBBackend:
+    """DuckDB上的 properties 视图和分析查询"""
+
+    def __init__(self, source: str = DUCKDB_SOURCE, database_url: str = DATABASE_URL,
+                 root: str = PARQUET_DIR):
+        """
+        Args:
+            source: 'sqlite'（直接读取数据库文件）或 'parquet'（读取导出的快照）
+            database_url: SQLite数据库URL
+            root: Parquet数据集目录
+        """
+        _require_duckdb()
+        self.source = source
+        self.con = duckdb.connect()
+        if source == 'parquet':
+            self._attach_parquet(root)
+        elif source == 'sqlite':
+            self._attach_sqlite(database_url)
+        else:
+            raise ValueError(f"未知的数据源: {source}（sqlite / parquet）")
+        self._create_analysis_view()
+
+    def _attach_parquet(self, root: str):
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Parquet数据集不存在: {root}（先运行 python main.py export）")
+        # 只读分区目录中的文件（根目录下的 _live_ids.parquet 不是数据）
+        pattern = os.path.join(root, 'scrape_date=*', 'area_name=*', '*.parquet').replace("'", "''")
+        live_ids = os.path.join(root, LIVE_IDS_FILE)
+        where = ''
+        if os.path.exists(live_ids):
+            # 已从数据库删除的物件（不在上次导出的id列表中）去掉
+            live_ids = live_ids.replace("'", "''")
+            where = f"WHERE id IN (SELECT id FROM read_parquet('{live_ids}'))"
+        # 同一物件的多个版本取最新一版；空值分区目录名为 unknown
+        self.con.execute(f'''
+            CREATE VIEW properties AS
+            SELECT * EXCLUDE (scrape_date) REPLACE (NULLIF(area_name, 'unknown') AS area_name)
+            FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)
+            {where}
+            QUALIFY row_number() OVER (PARTITION BY id ORDER BY updated_at DESC NULLS LAST) = 1
+        ''')
+
+    def _attach_sqlite(self, database_url: str):
+        url = make_url(database_url)
+        if url.get_backend_name() != 'sqlite':
+            raise ValueError(f"DuckDB只能直接读取SQLite数据库: {database_url}")
+        path = url.database.replace("'", "''")
+        try:
+            self.con.execute('INSTALL sqlite')
+            self.con.execute('LOAD sqlite')
+            self.con.execute(f"ATTACH '{path}' AS src (TYPE SQLITE, READ_ONLY)")
+            self.con.execute('CREATE VIEW properties AS SELECT * FROM src.properties')
+        except duckdb.Error as e:
+            # 没有sqlite扩展（离线）：按列读取后交给DuckDB
+            from database.loader import load_properties
+            from database.models import get_engine
+
+            print(f"DuckDB sqlite扩展不可用，改为按列读取数据库: {str(e).splitlines()[0]}")
+            df = load_properties(FALLBACK_COLUMNS, engine=get_engine(database_url))
+            self.con.register('properties_df', df)
+            self.con.execute('CREATE VIEW properties AS SELECT * FROM properties_df')
+
+    def _create_analysis_view(self):
+        """与 preprocess_data 相同的缺失值填充（数值→中位数，分类→众数）"""
+        columns = set(self.con.execute('SELECT * FROM properties LIMIT 0').df().columns)
+        numeric = [c for c in NUMERIC_COLUMNS + ['estimated_response'] if c in columns]
+        categorical = [c for c in CATEGORICAL_COLUMNS if c in columns]
+        fills = self.con.execute(
+            'SELECT ' + ', '.join([f'median({c})' for c in numeric] + [f'mode({c})' for c in categorical])
+            + ' FROM properties'
+        ).fetchone()
+        replaced = []
+        for column, fill in zip(numeric + categorical, fills):
+            if fill is None:
+                continue
+            literal = repr(float(fill)) if column in numeric else "'" + str(fill).replace("'", "''") + "'"
+            replaced.append(f'COALESCE({column}, {literal}) AS {column}')
+        replace = f" REPLACE ({', '.join(replaced)})" if replaced else ''
+        self.con.execute(f'CREATE VIEW analysis_base AS SELECT *{replace} FROM properties')
+        self.numeric_columns = [c for c in NUMERIC_COLUMNS if c in columns]
+        self.categorical_columns = categorical
+
+    def query(self, sql: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+        return self.con.execute(sql, params or []).df()
+
+    def response_by(self, dimension: str, min_count: int = 1,
+                    threshold: float = HIGH_RESPONSE_THRESHOLD) -> pd.DataFrame:
+        """按分组列统计推定反響数（物件数、平均、中位数、高反響占比），按平均值降序"""
+        return self.query(f'''
+            SELECT {dimension}, count(*) AS count, avg(estimated_response) AS mean,
+                   median(estimated_response) AS median,
+                   avg(CASE WHEN estimated_response >= ? THEN 1.0 ELSE 0.0 END) AS high_share
+            FROM analysis_base
+            WHERE {dimension} IS NOT NULL
+            GROUP BY {dimension}
+            HAVING count(*) >= ?
+            ORDER BY mean DESC, {dimension}
+        ''', [threshold, min_count])
+
+    def high_response_insights(self, threshold: float = HIGH_RESPONSE_THRESHOLD) -> Dict:
+        """
+        高反響物件与全体的对比（结构与 analyze_high_response_properties 的返回值相同）
+        """
+        high_count, total = self.con.execute(
+            'SELECT count(*) FILTER (WHERE estimated_response >= ?), count(*) FROM analysis_base', [threshold]
+        ).fetchone()
+        insights = {'high_response_count': high_count, 'total_count': total, 'features': {}}
+        if not high_count:
+            return insights
+
+        if self.numeric_columns:
+            means = self.con.execute('SELECT ' + ', '.join(
+                f'avg({c}) FILTER (WHERE estimated_response >= $t), avg({c}), count({c})'
+                for c in self.numeric_columns
+            ) + ' FROM analysis_base', {'t': threshold}).fetchone()
+            for i, column in enumerate(self.numeric_columns):
+                high_mean, all_mean, non_null = means[3 * i:3 * i + 3]
+                if not non_null:
+                    continue
+                insights['features'][column] = {
+                    'high_response_mean': high_mean,
+                    'all_mean': all_mean,
+                    'diff_percent': (high_mean - all_mean) / all_mean * 100 if all_mean else 0,
+                }
+
+        for column in self.categorical_columns:
+            top = {}
+            for key, condition in (('high_response_top5', 'AND estimated_response >= ?'), ('all_top5', '')):
+                rows = self.con.execute(f'''
+                    SELECT {column}, count(*) / sum(count(*)) OVER () AS share
+                    FROM analysis_base WHERE {column} IS NOT NULL {condition}
+                    GROUP BY {column} ORDER BY share DESC, {column} LIMIT 5
+                ''', [threshold] if condition else []).fetchall()
+                top[key] = dict(rows)
+            if top['all_top5']:
+                insights['features'][column] = top
+        return insights
+
+    def feature_stats(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """数值列的统计（与 DataFrame.describe() 相同的指标，分位数为线性插值）"""
+        columns = columns or self.numeric_columns + ['estimated_response']
+        rows = []
+        for column in columns:
+            stats = self.con.execute(f'''
+                SELECT count({column}), avg({column}), stddev_samp({column}), min({column}),
+                       quantile_cont({column}, 0.25), quantile_cont({column}, 0.5),
+                       quantile_cont({column}, 0.75), max({column})
+                FROM analysis_base
+            ''').fetchone()
+            rows.append(pd.Series(stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                                  name=column, dtype=float))
+        return pd.DataFrame(rows).T
+
+    def load_frame(self, columns: Sequence[str], not_null: Sequence[str] = ()) -> pd.DataFrame:
+        """按列读取未填充的原始数据（训练等需要DataFrame的场合）"""
+        where = ' AND '.join(f'{c} IS NOT NULL' for c in not_null) or 'TRUE'
+        return self.query(f"SELECT {', '.join(columns)} FROM properties WHERE {where} ORDER BY id")
+
+    def close(self):
+        self.con.close()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='DuckDB分析后端：区域/間取り别反響数统计')
+    parser.add_argument('--source', default=DUCKDB_SOURCE, choices=['sqlite', 'parquet'])
+    parser.add_argument('--compare', action='store_true', help='与pandas后端（PropertyAnalyzer）的结果对比')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    backend = DuckDBBackend(source=args.source)
+    by_area = backend.response_by('address_city')
+    by_plan = backend.response_by('floor_plan')
+    insights = backend.high_response_insights()
+    print(f"DuckDB（{args.source}）: {time.perf_counter() - start:.2f}s")
+    print(by_area.head(10).to_string(index=False))
+    print(by_plan.head(10).to_string(index=False))
+    print(f"高反響物件: {insights['high_response_count']} / {insights['total_count']}")
+
+    if args.compare:
+        from analysis.analyzer import PropertyAnalyzer
+
+        start = time.perf_counter()
+        analyzer = PropertyAnalyzer(backend='pandas')
+        analyzer.load_data()
+        analyzer.preprocess_data()
+        pandas_area = analyzer.response_by('address_city')
+        pandas_plan = analyzer.response_by('floor_plan')
+        print(f"pandas: {time.perf_counter() - start:.2f}s")
+        for name, duck_result, pandas_result in (('address_city', by_area, pandas_area),
+                                                 ('floor_plan', by_plan, pandas_plan)):
+            merged = duck_result.set_index(name)['mean'].to_frame('duckdb').join(pandas_result.rename('pandas'))
+            print(f"{name}: 最大差异 {(merged['duckdb'] - merged['pandas']).abs().max():.6f}")
+    backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+模型特征存储（property_features）
+把训练/预测用的派生特征按 物件id + 特征版本 持久化：物件更新后只重算变化的行，
+训练直接读取特征表，不再每次从原始列重新计算。
+特征版本 = 特征定义版本 + 配置中编码表（区域热度/户型/城市编码）的哈希，配置变化后自动使用新版本
+用法: python -m analysis.features [--config models/model_config.json] [--full]
+"""
+import os
+import sys
+import json
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import PropertyFeature, get_engine
+from database.bulk import upsert_rows
+
+
+# 特征定义变化时递增（会生成新的特征版本）
+FEATURE_SET = 'v2'
+
+# 计算築年数的基准年
+REFERENCE_YEAR = 2026
+
+# 特征表中的非特征列
+KEY_COLUMNS = ('property_id', 'version', 'source_updated_at', 'computed_at')
+
+# 模型特征（顺序即 model_config_v2.json 的 feature_cols）
+FEATURE_COLUMNS: List[str] = [c.name for c in PropertyFeature.__table__.columns if c.name not in KEY_COLUMNS]
+
+# 计算特征需要的 properties 列
+SOURCE_COLUMNS = [
+    'rent', 'area_sqm', 'built_year', 'walk_minutes', 'management_fee',
+    'deposit_months', 'key_money_months', 'zero_deposit', 'zero_key_money',
+    'area_name', 'floor_plan', 'property_type',
+]
+
+# 影响特征值的配置项
+CONFIG_KEYS = ('high_heat_areas', 'mid_heat_areas', 'high_response_plans', 'mid_response_plans', 'city_mapping')
+
+# 每次重算的物件数
+FEATURE_CHUNK = 20_000
+
+features_table = PropertyFeature.__table__
+
+
+def feature_version(config: Dict) -> str:
+    """特征版本：定义版本 + 相关配置的哈希"""
+    payload = {key: config.get(key) for key in CONFIG_KEYS}
+    payload['reference_year'] = REFERENCE_YEAR
+    digest = hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{FEATURE_SET}-{digest[:12]}"
+
+
+def _numeric(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=float)
+    return pd.to_numeric(df[column], errors='coerce')
+
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[column].fillna('').astype(str)
+
+
+def compute_features(df: pd.DataFrame, config: Dict) -> pd.DataFrame:
+    """
+    由 properties 的原始列计算模型特征（向量化）
+    Args:
+        df: 含 SOURCE_COLUMNS 的DataFrame（缺少的列按缺失处理）
+        config: 模型配置（区域热度/户型/城市编码）
+    Returns:
+        FEATURE_COLUMNS 顺序的float特征，索引与df相同
+    """
+    features = pd.DataFrame(index=df.index)
+
+    # 基础特征
+    features['rent'] = _numeric(df, 'rent')
+    features['area_sqm'] = _numeric(df, 'area_sqm')
+    features['built_year'] = _numeric(df, 'built_year').fillna(2000)
+    features['walk_minutes'] = _numeric(df, 'walk_minutes').fillna(10)
+    features['management_fee'] = _numeric(df, 'management_fee').fillna(0)
+
+    # 费用相关：敷金/礼金月数已在入库时换算（database.fees），缺失按1ヶ月
+    features['total_rent'] = features['rent'] + features['management_fee']
+    features['deposit'] = _numeric(df, 'deposit_months').fillna(1.0)
+    features['key_money'] = _numeric(df, 'key_money_months').fillna(1.0)
+    features['initial_cost'] = features['deposit'] + features['key_money']
+    features['zero_deposit'] = _numeric(df, 'zero_deposit').fillna(0)
+    features['zero_key_money'] = _numeric(df, 'zero_key_money').fillna(0)
+
+    # 派生特征
+    area = features['area_sqm'].replace(0, 1)
+    features['rent_per_sqm'] = features['rent'] / area
+    features['total_rent_per_sqm'] = features['total_rent'] / area
+    features['age'] = REFERENCE_YEAR - features['built_year']
+
+    # 分类编码
+    city = _text(df, 'area_name')
+    floor_plan = df['floor_plan'] if 'floor_plan' in df.columns else pd.Series(np.nan, index=df.index)
+    property_type = _text(df, 'property_type')
+    rent = features['rent']
+    area_sqm = features['area_sqm']
+    walk = features['walk_minutes']
+
+    features['city_encoded'] = city.map(config.get('city_mapping', {})).fillna(0)
+    features['heat_level'] = np.select(
+        [city.isin(config.get('high_heat_areas', [])), city.isin(config.get('mid_heat_areas', []))], [2, 1], 0)
+    features['walk_level'] = np.select([walk <= 5, walk <= 10], [2, 1], 0)
+    features['plan_type'] = np.select(
+        [floor_plan.isin(config.get('high_response_plans', [])),
+         floor_plan.isin(config.get('mid_response_plans', []))], [2, 1], 0)
+    features['building_type'] = np.select(
+        [property_type.str.contains('マンション', regex=False),
+         property_type.str.contains('アパート', regex=False)], [2, 1], 0)
+    # 比较时NaN为False，缺失的租金/面积落在最高档（与原先逐行判断一致）
+    features['rent_level'] = np.select(
+        [rent < 60000, rent < 80000, rent < 100000, rent < 150000], [0, 1, 2, 3], 4)
+    features['area_level'] = np.select([area_sqm < 20, area_sqm < 30, area_sqm < 50], [0, 1, 2], 3)
+
+    return features[FEATURE_COLUMNS].astype(float)
+
+
+def refresh_features(config: Dict, engine=None, full: bool = False,
+                     chunk_size: int = FEATURE_CHUNK) -> int:
+    """
+    增量更新特征表：只计算没有特征、或特征计算后又被更新的物件
+    Args:
+        config: 模型配置
+        engine: 数据库引擎，默认 get_engine()
+        full: 删除当前版本的特征后全部重算
+    Returns:
+        重算的物件数
+    """
+    if engine is None:
+        engine = get_engine()
+    version = feature_version(config)
+    if full:
+        with engine.begin() as conn:
+            conn.execute(text('DELETE FROM property_features WHERE version = :version'), {'version': version})
+
+    source = ', '.join(f'p.{col}' for col in SOURCE_COLUMNS)
+    # 按id分页：已写入的行不再过期，但分页保证即使时间戳异常也能结束
+    query = text(f'''
+        SELECT p.id AS property_id, COALESCE(p.updated_at, p.scraped_at) AS source_updated_at, {source}
+        FROM properties p
+        LEFT JOIN property_features f ON f.property_id = p.id AND f.version = :version
+        WHERE p.id > :last_id
+          AND (f.property_id IS NULL OR COALESCE(p.updated_at, p.scraped_at) > f.source_updated_at)
+        ORDER BY p.id
+        LIMIT :limit
+    ''')
+
+    refreshed = 0
+    last_id = 0
+    while True:
+        df = pd.read_sql(query, engine, params={'version': version, 'last_id': last_id, 'limit': chunk_size})
+        if df.empty:
+            break
+        features = compute_features(df, config)
+        features.insert(0, 'property_id', df['property_id'])
+        features.insert(1, 'version', version)
+        features.insert(2, 'source_updated_at', df['source_updated_at'])
+        features.insert(3, 'computed_at', datetime.now())
+        upsert_rows(engine, features_table, features, ['property_id', 'version'])
+        refreshed += len(df)
+        last_id = int(df['property_id'].iloc[-1])
+    return refreshed
+
+
+def load_features(config: Dict, engine=None, target: Optional[str] = None,
+                  required: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    读取当前版本的特征（先运行 refresh_features）
+    Args:
+        config: 模型配置（决定特征版本）
+        target: 同时读取的 properties 目标列，如 'estimated_response'
+        required: 这些 properties 列为空的物件不读取（如训练要求的 rent/area_sqm）
+    Returns:
+        property_id + FEATURE_COLUMNS (+ target)，按 property_id 排序
+    """
+    if engine is None:
+        engine = get_engine()
+    columns = ['f.property_id'] + [f'f.{col}' for col in FEATURE_COLUMNS] + ([f'p.{target}'] if target else [])
+    where = ['f.version = :version'] + [f'p.{col} IS NOT NULL' for col in required]
+    sql = f'''
+        SELECT {', '.join(columns)}
+        FROM property_features f
+        JOIN properties p ON p.id = f.property_id
+        WHERE {' AND '.join(where)}
+        ORDER BY f.property_id
+    '''
+    return pd.read_sql(text(sql), engine, params={'version': feature_version(config)})
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='增量更新模型特征表 property_features')
+    parser.add_argument('--config', default='models/model_config.json', help='模型配置')
+    parser.add_argument('--full', action='store_true', help='当前版本全部重算')
+    args = parser.parse_args()
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    n = refresh_features(config, full=args.full)
+    print(f"特征版本 {feature_version(config)}: 重算 {n} 个物件")
+
+
+if __name__ == "__main__":
+    main()
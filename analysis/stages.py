@@ -0,0 +1,187 @@
+"""
+分析流程的阶段图
+每个阶段声明输入阶段和参数，结果按 (阶段名, 阶段版本, 函数代码, 参数值, 输入阶段的键) 的哈希缓存在内存和磁盘上；
+根输入（物件数据）的键是内容哈希。参数变化时只重算该阶段和依赖它的阶段，数据不变时直接读缓存。
+阶段函数不修改输入，需要修改数据的阶段自己复制
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import inspect
+import hashlib
+import functools
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ANALYSIS_CACHE_DIR
+
+
+# 每个阶段在磁盘上保留的缓存文件数（按修改时间，旧的删除）
+CACHE_KEEP = 3
+
+
+def data_hash(df: pd.DataFrame) -> str:
+    """DataFrame的内容哈希（列名、dtype和各行的值）"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()], ensure_ascii=False).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def code_hash(func: Callable) -> str:
+    """
+    阶段函数的代码哈希：源码（取不到时用字节码和常量），修改函数后旧的磁盘缓存自动失效。
+    只包含函数本身，函数调用的其他函数变化时仍需递增阶段版本
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    try:
+        payload = inspect.getsource(func).encode('utf-8')
+    except (OSError, TypeError):
+        code = getattr(func, '__code__', None)
+        if code is None:  # 内置函数等：只能按名称区分
+            payload = f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}".encode('utf-8')
+        else:
+            payload = _code_bytes(code)
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def _code_bytes(code) -> bytes:
+    parts = [code.co_code]
+    for const in code.co_consts:
+        parts.append(_code_bytes(const) if inspect.iscode(const) else repr(const).encode('utf-8'))
+    return b'\0'.join(parts)
+
+
+class Stage:
+    """一个阶段：func(*输入阶段的结果, **参数)"""
+
+    def __init__(self, name: str, func: Callable, inputs: Sequence[str] = (),
+                 params: Sequence[str] = (), version: int = 1):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        # 阶段函数调用的其他函数变化时递增，使旧的磁盘缓存失效（函数本身的修改由代码哈希检测）
+        self.version = version
+        self.code = code_hash(func)
+
+
+class StageGraph:
+    """阶段图：按依赖计算阶段并缓存结果"""
+
+    def __init__(self, cache_dir: Optional[str] = ANALYSIS_CACHE_DIR):
+        """
+        Args:
+            cache_dir: 磁盘缓存目录，None或空字符串时只缓存在内存中
+        """
+        self.cache_dir = cache_dir or None
+        self.stages: Dict[str, Stage] = {}
+        self.params: Dict[str, Any] = {}
+        self._roots: Dict[str, tuple] = {}
+        # 阶段名 -> (键, 结果)：内存中每个阶段只保留最近一次的结果
+        self._memory: Dict[str, tuple] = {}
+        # 本进程中各阶段的执行记录 (阶段名, 来源 computed/disk, 耗时秒)；内存缓存命中不记录
+        self.log: List[tuple] = []
+
+    def add(self, name: str, func: Callable, inputs: Sequence[str] = (),
+            params: Optional[Dict[str, Any]] = None, version: int = 1):
+        """
+        注册阶段
+        Args:
+            inputs: 输入阶段名（结果按顺序作为位置参数传入）
+            params: 参数名 -> 默认值（作为关键字参数传入）
+        """
+        for param, default in (params or {}).items():
+            self.params.setdefault(param, default)
+        self.stages[name] = Stage(name, func, inputs, list(params or {}), version)
+
+    def set_input(self, name: str, value: Any, key: Optional[str] = None):
+        """设置根输入（DataFrame默认用内容哈希作为键）"""
+        if key is None:
+            key = data_hash(value) if isinstance(value, pd.DataFrame) else hashlib.sha1(
+                pickle.dumps(value)).hexdigest()[:16]
+        self._roots[name] = (key, value)
+
+    def key(self, name: str) -> str:
+        if name in self._roots:
+            return self._roots[name][0]
+        if name not in self.stages:
+            raise KeyError(f"未设置的输入: {name}")
+        stage = self.stages[name]
+        payload = [name, stage.version, stage.code, {p: self.params[p] for p in stage.params},
+                   [self.key(i) for i in stage.inputs]]
+        return hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+                            .encode('utf-8')).hexdigest()[:16]
+
+    def run(self, name: str, **params) -> Any:
+        """
+        计算阶段（依赖的阶段按需计算），params 更新对应参数后再计算
+        Returns:
+            阶段结果（调用方不应修改）
+        """
+        self.params.update(params)
+        if name in self._roots:
+            return self._roots[name][1]
+
+        key = self.key(name)
+        cached = self._memory.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        start = time.perf_counter()
+        path = self._cache_path(name, key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    result = pickle.load(f)
+                self._memory[name] = (key, result)
+                self.log.append((name, 'disk', time.perf_counter() - start))
+                return result
+            except Exception as e:
+                print(f"  读取阶段缓存失败（重新计算）: {name}: {e}")
+
+        stage = self.stages[name]
+        inputs = [self.run(i) for i in stage.inputs]
+        start = time.perf_counter()
+        result = stage.func(*inputs, **{p: self.params[p] for p in stage.params})
+        elapsed = time.perf_counter() - start
+        self._memory[name] = (key, result)
+        self.log.append((name, 'computed', elapsed))
+        if path:
+            self._save(name, path, result)
+        return result
+
+    def _cache_path(self, name: str, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+
+    def _save(self, name: str, path: str, result: Any):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"  保存阶段缓存失败: {name}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        # 同一阶段只保留最近的 CACHE_KEEP 个结果
+        files = sorted((os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir)
+                        if f.startswith(f"{name}-") and f.endswith('.pkl')),
+                       key=os.path.getmtime, reverse=True)
+        for old in files[CACHE_KEEP:]:
+            os.remove(old)
+
+    def summary(self) -> str:
+        """各阶段的执行记录（计算 / 磁盘缓存）"""
+        labels = {'computed': '计算', 'disk': '磁盘缓存'}
+        return '\n'.join(f"  {name:<16} {labels[source]:<6} {elapsed:.2f}s" for name, source, elapsed in self.log)
@@ -53,6 +53,8 @@ class EvaluationResult:
 class PropertyEvaluator:
     """物件评估器"""
 
+    # 以下分档是汇总表（database.aggregates）不可用时的默认值；
+    # 初始化时若 response_aggregates 有数据，则用由数据计算的分档覆盖
     # 高反響区域
     HIGH_RESPONSE_AREAS = ['江戸川区', '新宿区', '品川区', '目黒区', '中野区', '豊島区', '渋谷区']
     LOW_RESPONSE_AREAS = ['府中市', '八王子市', '中央区', '千代田区', '調布市']
@@ -64,8 +66,13 @@ class PropertyEvaluator:
     HIGH_RESPONSE_PLANS = ['1DK', '2DK', '2K', '1LDK']
     LOW_RESPONSE_PLANS = ['1K']  # 供給過多
 
-    def __init__(self, model_path: str = None):
-        """初始化评估器"""
+    def __init__(self, model_path: str = None, use_aggregates: bool = True):
+        """
+        初始化评估器
+        Args:
+            model_path: 评分模型路径
+            use_aggregates: 从 response_aggregates 汇总表读取高/低反響的区域・沿線・間取り
+        """
         if model_path is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             model_path = os.path.join(base_dir, 'data', 'property_scorer_v2.pkl')
@@ -73,6 +80,9 @@ class PropertyEvaluator:
         self.model = None
         self.le_type = None
         self.le_plan = None
+        self.tier_source = 'default'
+        if use_aggregates:
+            self._load_tiers()
 
         if os.path.exists(model_path):
             with open(model_path, 'rb') as f:
@@ -81,6 +91,23 @@ class PropertyEvaluator:
                 self.le_type = data['le_type']
                 self.le_plan = data['le_plan']
 
+    def _load_tiers(self):
+        """用汇总表的分档覆盖类中的默认列表（数据库不可用或汇总为空时保持默认）"""
+        try:
+            from database.aggregates import load_tiers
+            tiers = load_tiers()
+        except Exception as e:
+            print(f"读取反響数汇总失败，使用默认分档: {e}")
+            return
+        if not tiers:
+            return
+        self.HIGH_RESPONSE_AREAS = tiers['high_heat_areas'] or self.HIGH_RESPONSE_AREAS
+        self.LOW_RESPONSE_AREAS = tiers['low_heat_areas'] or self.LOW_RESPONSE_AREAS
+        self.HIGH_RESPONSE_LINES = tiers['high_response_lines'] or self.HIGH_RESPONSE_LINES
+        self.HIGH_RESPONSE_PLANS = tiers['high_response_plans'] or self.HIGH_RESPONSE_PLANS
+        self.LOW_RESPONSE_PLANS = tiers['low_response_plans'] or self.LOW_RESPONSE_PLANS
+        self.tier_source = 'aggregates'
+
     def evaluate(self, property_data: dict) -> dict:
         """
         评估物件
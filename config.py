@@ -13,6 +13,24 @@ SUMMO_PASSWORD = os.getenv("SUMMO_PASSWORD")
 
 # 数据库配置
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///data/properties.db")
+# SQLite连接参数（WAL模式下抓取写入与分析读取互不阻塞）
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))  # 每个连接的页缓存
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))  # 内存映射读取的上限
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))  # 等待写锁的秒数
+# 日志模式：WAL（默认）或 DELETE。多台机器通过共享卷（NFS/SMB）使用同一个SQLite文件时必须用 DELETE：
+# WAL的共享内存索引（-shm）不能跨主机共享。日志模式保存在数据库文件中，访问该文件的所有进程都要设置相同的值
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL").upper()
+# 分析用的Parquet数据集（python main.py export 增量导出）
+PARQUET_DIR = os.getenv("PARQUET_DIR", "data/parquet/properties")
+# 分析器的分组统计后端：pandas 或 duckdb（可选依赖）；duckdb读取 sqlite（数据库文件）或 parquet（快照）
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "pandas")
+DUCKDB_SOURCE = os.getenv("DUCKDB_SOURCE", "sqlite")
+# 分析阶段结果的磁盘缓存（按数据哈希+参数），设为空字符串则只在内存中缓存
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "data/cache/analysis")
+# 数据库维护（python main.py maintain）：原始数据/快照的保留天数，超期快照归档为Parquet
+RAW_RETENTION_DAYS = int(os.getenv("RAW_RETENTION_DAYS", "90"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "365"))
+SNAPSHOT_ARCHIVE_DIR = os.getenv("SNAPSHOT_ARCHIVE_DIR", "data/archive/snapshots")
 
 # 网站配置
 # 登录入口页面（原URL中的id是会话ID，已过期）
@@ -20,6 +38,26 @@ BASE_URL = "https://www.fn.forrent.jp/fn/"
 
 # 抓取配置
 MIN_RESPONSE_COUNT = 10  # 最小推定反響数（件/月）
+SCRAPE_MAX_RETRIES = int(os.getenv("SCRAPE_MAX_RETRIES", "3"))  # 单步出错后恢复重试次数
+AREA_FAILURE_LIMIT = int(os.getenv("AREA_FAILURE_LIMIT", "5"))  # 单个区域累计失败次数达到后熔断跳过
+
+# 分布式抓取任务队列（python main.py enqueue / worker）
+LEASE_TTL_SECONDS = int(os.getenv("LEASE_TTL_SECONDS", "300"))  # 租约有效期，worker每1/3周期续约
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))  # 同一任务最多领取次数
+
+# 调试产物存储（截图/HTML按内容哈希去重压缩保存）
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "data/artifacts")
+ARTIFACT_MAX_MB = int(os.getenv("ARTIFACT_MAX_MB", "500"))  # 超过后按LRU淘汰
+
+# 常驻浏览器（python main.py daemon），各脚本通过CDP连接复用
+BROWSER_CDP_PORT = int(os.getenv("BROWSER_CDP_PORT", "9222"))
+BROWSER_CDP_URL = os.getenv("BROWSER_CDP_URL")  # 指定时优先使用，否则读取状态文件
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", "data/browser_profile")
+BROWSER_DAEMON_STATE = "data/browser_daemon.json"
+
+# 导航缓存（菜单文字 -> frame + 选择器），区域列表按TTL缓存
+NAV_CACHE_PATH = os.getenv("NAV_CACHE_PATH", "data/nav_cache.json")
+AREA_CACHE_TTL_HOURS = float(os.getenv("AREA_CACHE_TTL_HOURS", "24"))
 
 # 东京各区列表（将在抓取时动态获取）
 TOKYO_AREAS = []
@@ -1,6 +1,18 @@
 """
 数据库模块
 """
-from .models import Property, Base, get_engine, get_session, init_db
+from .models import (Property, PropertyRaw, PropertySnapshot, PropertyFeature, ResponseAggregate, CrawlTask,
+                     Base, get_engine, get_session, init_db, make_listing_key, connect_sqlite)
+from .bulk import upsert_properties, upsert_rows, bulk_insert
+from .history import listing_history, latest_changes
+from .loader import load_properties
+from .search import search_properties
+from .aggregates import refresh_aggregates, load_tiers
+from .work_queue import WorkQueue, Lease, LeaseLost
 
-__all__ = ['Property', 'Base', 'get_engine', 'get_session', 'init_db']
+__all__ = ['Property', 'PropertyRaw', 'PropertySnapshot', 'PropertyFeature', 'ResponseAggregate', 'CrawlTask',
+           'Base', 'get_engine', 'get_session', 'init_db', 'make_listing_key', 'connect_sqlite',
+           'upsert_properties', 'upsert_rows', 'bulk_insert',
+           'listing_history', 'latest_changes', 'load_properties', 'search_properties',
+           'refresh_aggregates', 'load_tiers',
+           'WorkQueue', 'Lease', 'LeaseLost']
@@ -0,0 +1,253 @@
+"""
+推定反響数的分组汇总（response_aggregates）
+按 区域/沿線/駅/間取り 物化 物件数・平均・分位数，每次抓取后只重算有物件更新的分组。
+高/中/低反響的分档由汇总表计算（load_tiers），取代评估器和模型配置中手工维护的列表
+用法: python -m database.aggregates [--full] [--tiers]
+"""
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import ResponseAggregate, get_engine
+from database.bulk import upsert_rows
+
+
+# 汇总的分组列
+DIMENSIONS = ('area_name', 'railway_line', 'station', 'floor_plan')
+
+# 全体汇总行
+OVERALL = ('all', '*')
+
+QUANTILES = {'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p90': 0.9}
+
+# 分档：物件数不足的分组不参与；平均值相对全体平均的比例
+MIN_GROUP_COUNT = 30
+HIGH_RATIO = 1.2
+MID_RATIO = 1.0
+LOW_RATIO = 0.8
+
+# 分档 -> 模型配置/评估器中对应的键
+TIER_KEYS = {
+    'area_name': ('high_heat_areas', 'mid_heat_areas', 'low_heat_areas'),
+    'floor_plan': ('high_response_plans', 'mid_response_plans', 'low_response_plans'),
+    'railway_line': ('high_response_lines', 'mid_response_lines', 'low_response_lines'),
+    'station': ('high_response_stations', 'mid_response_stations', 'low_response_stations'),
+}
+
+aggregates_table = ResponseAggregate.__table__
+
+# 进程内缓存：(数据库URL, 参数) -> 分档
+_tier_cache: Dict = {}
+
+
+def _summarize(df: pd.DataFrame, dimension: str) -> pd.DataFrame:
+    """按分组列汇总 estimated_response"""
+    grouped = df.groupby(dimension, observed=True)['estimated_response']
+    summary = grouped.agg(['count', 'mean'])
+    quantiles = grouped.quantile(list(QUANTILES.values())).unstack()
+    quantiles.columns = list(QUANTILES)
+    summary = summary.join(quantiles).reset_index().rename(columns={dimension: 'value'})
+    summary.insert(0, 'dimension', dimension)
+    return summary
+
+
+def refresh_aggregates(engine=None, full: bool = False) -> int:
+    """
+    重算有物件更新（updated_at 晚于上次汇总）的分组，以及物件数与汇总不一致的分组（物件的分组值被修改后的原分组）
+    Args:
+        engine: 数据库引擎（或迁移中的Connection），默认 get_engine()
+        full: 删除后全部重算（只删除了物件、没有其他更新时使用）
+    Returns:
+        重算的分组数
+    """
+    if engine is None:
+        engine = get_engine()
+    if isinstance(engine, Connection):
+        refreshed = _refresh(engine, full)
+    else:
+        with engine.begin() as conn:
+            refreshed = _refresh(conn, full)
+    _tier_cache.clear()
+    return refreshed
+
+
+def _refresh(conn, full: bool) -> int:
+    if full:
+        conn.execute(text('DELETE FROM response_aggregates'))
+    watermark = conn.execute(text('SELECT MAX(source_updated_at) FROM response_aggregates')).scalar()
+    latest = conn.execute(text('SELECT MAX(updated_at) FROM properties')).scalar()
+    if latest is None or (watermark is not None and latest <= watermark):
+        return 0
+
+    # 各分组列中需要重算的值（None: 全部重算）
+    affected = {}
+    for dimension in DIMENSIONS:
+        if watermark is None:
+            affected[dimension] = None
+            continue
+        values = set(v for (v,) in conn.execute(text(
+            f'SELECT DISTINCT {dimension} FROM properties WHERE updated_at > :watermark AND {dimension} IS NOT NULL'
+        ), {'watermark': watermark}))
+        values |= _changed_counts(conn, dimension)
+        if values:
+            affected[dimension] = sorted(values)
+
+    rows = []
+    for dimension, values in affected.items():
+        summary = _summarize(_read_responses(conn, dimension, values), dimension)
+        rows.append(summary)
+        if values is not None:
+            # 分组中已没有带推定反響数的物件：删除旧的汇总
+            for value in set(values) - set(summary['value']):
+                conn.execute(text('DELETE FROM response_aggregates WHERE dimension = :d AND value = :v'),
+                             {'d': dimension, 'v': value})
+    rows.append(_overall(conn))
+
+    result = pd.concat(rows, ignore_index=True)
+    result['source_updated_at'] = latest
+    result['computed_at'] = datetime.now()
+    return upsert_rows(conn, aggregates_table, result, ['dimension', 'value'])
+
+
+def _changed_counts(conn, dimension: str) -> set:
+    """
+    物件数与汇总表不一致的分组：物件的区域/間取り等被修改后，原分组少了一行，
+    但原分组中没有 updated_at 更新的物件，只能通过物件数发现（按 (列, estimated_response) 索引计数）
+    """
+    current = dict(conn.execute(text(
+        f'SELECT {dimension}, COUNT(*) FROM properties '
+        f'WHERE estimated_response IS NOT NULL AND {dimension} IS NOT NULL GROUP BY {dimension}'
+    )).all())
+    stored = dict(conn.execute(text(
+        'SELECT value, count FROM response_aggregates WHERE dimension = :d'
+    ), {'d': dimension}).all())
+    return {value for value in current.keys() | stored.keys() if current.get(value) != stored.get(value)}
+
+
+def _read_responses(conn, dimension: str, values: Optional[List[str]], chunk: int = 500) -> pd.DataFrame:
+    """
+    读取分组值（None为全部）的 estimated_response；
+    按单个分组列查询，区域/間取り可走 (列, estimated_response) 覆盖索引
+    """
+    sql = (f'SELECT {dimension}, estimated_response FROM properties '
+           f'WHERE estimated_response IS NOT NULL AND {dimension} IS NOT NULL')
+    if values is None:
+        return pd.read_sql(text(sql), conn)
+    frames = []
+    for start in range(0, len(values), chunk):
+        batch = values[start:start + chunk]
+        params = {f'v{i}': v for i, v in enumerate(batch)}
+        placeholders = ', '.join(f':v{i}' for i in range(len(batch)))
+        frames.append(pd.read_sql(text(f'{sql} AND {dimension} IN ({placeholders})'), conn, params=params))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _overall(conn) -> pd.DataFrame:
+    """
+    全体汇总：不读取全部物件，平均值用AVG，分位数按 estimated_response 索引定位
+    （与pandas的线性插值相同）
+    """
+    count, mean = conn.execute(text(
+        'SELECT COUNT(estimated_response), AVG(estimated_response) FROM properties'
+    )).one()
+    row = {'dimension': OVERALL[0], 'value': OVERALL[1], 'count': count, 'mean': mean}
+    for name, q in QUANTILES.items():
+        if not count:
+            row[name] = None
+            continue
+        position = q * (count - 1)
+        lower = int(position)
+        values = [v for (v,) in conn.execute(text(
+            'SELECT estimated_response FROM properties WHERE estimated_response IS NOT NULL '
+            'ORDER BY estimated_response LIMIT 2 OFFSET :offset'
+        ), {'offset': lower})]
+        upper = values[1] if len(values) > 1 else values[0]
+        row[name] = values[0] + (upper - values[0]) * (position - lower)
+    return pd.DataFrame([row])
+
+
+def load_aggregates(dimension: Optional[str] = None, engine=None) -> pd.DataFrame:
+    """读取汇总表（可只读某个分组列）"""
+    if engine is None:
+        engine = get_engine()
+    sql = 'SELECT * FROM response_aggregates'
+    params = {}
+    if dimension:
+        sql += ' WHERE dimension = :dimension'
+        params['dimension'] = dimension
+    return pd.read_sql(text(sql + ' ORDER BY dimension, mean DESC'), engine, params=params)
+
+
+def load_tiers(engine=None, min_count: int = MIN_GROUP_COUNT) -> Dict[str, List[str]]:
+    """
+    由汇总表计算各分组列的高/中/低反響分档
+    高: 平均 ≥ 全体平均×HIGH_RATIO；中: ≥ ×MID_RATIO；低: ≤ ×LOW_RATIO（均按平均值降序）
+    Returns:
+        {'high_heat_areas': [...], 'mid_heat_areas': [...], 'low_heat_areas': [...],
+         'high_response_plans': [...], ...}；汇总表为空时返回 {}
+    """
+    if engine is None:
+        engine = get_engine()
+    key = (str(engine.url), min_count)
+    if key in _tier_cache:
+        return _tier_cache[key]
+
+    df = load_aggregates(engine=engine)
+    overall = df[(df['dimension'] == OVERALL[0]) & (df['value'] == OVERALL[1])]
+    if overall.empty or not overall['mean'].iloc[0]:
+        return {}
+    base = overall['mean'].iloc[0]
+
+    tiers = {}
+    for dimension, (high_key, mid_key, low_key) in TIER_KEYS.items():
+        groups = df[(df['dimension'] == dimension) & (df['count'] >= min_count)]
+        ratio = groups['mean'] / base
+        tiers[high_key] = groups.loc[ratio >= HIGH_RATIO, 'value'].tolist()
+        tiers[mid_key] = groups.loc[(ratio >= MID_RATIO) & (ratio < HIGH_RATIO), 'value'].tolist()
+        tiers[low_key] = groups.loc[ratio <= LOW_RATIO, 'value'].tolist()
+    _tier_cache[key] = tiers
+    return tiers
+
+
+def apply_tiers(config: Dict, engine=None) -> Dict:
+    """
+    用汇总表的分档替换模型配置中的区域热度/户型列表；
+    汇总表为空或某个分档为空（如物件数不足 MIN_GROUP_COUNT）时该键保留配置中的列表，并打印各键的来源
+    """
+    tiers = load_tiers(engine)
+    keys = [key for dimension in ('area_name', 'floor_plan') for key in TIER_KEYS[dimension][:2]]
+    result = dict(config)
+    for key in keys:
+        if tiers.get(key):
+            result[key] = tiers[key]
+            source = '反響数汇总'
+        else:
+            source = '模型配置（汇总分档为空）'
+        print(f"  {key}: {source}，{len(result.get(key) or [])} 个")
+    return result
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='更新推定反響数分组汇总')
+    parser.add_argument('--full', action='store_true', help='全部重算')
+    parser.add_argument('--tiers', action='store_true', help='显示由汇总得到的分档')
+    args = parser.parse_args()
+
+    n = refresh_aggregates(full=args.full)
+    print(f"重算 {n} 个分组")
+    if args.tiers:
+        for key, values in load_tiers().items():
+            print(f"{key}: {', '.join(values)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+批量写入
+接受 dict列表 / RecordBuffer / DataFrame，过滤到表中的列并按列类型转换后，
+用一次 executemany（Core insert）写入，不再为每行创建ORM对象。
+properties表按物件自然键（listing_key）做 upsert：INSERT ... ON CONFLICT DO UPDATE，
+已存在的物件刷新 updated_at 和有变化的字段，新抓取中缺失的字段保留原值；
+行中的 raw_data 压缩后写入 property_raw 表
+"""
+import os
+import sys
+import json
+import math
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, Text, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import Property, PropertyRaw, compress_raw, make_listing_key
+from database.fees import FEE_FIELDS, fill_fee_columns
+from database.flags import fill_flag_columns
+from database.history import record_snapshots
+
+
+properties_table = Property.__table__
+raw_table = PropertyRaw.__table__
+PROPERTY_COLUMNS = [c.name for c in properties_table.columns if c.name != 'id']
+
+# 重复抓取时保持不变的列（首次抓取时间）
+KEEP_ON_CONFLICT = {'id', 'listing_key', 'scraped_at'}
+
+# 每次executemany的行数（控制单个事务的内存）
+BULK_CHUNK = 5000
+
+
+def _is_missing(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return value is pd.NaT or (isinstance(value, str) and not value.strip())
+
+
+def _to_int(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(float(str(value).replace(',', '')))
+    except ValueError:
+        return None
+
+
+def _to_float(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return None
+
+
+def _to_datetime(value):
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _to_str(value):
+    # 整数值的浮点数（如CSV读回的 3.0）写成 "3"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    # 設備等列表/字典按JSON保存
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _converter(column) -> Callable:
+    """按列类型选择转换函数；无法转换的值写为NULL"""
+    col_type = column.type
+    if isinstance(col_type, Boolean):
+        return bool
+    if isinstance(col_type, Integer):
+        return _to_int
+    if isinstance(col_type, Float):
+        return _to_float
+    if isinstance(col_type, DateTime):
+        return _to_datetime
+    if isinstance(col_type, String) and col_type.length:
+        return lambda v, n=col_type.length: _to_str(v)[:n]
+    if isinstance(col_type, (String, Text)):
+        return _to_str
+    return lambda v: v
+
+
+def _iter_rows(data) -> Iterable[Dict]:
+    """统一输入：DataFrame / RecordBuffer / dict列表"""
+    if isinstance(data, pd.DataFrame):
+        columns = list(data.columns)
+        for values in data.itertuples(index=False, name=None):
+            yield dict(zip(columns, values))
+    else:
+        yield from data
+
+
+def _converters(table, columns: List[str] = None):
+    if columns is None:
+        columns = [c.name for c in table.columns if c is not table.autoincrement_column]
+    return [(name, _converter(table.c[name])) for name in columns]
+
+
+def _coerce_row(row: Dict, converters) -> Dict:
+    record = {}
+    for name, convert in converters:
+        value = row.get(name)
+        record[name] = None if _is_missing(value) else convert(value)
+    return record
+
+
+def coerce_rows(table, data, columns: List[str] = None) -> List[Dict]:
+    """
+    过滤到表中的列并按列类型转换，缺失列补NULL（executemany要求每行键一致）
+    Args:
+        table: SQLAlchemy Table
+        data: DataFrame / RecordBuffer / dict列表
+        columns: 要写入的列，默认表中除自增主键外的所有列
+    """
+    converters = _converters(table, columns)
+    return [_coerce_row(row, converters) for row in _iter_rows(data)]
+
+
+def bulk_insert(engine_or_session, table, data, chunk_size: int = BULK_CHUNK) -> int:
+    """
+    通用批量插入（Core insert + executemany）
+    Args:
+        engine_or_session: Engine 或 Session
+        table: SQLAlchemy Table（如 Property.__table__）
+        data: DataFrame / RecordBuffer / dict列表
+    Returns:
+        插入行数
+    """
+    records = coerce_rows(table, data)
+    _execute_many(engine_or_session, insert(table), records, chunk_size)
+    return len(records)
+
+
+@contextmanager
+def _executor(engine_or_session):
+    """Engine：开启独立事务；Connection：在调用方的事务中执行；Session：在会话中执行，结束时提交"""
+    if isinstance(engine_or_session, Engine):
+        with engine_or_session.begin() as conn:
+            yield conn
+        return
+    if isinstance(engine_or_session, Connection):
+        yield engine_or_session
+        return
+    yield engine_or_session
+    engine_or_session.commit()
+
+
+def _execute_many(engine_or_session, stmt, records: List[Dict], chunk_size: int):
+    if not records:
+        return
+    with _executor(engine_or_session) as conn:
+        for start in range(0, len(records), chunk_size):
+            conn.execute(stmt, records[start:start + chunk_size])
+
+
+def _dialect_insert(dialect_name: str):
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def upsert_rows(engine_or_session, table, data, index_elements: List[str],
+                chunk_size: int = BULK_CHUNK) -> int:
+    """
+    通用upsert：按index_elements（主键或唯一索引）冲突时覆盖其余列
+    Args:
+        table: SQLAlchemy Table
+        data: DataFrame / dict列表（先按列类型转换）
+    Returns:
+        写入行数
+    """
+    records = coerce_rows(table, data)
+    if not records:
+        return 0
+    bind = engine_or_session.get_bind() if hasattr(engine_or_session, 'get_bind') else engine_or_session
+    dialect_insert = _dialect_insert(bind.dialect.name)
+    if dialect_insert is None:
+        raise RuntimeError(f"upsert_rows 不支持 {bind.dialect.name}")
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={col: stmt.excluded[col] for col in records[0] if col not in index_elements},
+    )
+    _execute_many(engine_or_session, stmt, records, chunk_size)
+    return len(records)
+
+
+def prepare_property_rows(data, raw_by_key: Dict[str, str] = None) -> List[Dict]:
+    """
+    过滤到properties表的列、转换类型、生成listing_key、换算敷金/礼金数值列和設備位掩码，
+    同一批次内重复的物件只保留最后一条
+    Args:
+        raw_by_key: 传入dict时收集各行的 raw_data（listing_key -> 原始文本）
+    """
+    now = datetime.now()
+    converters = _converters(properties_table, PROPERTY_COLUMNS)
+    by_key = {}
+    for row in _iter_rows(data):
+        record = _coerce_row(row, converters)
+        if any(row.get(field) is not None for field in FEE_FIELDS):
+            fill_fee_columns(record, source=row)
+        fill_flag_columns(record, source=row)
+        record['listing_key'] = record['listing_key'] or make_listing_key(record)
+        record['scraped_at'] = record['scraped_at'] or now
+        record['updated_at'] = now
+        by_key[record['listing_key']] = record
+        if raw_by_key is not None:
+            raw = row.get('raw_data')
+            if isinstance(raw, str) and raw:
+                raw_by_key[record['listing_key']] = raw
+    return list(by_key.values())
+
+
+def save_raw_data(engine_or_session, raw_by_key: Dict[str, str], chunk_size: int = 500) -> int:
+    """
+    按listing_key找到物件id，把原始数据压缩写入property_raw（已有则覆盖）
+    Returns:
+        写入行数
+    """
+    if not raw_by_key:
+        return 0
+    bind = engine_or_session.get_bind() if hasattr(engine_or_session, 'get_bind') else engine_or_session
+    dialect_insert = _dialect_insert(bind.dialect.name)
+    stmt = dialect_insert(raw_table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['property_id'],
+        set_={col: stmt.excluded[col] for col in ('codec', 'data', 'raw_size', 'updated_at')},
+    )
+    keys = list(raw_by_key)
+    now = datetime.now()
+    saved = 0
+    with _executor(engine_or_session) as conn:
+        for start in range(0, len(keys), chunk_size):
+            batch = keys[start:start + chunk_size]
+            rows = conn.execute(
+                select(properties_table.c.id, properties_table.c.listing_key)
+                .where(properties_table.c.listing_key.in_(batch))
+            )
+            records = []
+            for property_id, key in rows:
+                text = raw_by_key[key]
+                data, codec = compress_raw(text)
+                records.append({'property_id': property_id, 'codec': codec, 'data': data,
+                                'raw_size': len(text.encode('utf-8')), 'updated_at': now})
+            if records:
+                conn.execute(stmt, records)
+                saved += len(records)
+    return saved
+
+
+def upsert_properties(engine_or_session, data: Union[pd.DataFrame, Iterable[Dict]],
+                      chunk_size: int = BULK_CHUNK, run_id: Optional[str] = None,
+                      history: bool = True) -> int:
+    """
+    按listing_key批量写入物件（一次executemany）
+    Args:
+        engine_or_session: Engine 或 Session
+        data: DataFrame / RecordBuffer / dict列表（表中不存在的键会被忽略）
+        run_id: 抓取批次（写入property_snapshots），默认本进程的批次
+        history: 是否为新物件和有变化的物件追加快照
+    Returns:
+        写入（新增或更新）的行数
+    """
+    raw_by_key = {}
+    records = prepare_property_rows(data, raw_by_key)
+    if not records:
+        return 0
+
+    bind = engine_or_session.get_bind() if hasattr(engine_or_session, 'get_bind') else engine_or_session
+    dialect_insert = _dialect_insert(bind.dialect.name)
+    if dialect_insert is None:
+        # 其他数据库不支持ON CONFLICT：逐行按键查找后更新或新增
+        from database.models import get_session
+        session = engine_or_session if hasattr(engine_or_session, 'query') else get_session(bind)
+        if history:
+            record_snapshots(session, records, run_id)
+        for record in records:
+            obj = session.query(Property).filter_by(listing_key=record['listing_key']).first()
+            if obj is None:
+                obj = Property(**record)
+                session.add(obj)
+            else:
+                for col, value in record.items():
+                    if col not in KEEP_ON_CONFLICT and value is not None:
+                        setattr(obj, col, value)
+            if record['listing_key'] in raw_by_key:
+                obj.raw_data = raw_by_key[record['listing_key']]
+        session.commit()
+        return len(records)
+
+    stmt = dialect_insert(properties_table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['listing_key'],
+        set_={
+            col: (excluded[col] if col == 'updated_at'
+                  else func.coalesce(excluded[col], properties_table.c[col]))
+            for col in PROPERTY_COLUMNS if col not in KEEP_ON_CONFLICT
+        },
+    )
+    with _executor(engine_or_session) as conn:
+        # 先与当前值比较记录历史，再upsert（同一事务）
+        if history:
+            record_snapshots(conn, records, run_id)
+        for start in range(0, len(records), chunk_size):
+            conn.execute(stmt, records[start:start + chunk_size])
+    save_raw_data(engine_or_session, raw_by_key)
+    return len(records)
@@ -0,0 +1,225 @@
+"""
+properties 的增量 Parquet 导出
+按 抓取日期/区域 分区（hive目录: scrape_date=YYYY-MM-DD/area_name=新宿区/），
+每次只追加 updated_at 晚于上次水位的行；同一物件的多个版本在读取时按 id 取最新一版。
+每次导出同时写入当前物件id列表（_live_ids.parquet），读取时去掉已从数据库删除的物件（维护任务去重等）。
+分析和训练脚本用 load_parquet 按列读取，不再占用正在抓取的数据库
+用法: python -m database.export [--full]
+"""
+import os
+import sys
+import json
+import shutil
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import DateTime, Float, Integer, or_, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PARQUET_DIR
+from database.models import Property, get_engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖，只有Parquet导出/读取需要
+    pa = None
+    ds = None
+    pq = None
+
+
+PARTITION_COLUMNS = ['scrape_date', 'area_name']
+WATERMARK_FILE = '_watermark.json'
+# 导出时数据库中的全部物件id（以_开头，不会被当作数据集的分区文件读取）
+LIVE_IDS_FILE = '_live_ids.parquet'
+
+# 只导出 此刻-LAG 之前更新的行：导出开始时尚未提交的写入事务，下次导出仍能取到
+EXPORT_LAG_SECONDS = 60
+
+# 每次从数据库读取的行数
+EXPORT_CHUNK = 50_000
+
+properties_table = Property.__table__
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet导出/读取需要安装 pyarrow")
+
+
+def _arrow_schema():
+    """按表的列类型固定Arrow类型，避免各批次推断出不同的schema（如整列为空时）"""
+    fields = []
+    for column in properties_table.columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us')
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    fields.append(pa.field('scrape_date', pa.string()))
+    return pa.schema(fields)
+
+
+def read_watermark(root: str = PARQUET_DIR) -> Optional[Dict]:
+    path = os.path.join(root, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_watermark(root: str, data: Dict):
+    path = os.path.join(root, WATERMARK_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _write_live_ids(engine, root: str):
+    ids = pd.read_sql(select(properties_table.c.id), engine)['id']
+    path = os.path.join(root, LIVE_IDS_FILE)
+    tmp = path + '.tmp'
+    pq.write_table(pa.table({'id': pa.array(ids.to_numpy(), type=pa.int64())}), tmp)
+    os.replace(tmp, path)
+
+
+def read_live_ids(root: str = PARQUET_DIR) -> Optional[pd.Index]:
+    """上次导出时数据库中的物件id（旧的数据集没有该文件时返回None，即不过滤）"""
+    _require_pyarrow()
+    path = os.path.join(root, LIVE_IDS_FILE)
+    if not os.path.exists(path):
+        return None
+    return pd.Index(pq.read_table(path).column('id').to_numpy())
+
+
+def export_parquet(engine=None, root: str = PARQUET_DIR, full: bool = False,
+                   lag_seconds: int = EXPORT_LAG_SECONDS) -> int:
+    """
+    把上次导出后变更的物件追加到Parquet数据集
+    Args:
+        engine: 数据库引擎，默认 get_engine()
+        root: 数据集目录
+        full: 删除已有数据集后全量导出
+        lag_seconds: 只导出此刻-lag之前更新的行
+    Returns:
+        本次导出的行数
+    """
+    _require_pyarrow()
+    if engine is None:
+        engine = get_engine()
+    if full and os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root, exist_ok=True)
+
+    watermark = read_watermark(root)
+    since = datetime.fromisoformat(watermark['updated_at']) if watermark else None
+    until = datetime.now() - timedelta(seconds=lag_seconds)
+
+    updated_at = properties_table.c.updated_at
+    if since is None:
+        # 首次导出还包含 updated_at 为空的旧数据
+        query = select(properties_table).where(or_(updated_at <= until, updated_at.is_(None)))
+    else:
+        query = select(properties_table).where(updated_at > since, updated_at <= until)
+
+    schema = _arrow_schema()
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    exported = 0
+    latest = since
+    for i, df in enumerate(pd.read_sql(query, engine, chunksize=EXPORT_CHUNK)):
+        if df.empty:
+            continue
+        scraped_at = pd.to_datetime(df['scraped_at'], errors='coerce')
+        df['scrape_date'] = scraped_at.dt.strftime('%Y-%m-%d').fillna('unknown')
+        df['area_name'] = df['area_name'].fillna('unknown')
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        ds.write_dataset(
+            table, root, format='parquet', partitioning=PARTITION_COLUMNS,
+            partitioning_flavor='hive', basename_template=f'part-{run_id}-{i}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        exported += len(df)
+        chunk_latest = pd.to_datetime(df['updated_at'], errors='coerce').max()
+        if pd.notna(chunk_latest) and (latest is None or chunk_latest > latest):
+            latest = chunk_latest.to_pydatetime()
+
+    # 没有新变更时也要更新：期间可能有物件被删除
+    _write_live_ids(engine, root)
+
+    if latest is not None:
+        total = (watermark or {}).get('rows', 0) + exported
+        _write_watermark(root, {'updated_at': latest.isoformat(), 'exported_at': datetime.now().isoformat(),
+                                'rows': total})
+    return exported
+
+
+def load_parquet(columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+                 not_null: Optional[List[str]] = None, root: str = PARQUET_DIR,
+                 latest: bool = True) -> pd.DataFrame:
+    """
+    按列读取导出的数据集
+    Args:
+        columns: 需要的列，默认全部
+        filters: 分区列的等值条件 {'area_name': '新宿区'} 或 {'area_name': [...]}，只读取对应目录
+        not_null: 这些列为空的行去掉（在取最新版本之后过滤）
+        latest: 同一物件只保留最新一版
+    已从数据库删除的物件（不在上次导出的 _live_ids.parquet 中）不返回
+    """
+    _require_pyarrow()
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Parquet数据集不存在: {root}（先运行 python main.py export）")
+
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    names = dataset.schema.names
+    wanted = list(columns) if columns else [n for n in names if n not in PARTITION_COLUMNS or n == 'area_name']
+    live_ids = read_live_ids(root)
+    read = list(dict.fromkeys(wanted + (not_null or []) + (['id', 'updated_at'] if latest else [])
+                              + (['id'] if live_ids is not None else [])))
+
+    expression = None
+    for col, value in (filters or {}).items():
+        if col not in PARTITION_COLUMNS:
+            raise ValueError(f"filters只支持分区列 {PARTITION_COLUMNS}，其他条件请在读取后过滤")
+        cond = ds.field(col).isin(value) if isinstance(value, (list, tuple, set)) else ds.field(col) == value
+        expression = cond if expression is None else expression & cond
+
+    df = dataset.to_table(columns=read, filter=expression).to_pandas()
+    if latest and not df.empty:
+        df = df.sort_values('updated_at', kind='stable', na_position='first')
+        df = df.drop_duplicates('id', keep='last').sort_values('id')
+    if live_ids is not None:
+        df = df[df['id'].isin(live_ids)]
+    if not_null:
+        df = df.dropna(subset=not_null)
+    for col in PARTITION_COLUMNS:
+        # 写入时空值的分区目录名为 unknown
+        if col in df.columns:
+            df[col] = df[col].astype(object).where(df[col] != 'unknown', None)
+    return df[wanted].reset_index(drop=True)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='properties 增量导出为Parquet')
+    parser.add_argument('--full', action='store_true', help='删除已有数据集后全量导出')
+    parser.add_argument('--root', default=PARQUET_DIR, help='数据集目录')
+    args = parser.parse_args()
+
+    n = export_parquet(root=args.root, full=args.full)
+    watermark = read_watermark(args.root)
+    print(f"导出 {n} 行到 {args.root}")
+    if watermark:
+        print(f"水位: {watermark['updated_at']}，累计导出 {watermark['rows']} 行（含同一物件的多个版本）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+敷金/礼金的规范化
+原始值可能是月数（1.0 / '1ヶ月'）、金额（85000 / '8.5万円'）或文字（'―'），
+入库时统一换算为 月数 + 円 + 是否为零，训练和预测直接读取数值列
+"""
+import re
+from typing import Dict, Optional, Tuple
+
+
+# 原始字段 -> (类型字段, 月数列, 円列, 零标志列)
+FEE_FIELDS = {
+    'deposit': ('deposit_type', 'deposit_months', 'deposit_yen', 'zero_deposit'),
+    'key_money': ('key_money_type', 'key_money_months', 'key_money_yen', 'zero_key_money'),
+}
+
+# 表示"无"的文字
+NONE_MARKS = {'―', '-', '－', 'ー', 'なし', '無', '無し', '0'}
+
+# 数值大于此值时视为金额（円），否则视为月数（与train_model_v2的旧规则一致）
+MONTHS_MAX = 100
+
+_NUMBER = re.compile(r'([\d.]+)')
+
+
+def _number(text: str) -> Optional[float]:
+    m = _NUMBER.search(text.replace(',', ''))
+    if not m:
+        return None
+    try:
+        return float(m.group(1))
+    except ValueError:
+        return None
+
+
+def normalize_fee(value, rent=None, fee_type: Optional[str] = None) -> Tuple[Optional[float], Optional[int]]:
+    """
+    把敷金/礼金换算为 (月数, 円)，无法解析时返回 (None, None)
+    Args:
+        value: 原始值（数值或文字）
+        rent: 賃料（円），用于月数与金额互相换算
+        fee_type: 抓取时记录的类型（month / yen / none），优先于按数值大小推断
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return None, None
+
+    months = yen = None
+    if fee_type == 'none':
+        return 0.0, 0
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None, None
+        if text in NONE_MARKS:
+            return 0.0, 0
+        number = _number(text)
+        if number is None:
+            return None, None
+        if 'ヶ月' in text or 'ヵ月' in text or 'ケ月' in text or 'か月' in text:
+            months = number
+        elif '万円' in text:
+            yen = number * 10000
+        elif '円' in text:
+            yen = number
+        else:
+            value = number
+    if months is None and yen is None:
+        value = float(value)
+        if fee_type == 'yen' or (fee_type != 'month' and value > MONTHS_MAX):
+            yen = value
+        else:
+            months = value
+
+    rent = rent if rent and rent == rent and rent > 0 else None
+    if months is None:
+        months = round(yen / rent, 2) if rent else None
+    if yen is None:
+        yen = months * rent if rent else None
+    return months, (int(round(yen)) if yen is not None else None)
+
+
+def fill_fee_columns(record: Dict, source: Optional[Dict] = None) -> Dict:
+    """
+    根据 deposit / key_money（及 *_type）填写月数、円和零标志列；
+    source中没有该字段时不填写（不会覆盖已有的换算结果）
+    Args:
+        record: 要填写的记录（原地修改）
+        source: 读取原始值的记录，默认与record相同
+    """
+    source = record if source is None else source
+    rent = record.get('rent') if record.get('rent') is not None else source.get('rent')
+    for field, (type_field, months_col, yen_col, zero_col) in FEE_FIELDS.items():
+        if field not in source:
+            continue
+        months, yen = normalize_fee(source.get(field), rent, source.get(type_field))
+        record[months_col] = months
+        record[yen_col] = yen
+        if months is not None:
+            record[zero_col] = int(months == 0)
+        elif yen is not None:
+            record[zero_col] = int(yen == 0)
+        else:
+            record[zero_col] = None
+    return record
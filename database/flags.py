@@ -0,0 +1,208 @@
+"""
+設備/入居条件的位掩码
+facilities / conditions 原本是JSON或逗号分隔的文字，按固定词表在入库时解析为整数位掩码
+（facility_flags / condition_flags），筛选和特征提取用位运算，不再逐行解析文字。
+词表同步到 property_flags 表，便于在SQL中查看各位的含义
+"""
+import os
+import sys
+import re
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# 词表：(标签, 别名...)。位号 = 列表中的下标，只能在末尾追加，不能删除或调整顺序；
+# 追加后需新增一个迁移执行 sync_vocab 并重新回填。每类最多31个（PostgreSQL的INTEGER为有符号32位）
+FACILITY_VOCAB: List[Tuple[str, ...]] = [
+    ('エアコン', '冷暖房'),
+    ('バストイレ別', 'バス・トイレ別'),
+    ('室内洗濯機置場', '室内洗濯機', '室内洗濯'),
+    ('オートロック',),
+    ('宅配ボックス', '宅配BOX'),
+    ('フローリング',),
+    ('追い焚き', '追焚', '追いだき'),
+    ('浴室乾燥機', '浴室乾燥'),
+    ('インターネット', 'ネット無料', 'インターネット無料', '光ファイバー'),
+    ('駐車場',),
+    ('エレベーター', 'エレベータ'),
+    ('2階以上',),
+    ('角部屋',),
+    ('南向き',),
+    ('都市ガス',),
+    ('独立洗面台', '洗面所独立'),
+    ('システムキッチン',),
+    ('温水洗浄便座', 'ウォシュレット'),
+    ('TVモニタ付インターホン', 'モニター付インターホン', 'TVモニター付'),
+    ('駐輪場',),
+    ('ロフト',),
+    ('家具家電付', '家具付', '家電付'),
+]
+
+CONDITION_VOCAB: List[Tuple[str, ...]] = [
+    ('ペット可',),
+    ('楽器可',),
+    ('二人入居可', '2人入居可'),
+    ('女性限定',),
+    ('高齢者歓迎', '高齢者可'),
+    ('事務所利用可', '事務所可', 'SOHO'),
+    ('ルームシェア可',),
+    ('保証人不要',),
+    ('外国人可', '外国籍可'),
+    ('子供可', '子育て歓迎'),
+    ('フリーレント',),
+    ('即入居可', '即入居'),
+    # ペット相談（需协商）/ 保証会社利用可（需通过保证公司）与上面的ペット可 / 保証人不要含义不同，单独占位（迁移10）
+    ('ペット相談',),
+    ('保証会社利用可',),
+    # 〜相談 同样只是可以协商，不算作对应的〜可（迁移10）
+    ('楽器相談',),
+    ('二人入居相談', '2人入居相談'),
+    ('ルームシェア相談',),
+]
+
+VOCABS = {'facility': FACILITY_VOCAB, 'condition': CONDITION_VOCAB}
+
+# 位掩码列 -> 词表
+FLAG_COLUMNS = {'facility_flags': 'facility', 'condition_flags': 'condition'}
+
+# 标签后紧跟「無/なし/不可」表示没有该项（如 駐車場無、駐輪場：なし），不算命中；無料 除外
+_NEGATION = r'(?![\s:：]*(?:無(?!料)|なし|不可))'
+
+# 每个标签一个正则：任一别名出现且后面不是否定词
+_PATTERNS = {
+    kind: [re.compile('(?:' + '|'.join(re.escape(alias) for alias in entry) + ')' + _NEGATION) for entry in vocab]
+    for kind, vocab in VOCABS.items()
+}
+
+
+def _bits(kind: str) -> Dict[str, int]:
+    return {entry[0]: 1 << bit for bit, entry in enumerate(VOCABS[kind])}
+
+
+def _as_text(value) -> str:
+    """JSON列表/字典、逗号分隔文字或列表统一转为可搜索的文字"""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped[:1] in ('[', '{'):
+            try:
+                value = json.loads(stripped)
+            except ValueError:
+                return value
+        else:
+            return value
+    if isinstance(value, dict):
+        # {标签: true/false}：只取为真的项
+        return ','.join(str(k) for k, v in value.items() if v)
+    if isinstance(value, (list, tuple, set)):
+        return ','.join(str(v) for v in value)
+    return str(value)
+
+
+def encode_flags(value, kind: str) -> int:
+    """
+    把设备/条件文字解析为位掩码（「駐車場無」「駐輪場なし」之类的否定写法不算命中）
+    Args:
+        value: JSON文字 / 逗号分隔文字 / 列表 / 字典
+        kind: 'facility' 或 'condition'
+    """
+    content = _as_text(value)
+    if not content:
+        return 0
+    mask = 0
+    for bit, pattern in enumerate(_PATTERNS[kind]):
+        if pattern.search(content):
+            mask |= 1 << bit
+    return mask
+
+
+def decode_flags(mask: Optional[int], kind: str) -> List[str]:
+    """位掩码 -> 标签列表"""
+    if not mask:
+        return []
+    return [entry[0] for bit, entry in enumerate(VOCABS[kind]) if mask >> bit & 1]
+
+
+def mask_of(labels: Iterable[str], kind: str) -> int:
+    """标签列表 -> 位掩码（未知标签报错）"""
+    bits = _bits(kind)
+    mask = 0
+    for label in labels:
+        if label not in bits:
+            raise ValueError(f"未知的{kind}标签: {label}（可用: {', '.join(bits)}）")
+        mask |= bits[label]
+    return mask
+
+
+def fill_flag_columns(record: Dict, source: Optional[Dict] = None) -> Dict:
+    """
+    根据 facilities / conditions 填写 facility_flags / condition_flags。
+    设备和条件常混在一起（如设备里的ペット可），两个词表都在两段文字中查找
+    """
+    source = record if source is None else source
+    if 'facilities' not in source and 'conditions' not in source:
+        return record
+    content = ','.join(filter(None, (_as_text(source.get('facilities')), _as_text(source.get('conditions')))))
+    for column, kind in FLAG_COLUMNS.items():
+        record[column] = encode_flags(content, kind) if content else None
+    return record
+
+
+# ---- SQL ----
+
+def sql_has_all(column, labels: Sequence[str], kind: str):
+    """SQLAlchemy条件：包含全部标签，如 sql_has_all(Property.facility_flags, ['オートロック'], 'facility')"""
+    mask = mask_of(labels, kind)
+    return column.op('&')(mask) == mask
+
+
+def sql_has_any(column, labels: Sequence[str], kind: str):
+    """SQLAlchemy条件：包含任一标签"""
+    return column.op('&')(mask_of(labels, kind)) != 0
+
+
+def sync_vocab(conn):
+    """把词表写入 property_flags 表（位号固定，重复执行时更新别名）"""
+    conn.execute(text('DELETE FROM property_flags'))
+    rows = [{'kind': kind, 'bit': bit, 'mask': 1 << bit, 'label': entry[0], 'aliases': ','.join(entry[1:])}
+            for kind, vocab in VOCABS.items() for bit, entry in enumerate(vocab)]
+    conn.execute(text('INSERT INTO property_flags (kind, bit, mask, label, aliases) '
+                      'VALUES (:kind, :bit, :mask, :label, :aliases)'), rows)
+
+
+# ---- NumPy / pandas ----
+
+def _as_masks(masks) -> np.ndarray:
+    return np.nan_to_num(np.asarray(masks, dtype=np.float64), nan=0).astype(np.int64)
+
+
+def np_has_all(masks, labels: Sequence[str], kind: str) -> np.ndarray:
+    """位掩码数组中包含全部标签的行（缺失视为0）"""
+    mask = mask_of(labels, kind)
+    return (_as_masks(masks) & mask) == mask
+
+
+def np_has_any(masks, labels: Sequence[str], kind: str) -> np.ndarray:
+    return (_as_masks(masks) & mask_of(labels, kind)) != 0
+
+
+def flag_matrix(masks, kind: str, prefix: Optional[str] = None) -> pd.DataFrame:
+    """
+    位掩码展开为0/1特征列（每个标签一列），用于模型特征
+    Args:
+        masks: 位掩码Series/数组
+        prefix: 列名前缀，默认 kind + '_'
+    """
+    values = _as_masks(masks)
+    vocab = VOCABS[kind]
+    bits = (values[:, None] >> np.arange(len(vocab))) & 1
+    prefix = f"{kind}_" if prefix is None else prefix
+    index = masks.index if isinstance(masks, pd.Series) else None
+    return pd.DataFrame(bits.astype(np.int8), columns=[prefix + entry[0] for entry in vocab], index=index)
@@ -0,0 +1,123 @@
+"""
+物件历史（property_snapshots）
+upsert前把本批次与数据库中的当前值比较，有变化的字段追加一条快照，
+用于查看賃料/推定反響数随时间的变化。当前状态由视图 property_current 提供
+"""
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import select, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import Property, PropertySnapshot
+
+
+# 跟踪变化的字段（PropertySnapshot中的同名列）
+SNAPSHOT_FIELDS = ('rent', 'management_fee', 'deposit_months', 'key_money_months',
+                   'estimated_response', 'response_rank', 'available_date')
+
+# 本进程的抓取批次，未指定run_id时使用
+DEFAULT_RUN_ID = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+
+# 当前状态视图：properties按listing_key upsert后每个物件只有一行，直接投影常用列
+CURRENT_VIEW_SQL = '''
+CREATE VIEW property_current AS
+SELECT listing_key, property_name, room_number, area_name, address_city,
+       railway_line, station, walk_minutes, floor_plan, property_type, area_sqm, built_year,
+       rent, management_fee, deposit_months, key_money_months, estimated_response, response_rank,
+       available_date, scraped_at AS first_seen, updated_at AS last_seen
+FROM properties
+WHERE listing_key IS NOT NULL
+'''
+
+properties_table = Property.__table__
+snapshots_table = PropertySnapshot.__table__
+
+
+def create_current_view(conn):
+    """（重新）创建 property_current 视图"""
+    conn.execute(text('DROP VIEW IF EXISTS property_current'))
+    conn.execute(text(CURRENT_VIEW_SQL))
+
+
+def record_snapshots(conn, records: List[Dict], run_id: Optional[str] = None,
+                     chunk_size: int = 500) -> int:
+    """
+    与数据库中的当前值比较，为新物件和有变化的物件追加快照
+    Args:
+        conn: Connection 或 Session（与upsert在同一事务中）
+        records: prepare_property_rows 的输出（含listing_key）
+        run_id: 抓取批次，默认 DEFAULT_RUN_ID
+    Returns:
+        追加的快照数
+    """
+    run_id = run_id or DEFAULT_RUN_ID
+    now = datetime.now()
+    columns = [properties_table.c.listing_key] + [properties_table.c[f] for f in SNAPSHOT_FIELDS]
+    snapshots = []
+    for start in range(0, len(records), chunk_size):
+        batch = records[start:start + chunk_size]
+        current = {
+            row[0]: row[1:] for row in conn.execute(
+                select(*columns).where(properties_table.c.listing_key.in_([r['listing_key'] for r in batch]))
+            )
+        }
+        for record in batch:
+            old = current.get(record['listing_key'])
+            snapshot = {}
+            for i, field in enumerate(SNAPSHOT_FIELDS):
+                value = record.get(field)
+                # 新抓取中缺失的字段不会覆盖原值（upsert用COALESCE），也不算变化
+                if value is not None and (old is None or old[i] != value):
+                    snapshot[field] = value
+            if snapshot:
+                snapshots.append({
+                    'listing_key': record['listing_key'], 'run_id': run_id, 'captured_at': now,
+                    **{field: snapshot.get(field) for field in SNAPSHOT_FIELDS},
+                })
+    if snapshots:
+        conn.execute(snapshots_table.insert(), snapshots)
+    return len(snapshots)
+
+
+def listing_history(engine, listing_key: str, fill: bool = True) -> pd.DataFrame:
+    """
+    某物件的历史（按时间排序）
+    Args:
+        fill: 用之前的值填充未变化的字段，得到每次抓取时的完整状态
+    """
+    query = (select(snapshots_table.c.captured_at, snapshots_table.c.run_id,
+                    *[snapshots_table.c[f] for f in SNAPSHOT_FIELDS])
+             .where(snapshots_table.c.listing_key == listing_key)
+             .order_by(snapshots_table.c.captured_at, snapshots_table.c.id))
+    df = pd.read_sql(query, engine)
+    if fill and not df.empty:
+        df[list(SNAPSHOT_FIELDS)] = df[list(SNAPSHOT_FIELDS)].ffill()
+    return df
+
+
+def latest_changes(engine, field: str, since: Optional[datetime] = None) -> pd.DataFrame:
+    """
+    每个物件某字段最近一次变化（listing_key, captured_at, 值）
+    Args:
+        field: SNAPSHOT_FIELDS 之一
+        since: 只看这个时间之后的变化
+    """
+    if field not in SNAPSHOT_FIELDS:
+        raise ValueError(f"不跟踪的字段: {field}")
+    where = f'{field} IS NOT NULL' + (' AND captured_at >= :since' if since else '')
+    # (listing_key, captured_at) 索引：按物件分组取最大时间
+    sql = f'''
+        SELECT s.listing_key, s.captured_at, s.{field}
+        FROM property_snapshots s
+        JOIN (SELECT listing_key, MAX(captured_at) AS captured_at
+              FROM property_snapshots WHERE {where} GROUP BY listing_key) m
+          ON s.listing_key = m.listing_key AND s.captured_at = m.captured_at
+        WHERE s.{field} IS NOT NULL
+    '''
+    return pd.read_sql(text(sql), engine, params={'since': since} if since else None,
+                       parse_dates=['captured_at'])
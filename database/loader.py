@@ -0,0 +1,108 @@
+"""
+properties 的投影读取（DataFrame）
+只对需要的列发一条 SELECT，按列类型指定dtype（数值float64、时间datetime64、
+区域/駅/間取り等低基数文字列为category），大表可按 chunksize 分批读取；
+不再为每行创建ORM对象再 to_dict()
+"""
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import Property, get_engine
+
+
+properties_table = Property.__table__
+
+# 低基数的文字列，读取为category
+CATEGORY_COLUMNS = {
+    'address_prefecture', 'address_city', 'area_name', 'railway_line', 'station',
+    'floor_plan', 'property_type', 'structure', 'response_rank',
+}
+
+# 默认读取的列：Property.to_dict() 中的列（不含 listing_key/updated_at 等内部列）
+DEFAULT_COLUMNS = [c for c in Property().to_dict() if c in properties_table.c]
+
+# 每次从数据库读取的行数
+LOAD_CHUNK = 50_000
+
+
+def column_dtypes(columns: Sequence[str]) -> Dict[str, str]:
+    """properties列 -> pandas dtype（整数列可能为空，统一用float64）"""
+    dtypes = {}
+    for name in columns:
+        column = properties_table.c[name]
+        if name in CATEGORY_COLUMNS:
+            dtypes[name] = 'category'
+        elif column.primary_key:
+            dtypes[name] = 'int64'
+        elif isinstance(column.type, Boolean):
+            dtypes[name] = 'boolean'
+        elif isinstance(column.type, (Integer, Float)):
+            dtypes[name] = 'float64'
+        elif isinstance(column.type, DateTime):
+            dtypes[name] = 'datetime64[ns]'
+    return dtypes
+
+
+def apply_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """按 column_dtypes 转换（原地修改并返回），非properties列保持不变"""
+    dtypes = column_dtypes([c for c in df.columns if c in properties_table.c])
+    for name, dtype in dtypes.items():
+        if dtype == 'datetime64[ns]':
+            df[name] = pd.to_datetime(df[name], errors='coerce')
+        elif dtype == 'float64':
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype(dtype)
+        elif df[name].dtype != dtype:
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """合并各批次：各批次的category取并集，避免 concat 退化为object"""
+    if len(frames) == 1:
+        return frames[0]
+    columns = list(frames[0].columns)
+    categories = {col: union_categoricals([f[col] for f in frames])
+                  for col in columns if isinstance(frames[0][col].dtype, pd.CategoricalDtype)}
+    df = pd.concat([f.drop(columns=list(categories)) for f in frames], ignore_index=True)
+    for col, values in categories.items():
+        df[col] = values
+    return df[columns]
+
+
+def load_properties(columns: Optional[Sequence[str]] = None, where=None, engine=None,
+                    chunksize: Optional[int] = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    按列读取 properties
+    Args:
+        columns: 需要的列，默认 DEFAULT_COLUMNS
+        where: SQLAlchemy条件或条件列表，如 Property.estimated_response.isnot(None)
+        engine: 数据库引擎，默认 get_engine()
+        chunksize: 指定时返回按批次的迭代器（各批次的category互相独立）
+    Returns:
+        DataFrame，或 chunksize 指定时的 DataFrame 迭代器
+    """
+    columns = list(columns or DEFAULT_COLUMNS)
+    unknown = [c for c in columns if c not in properties_table.c]
+    if unknown:
+        raise ValueError(f"properties 中没有这些列: {unknown}")
+    if engine is None:
+        engine = get_engine()
+
+    query = select(*[properties_table.c[c] for c in columns])
+    if where is not None:
+        query = query.where(*(where if isinstance(where, (list, tuple)) else [where]))
+
+    chunks = (apply_dtypes(df) for df in pd.read_sql(query, engine, chunksize=chunksize or LOAD_CHUNK))
+    if chunksize:
+        return chunks
+    frames = list(chunks)
+    if not frames:
+        return apply_dtypes(pd.DataFrame(columns=columns))
+    return _concat(frames)
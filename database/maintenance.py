@@ -0,0 +1,283 @@
+"""
+数据库维护：去重、保留期清理、快照归档、VACUUM/ANALYZE
+- 去重：迁移2回填时重复的旧行保留了 listing_key 为空，这里按自然键删除（保留已有键的最新一行）
+- 原始数据：property_raw 只保留 RAW_RETENTION_DAYS 天内更新过的行（重新解析/调试用）
+- 快照：SNAPSHOT_RETENTION_DAYS 天之前的 property_snapshots 归档到压缩Parquet后删除，
+  每个物件补一条合并后的基线快照（run_id=archived），listing_history 的填充结果不变
+- 删除孤立的原始数据/特征行，全量重算反響数汇总（增量更新不会感知删除）
+- VACUUM + ANALYZE，报告回收的空间和常用查询执行计划的变化
+用法: python -m database.maintenance [--dry-run] [--no-vacuum] [--raw-days 90] [--snapshot-days 365]
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RAW_RETENTION_DAYS, SNAPSHOT_ARCHIVE_DIR, SNAPSHOT_RETENTION_DAYS
+from database.models import Property, PropertySnapshot, KEY_SOURCE_FIELDS, get_engine, make_listing_key
+from database.bulk import bulk_insert
+from database.history import SNAPSHOT_FIELDS
+from database.aggregates import refresh_aggregates
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow为可选依赖，没有时不归档（也不删除）快照
+    pa = None
+    pq = None
+
+
+# 归档后补写的合并快照的批次名
+ARCHIVE_RUN_ID = 'archived'
+
+# 按id删除时每条语句的id数
+DELETE_CHUNK = 500
+
+# 维护前后对比执行计划的查询（与各脚本中的常用查询相同）
+PLAN_QUERIES = [
+    ('训练数据', '''
+        SELECT rent, area_sqm, area_name, floor_plan, estimated_response FROM properties
+        WHERE estimated_response IS NOT NULL AND rent IS NOT NULL AND area_sqm IS NOT NULL
+    ''', {}),
+    ('区域内高反響', '''
+        SELECT COUNT(*), AVG(rent) FROM properties WHERE area_name = :area AND estimated_response >= 10
+    ''', {'area': '新宿区'}),
+    ('按区域分组', 'SELECT area_name, COUNT(*), AVG(estimated_response) FROM properties GROUP BY area_name', {}),
+    ('增量读取', 'SELECT id FROM properties WHERE updated_at > :since', {'since': datetime(2000, 1, 1)}),
+    ('物件历史', '''
+        SELECT * FROM property_snapshots WHERE listing_key = :key ORDER BY captured_at, id
+    ''', {'key': ''}),
+    ('特征表', '''
+        SELECT f.property_id FROM property_features f JOIN properties p ON p.id = f.property_id
+        WHERE f.version = :version AND p.rent IS NOT NULL ORDER BY f.property_id
+    ''', {'version': ''}),
+]
+
+properties_table = Property.__table__
+snapshots_table = PropertySnapshot.__table__
+
+
+def _delete_ids(conn, table, ids: List[int]):
+    for start in range(0, len(ids), DELETE_CHUNK):
+        conn.execute(table.delete().where(table.c.id.in_(ids[start:start + DELETE_CHUNK])))
+
+
+def dedupe_properties(conn, dry_run: bool = False) -> Tuple[int, int]:
+    """
+    listing_key 为空的行：键已被其他行占用的删除，其余回填键（按id从新到旧，与迁移2相同）
+    Returns:
+        (删除的重复行数, 回填键的行数)
+    """
+    fields = ', '.join(KEY_SOURCE_FIELDS)
+    rows = conn.execute(text(
+        f'SELECT id, {fields} FROM properties WHERE listing_key IS NULL ORDER BY id DESC'
+    )).mappings().all()
+    if not rows:
+        return 0, 0
+    taken = {key for (key,) in conn.execute(text(
+        'SELECT listing_key FROM properties WHERE listing_key IS NOT NULL'
+    ))}
+    duplicates, updates = [], []
+    for row in rows:
+        key = make_listing_key(dict(row))
+        if key in taken:
+            duplicates.append(row['id'])
+        else:
+            taken.add(key)
+            updates.append({'id': row['id'], 'key': key})
+    if not dry_run:
+        _delete_ids(conn, properties_table, duplicates)
+        if updates:
+            conn.execute(text('UPDATE properties SET listing_key = :key WHERE id = :id'), updates)
+    return len(duplicates), len(updates)
+
+
+def _count_or_delete(conn, table: str, where: str, params: Dict, dry_run: bool) -> int:
+    if dry_run:
+        return conn.execute(text(f'SELECT COUNT(*) FROM {table} WHERE {where}'), params).scalar()
+    return conn.execute(text(f'DELETE FROM {table} WHERE {where}'), params).rowcount
+
+
+def prune_raw(conn, days: int = RAW_RETENTION_DAYS, dry_run: bool = False) -> int:
+    """删除 days 天内没有更新过的原始数据"""
+    cutoff = datetime.now() - timedelta(days=days)
+    return _count_or_delete(conn, 'property_raw', 'updated_at < :cutoff', {'cutoff': cutoff}, dry_run)
+
+
+def prune_orphans(conn, dry_run: bool = False) -> Dict[str, int]:
+    """删除物件已不存在的原始数据/特征行（SQLite默认不执行外键级联）"""
+    return {table: _count_or_delete(conn, table, 'property_id NOT IN (SELECT id FROM properties)', {}, dry_run)
+            for table in ('property_raw', 'property_features')}
+
+
+def archive_snapshots(conn, days: int = SNAPSHOT_RETENTION_DAYS, root: str = SNAPSHOT_ARCHIVE_DIR,
+                      dry_run: bool = False) -> Tuple[int, Optional[str]]:
+    """
+    把 days 天之前的快照写入 root 下的Parquet（zstd压缩）后删除，
+    每个物件补一条合并快照（各字段取归档部分中最后一次的值），之后的历史仍能正确填充。
+    之前归档时写入的合并快照（run_id=archived）不再导出，只在该物件有新的快照归档时参与合并
+    Returns:
+        (归档的快照数, Parquet文件路径)
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    params = {'cutoff': cutoff, 'archived': ARCHIVE_RUN_ID}
+    if dry_run:
+        return conn.execute(text(
+            'SELECT COUNT(*) FROM property_snapshots WHERE captured_at < :cutoff AND run_id != :archived'
+        ), params).scalar(), None
+    if pq is None:
+        print("  没有安装 pyarrow，跳过快照归档")
+        return 0, None
+
+    df = pd.read_sql(text('SELECT * FROM property_snapshots WHERE captured_at < :cutoff ORDER BY id'),
+                     conn, params=params, parse_dates=['captured_at'])
+    archived = df[df['run_id'] != ARCHIVE_RUN_ID]
+    if archived.empty:
+        return 0, None
+
+    # 文件名带随机后缀并以独占模式创建，同一秒内多次运行也不会覆盖之前的归档
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, f"snapshots-{cutoff:%Y%m%d}-{datetime.now():%Y%m%d_%H%M%S}-"
+                              f"{uuid.uuid4().hex[:8]}.parquet")
+    with open(path, 'xb') as f:
+        pq.write_table(pa.Table.from_pandas(archived, preserve_index=False), f, compression='zstd')
+
+    # 有新快照归档的物件：与已有的合并快照一起合并
+    merged = df[df['listing_key'].isin(set(archived['listing_key']))]
+    # groupby.last 跳过空值：即每个字段最后一次记录的值
+    ordered = merged.sort_values(['captured_at', 'id'], kind='stable')
+    baseline = ordered.groupby('listing_key')[list(SNAPSHOT_FIELDS)].last()
+    baseline['captured_at'] = ordered.groupby('listing_key')['captured_at'].max()
+    baseline['run_id'] = ARCHIVE_RUN_ID
+    baseline = baseline.reset_index()
+
+    _delete_ids(conn, snapshots_table, merged['id'].tolist())
+    bulk_insert(conn, snapshots_table, baseline)
+    return len(archived), path
+
+
+def _database_path(engine) -> Optional[str]:
+    if engine.dialect.name != 'sqlite' or not engine.url.database:
+        return None
+    return engine.url.database
+
+
+def database_size(engine) -> Optional[int]:
+    """SQLite数据库文件（含WAL）的字节数"""
+    path = _database_path(engine)
+    if path is None:
+        return None
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def query_plans(engine) -> Dict[str, str]:
+    """PLAN_QUERIES 的执行计划（仅SQLite）"""
+    if engine.dialect.name != 'sqlite':
+        return {}
+    plans = {}
+    with engine.connect() as conn:
+        for name, sql, params in PLAN_QUERIES:
+            try:
+                rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params).all()
+            except Exception as e:  # 表不存在等
+                plans[name] = f'错误: {str(e).splitlines()[0]}'
+                continue
+            plans[name] = ' / '.join(row[3] for row in rows)
+    return plans
+
+
+def vacuum_analyze(engine):
+    """VACUUM（不能在事务中执行）+ ANALYZE，WAL模式下再截断WAL文件"""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.execute(text('VACUUM'))
+            conn.execute(text('ANALYZE'))
+            conn.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text('VACUUM ANALYZE'))
+
+
+def run_maintenance(engine=None, raw_days: int = RAW_RETENTION_DAYS,
+                    snapshot_days: int = SNAPSHOT_RETENTION_DAYS, archive_dir: str = SNAPSHOT_ARCHIVE_DIR,
+                    vacuum: bool = True, dry_run: bool = False) -> Dict:
+    """
+    执行全部维护步骤
+    Args:
+        engine: 数据库引擎，默认 get_engine()
+        raw_days: 原始数据保留天数
+        snapshot_days: 快照保留天数（更早的归档到 archive_dir）
+        vacuum: 是否执行 VACUUM/ANALYZE
+        dry_run: 只统计将被处理的行数，不修改数据库
+    Returns:
+        维护报告
+    """
+    if engine is None:
+        engine = get_engine()
+    report = {'dry_run': dry_run, 'size_before': database_size(engine), 'plans_before': query_plans(engine)}
+
+    with engine.begin() as conn:
+        report['duplicates_removed'], report['keys_backfilled'] = dedupe_properties(conn, dry_run)
+        report['raw_pruned'] = prune_raw(conn, raw_days, dry_run)
+        report['orphans_removed'] = prune_orphans(conn, dry_run)
+        report['snapshots_archived'], report['archive_file'] = archive_snapshots(
+            conn, snapshot_days, archive_dir, dry_run)
+
+    if not dry_run:
+        if report['duplicates_removed']:
+            refresh_aggregates(engine, full=True)
+        if vacuum:
+            vacuum_analyze(engine)
+
+    report['size_after'] = database_size(engine)
+    report['plans_after'] = query_plans(engine)
+    if report['size_before'] is not None:
+        report['reclaimed_bytes'] = report['size_before'] - report['size_after']
+    return report
+
+
+def print_report(report: Dict):
+    prefix = '（试运行，未修改）' if report['dry_run'] else ''
+    print(f"\n维护结果{prefix}:")
+    print(f"  重复物件删除: {report['duplicates_removed']}，回填listing_key: {report['keys_backfilled']}")
+    print(f"  过期原始数据: {report['raw_pruned']}")
+    print(f"  孤立行: " + ', '.join(f"{table} {n}" for table, n in report['orphans_removed'].items()))
+    print(f"  归档快照: {report['snapshots_archived']}" +
+          (f" -> {report['archive_file']}" if report['archive_file'] else ''))
+    if report.get('reclaimed_bytes') is not None:
+        mb = 1024 * 1024
+        print(f"  数据库大小: {report['size_before'] / mb:.1f}MB -> {report['size_after'] / mb:.1f}MB "
+              f"（回收 {report['reclaimed_bytes'] / mb:.1f}MB）")
+
+    changed = {name: (plan, report['plans_after'].get(name))
+               for name, plan in report['plans_before'].items() if plan != report['plans_after'].get(name)}
+    print(f"\n执行计划变化: {len(changed)} / {len(report['plans_before'])}")
+    for name, (before, after) in changed.items():
+        print(f"  [{name}]")
+        print(f"    前: {before}")
+        print(f"    后: {after}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数据库维护：去重、清理、快照归档、VACUUM/ANALYZE')
+    parser.add_argument('--raw-days', type=int, default=RAW_RETENTION_DAYS, help='原始数据保留天数')
+    parser.add_argument('--snapshot-days', type=int, default=SNAPSHOT_RETENTION_DAYS, help='快照保留天数')
+    parser.add_argument('--archive-dir', default=SNAPSHOT_ARCHIVE_DIR, help='快照归档目录')
+    parser.add_argument('--no-vacuum', action='store_true', help='不执行 VACUUM/ANALYZE')
+    parser.add_argument('--dry-run', action='store_true', help='只统计，不修改数据库')
+    args = parser.parse_args()
+
+    print_report(run_maintenance(raw_days=args.raw_days, snapshot_days=args.snapshot_days,
+                                 archive_dir=args.archive_dir, vacuum=not args.no_vacuum,
+                                 dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+数据库迁移
+create_all 只会创建不存在的表，已有表上新增的索引/列需要在这里补上。
+每个迁移有一个递增的版本号，已应用的版本记录在 schema_migrations 表中
+用法: python -m database.migrations [--status]
+"""
+import os
+import sys
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.fees import FEE_FIELDS, fill_fee_columns
+from database.history import SNAPSHOT_FIELDS, create_current_view
+from database.search import create_search_index
+from database.aggregates import refresh_aggregates
+from database.flags import FLAG_COLUMNS, fill_flag_columns, sync_vocab
+from database.models import (Property, PropertyRaw, PropertySnapshot, PropertyFlag, PropertyFeature,
+                             ResponseAggregate, get_engine,
+                             make_listing_key, compress_raw,
+                             KEY_SOURCE_FIELDS)
+
+
+# (版本号, 说明, 迁移函数(connection))
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """注册一个迁移"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, description VARCHAR(255), applied_at DATETIME)'
+    ))
+
+
+def applied_versions(conn) -> set:
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def _create_missing_indexes(conn, table, names: List[str]) -> List[str]:
+    """创建表上声明了但数据库中还没有的索引（只处理names中列出的）"""
+    if not inspect(conn).has_table(table.name):
+        return []
+    existing = {ix['name'] for ix in inspect(conn).get_indexes(table.name)}
+    created = []
+    for index in sorted(table.indexes, key=lambda ix: ix.name):
+        if index.name in names and index.name not in existing:
+            index.create(conn)
+            created.append(index.name)
+    return created
+
+
+@migration(1, 'properties 查询索引（反響数/区域/沿線・駅/間取り/抓取时间/训练数据）')
+def _add_property_indexes(conn):
+    created = _create_missing_indexes(conn, Property.__table__, [
+        'ix_properties_response', 'ix_properties_area_response', 'ix_properties_city',
+        'ix_properties_line_station', 'ix_properties_station', 'ix_properties_plan_response',
+        'ix_properties_scraped_at', 'ix_properties_training',
+    ])
+    if created:
+        print(f"  创建索引: {', '.join(created)}")
+    if conn.dialect.name == 'sqlite':
+        # 更新统计信息，让查询规划器知道各索引的选择性
+        conn.execute(text('ANALYZE'))
+
+
+def _add_missing_columns(conn, table, columns: List[str]) -> List[str]:
+    """ALTER TABLE 补上模型中新增的列"""
+    if not inspect(conn).has_table(table.name):
+        return []
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    added = []
+    for name in columns:
+        if name in existing:
+            continue
+        column = table.c[name]
+        col_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {col_type}'))
+        added.append(name)
+    return added
+
+
+@migration(2, 'properties.listing_key 自然键 + 唯一索引（回填已有数据）')
+def _add_listing_key(conn):
+    table = Property.__table__
+    if not inspect(conn).has_table(table.name):
+        return
+    _add_missing_columns(conn, table, ['listing_key'])
+
+    # 回填：重复的物件只有最新一行获得键，旧行保持NULL（之后由去重维护命令清理）
+    fields = ', '.join(KEY_SOURCE_FIELDS)
+    rows = conn.execute(text(
+        f'SELECT id, {fields} FROM properties WHERE listing_key IS NULL ORDER BY id DESC'
+    )).mappings().all()
+    taken = {row[0] for row in conn.execute(text(
+        'SELECT listing_key FROM properties WHERE listing_key IS NOT NULL'
+    ))}
+    updates = []
+    duplicates = 0
+    for row in rows:
+        key = make_listing_key(dict(row))
+        if key in taken:
+            duplicates += 1
+            continue
+        taken.add(key)
+        updates.append({'id': row['id'], 'key': key})
+    if updates:
+        conn.execute(text('UPDATE properties SET listing_key = :key WHERE id = :id'), updates)
+    print(f"  回填 listing_key: {len(updates)} 行，重复物件 {duplicates} 行（保留最新一行）")
+
+    _create_missing_indexes(conn, table, ['ux_properties_listing_key'])
+
+
+@migration(3, 'properties.raw_data 移到压缩的 property_raw 表')
+def _move_raw_data(conn):
+    PropertyRaw.__table__.create(conn, checkfirst=True)
+    if not inspect(conn).has_table('properties'):
+        return
+    if 'raw_data' not in {c['name'] for c in inspect(conn).get_columns('properties')}:
+        return
+
+    # 按id分批搬移，避免一次读入所有原始HTML
+    moved = raw_bytes = stored_bytes = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            'SELECT id, raw_data FROM properties WHERE id > :last AND raw_data IS NOT NULL '
+            'ORDER BY id LIMIT 1000'
+        ), {'last': last_id}).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        records = []
+        for property_id, raw in rows:
+            if not raw:
+                continue
+            data, codec = compress_raw(raw)
+            size = len(raw.encode('utf-8'))
+            records.append({'property_id': property_id, 'codec': codec, 'data': data,
+                            'raw_size': size, 'updated_at': datetime.now()})
+            raw_bytes += size
+            stored_bytes += len(data)
+        if records:
+            conn.execute(PropertyRaw.__table__.insert(), records)
+            moved += len(records)
+    print(f"  搬移原始数据: {moved} 行，{raw_bytes / 1024 / 1024:.1f}MB -> {stored_bytes / 1024 / 1024:.1f}MB")
+
+    if conn.dialect.name == 'sqlite' and sqlite3.sqlite_version_info < (3, 35, 0):
+        # 旧版SQLite不支持DROP COLUMN：清空该列，空间在VACUUM后回收
+        conn.execute(text('UPDATE properties SET raw_data = NULL'))
+    else:
+        conn.execute(text('ALTER TABLE properties DROP COLUMN raw_data'))
+
+
+@migration(4, 'properties 敷金/礼金数值列（月数/円/零标志，回填已有数据）')
+def _add_fee_columns(conn):
+    table = Property.__table__
+    if not inspect(conn).has_table(table.name):
+        return
+    columns = [col for cols in FEE_FIELDS.values() for col in cols[1:]]
+    _add_missing_columns(conn, table, columns)
+
+    rows = conn.execute(text(
+        'SELECT id, rent, deposit, key_money FROM properties '
+        'WHERE deposit IS NOT NULL OR key_money IS NOT NULL'
+    )).mappings().all()
+    updates = [fill_fee_columns({'id': row['id']}, source=dict(row)) for row in rows]
+    if updates:
+        assignments = ', '.join(f'{col} = :{col}' for col in columns)
+        conn.execute(text(f'UPDATE properties SET {assignments} WHERE id = :id'), updates)
+    parsed = sum(1 for u in updates if u['deposit_months'] is not None or u['key_money_months'] is not None)
+    print(f"  回填敷金/礼金: {len(updates)} 行，其中 {parsed} 行换算出月数")
+
+
+@migration(5, 'property_snapshots 物件历史 + property_current 视图（已有物件写入基线快照）')
+def _add_snapshots(conn):
+    PropertySnapshot.__table__.create(conn, checkfirst=True)
+    if not inspect(conn).has_table('properties'):
+        return
+    fields = ', '.join(SNAPSHOT_FIELDS)
+    result = conn.execute(text(
+        f"INSERT INTO property_snapshots (listing_key, run_id, captured_at, {fields}) "
+        f"SELECT listing_key, 'baseline', COALESCE(updated_at, scraped_at, :now), {fields} "
+        f"FROM properties WHERE listing_key IS NOT NULL"
+    ), {'now': datetime.now()})
+    print(f"  基线快照: {result.rowcount} 个物件")
+    create_current_view(conn)
+
+
+@migration(6, 'properties 設備/入居条件位掩码 + property_flags 词表（回填已有数据）')
+def _add_flag_columns(conn):
+    PropertyFlag.__table__.create(conn, checkfirst=True)
+    sync_vocab(conn)
+    table = Property.__table__
+    if not inspect(conn).has_table(table.name):
+        return
+    _add_missing_columns(conn, table, list(FLAG_COLUMNS))
+
+    rows = conn.execute(text(
+        'SELECT id, facilities, conditions FROM properties '
+        'WHERE facilities IS NOT NULL OR conditions IS NOT NULL'
+    )).mappings().all()
+    updates = [fill_flag_columns({'id': row['id']}, source=dict(row)) for row in rows]
+    if updates:
+        conn.execute(text('UPDATE properties SET facility_flags = :facility_flags, '
+                          'condition_flags = :condition_flags WHERE id = :id'), updates)
+    print(f"  回填設備/入居条件位掩码: {len(updates)} 行")
+
+
+@migration(7, 'property_features 模型特征存储（首次训练时由 refresh_features 计算）')
+def _add_feature_store(conn):
+    PropertyFeature.__table__.create(conn, checkfirst=True)
+
+
+@migration(8, 'property_search 物件名/住所/駅 FTS5(trigram) 全文索引 + 同步触发器（SQLite）')
+def _add_search_index(conn):
+    if not inspect(conn).has_table('properties'):
+        return
+    create_search_index(conn)
+
+
+@migration(9, 'response_aggregates 区域/沿線/駅/間取り反響数汇总 + properties.updated_at 索引')
+def _add_response_aggregates(conn):
+    ResponseAggregate.__table__.create(conn, checkfirst=True)
+    if not inspect(conn).has_table('properties'):
+        return
+    _create_missing_indexes(conn, Property.__table__, ['ix_properties_updated_at'])
+    n = refresh_aggregates(conn)
+    print(f"  汇总分组: {n} 个")
+
+
+@migration(10, 'property_flags 入居条件词表追加 ペット相談 / 保証会社利用可 / 楽器相談 / 二人入居相談 / ルームシェア相談'
+               '（不再算作对应的〜可 / 保証人不要）；駐車場無 等否定写法不再命中，重新回填')
+def _split_condition_aliases(conn):
+    if not inspect(conn).has_table('property_flags'):
+        return
+    sync_vocab(conn)
+    if not inspect(conn).has_table('properties'):
+        return
+    rows = conn.execute(text(
+        'SELECT id, facilities, conditions, facility_flags, condition_flags FROM properties '
+        'WHERE facilities IS NOT NULL OR conditions IS NOT NULL'
+    )).mappings().all()
+    # 只更新位掩码有变化的行，并更新 updated_at（增量导出/汇总重新读取这些行）
+    now = datetime.now()
+    updates = []
+    for row in rows:
+        record = fill_flag_columns({'id': row['id']}, source=dict(row))
+        if any(record[column] != row[column] for column in FLAG_COLUMNS):
+            updates.append({**record, 'now': now})
+    if updates:
+        conn.execute(text('UPDATE properties SET facility_flags = :facility_flags, condition_flags = :condition_flags, '
+                          'updated_at = :now WHERE id = :id'), updates)
+    print(f"  重新回填设备/入居条件位掩码: {len(updates)} 行")
+
+
+def migrate(engine=None, verbose: bool = True) -> List[int]:
+    """
+    应用所有未应用的迁移
+    Returns:
+        本次应用的版本号列表
+    """
+    if engine is None:
+        engine = get_engine()
+
+    applied = []
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    for version, description, func in MIGRATIONS:
+        if version in done:
+            continue
+        if verbose:
+            print(f"应用迁移 {version}: {description}")
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, description, applied_at) '
+                     'VALUES (:v, :d, :t)'),
+                {'v': version, 'd': description, 't': datetime.now()}
+            )
+        applied.append(version)
+    return applied
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='数据库迁移')
+    parser.add_argument('--status', action='store_true', help='只显示迁移状态')
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if args.status:
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            print(f"  [{'x' if version in done else ' '}] {version}: {description}")
+        return
+
+    applied = migrate(engine)
+    print(f"已应用 {len(applied)} 个迁移" if applied else "数据库已是最新")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,27 @@
 数据库模型定义
 根据Summo入稿的表头设计，对复合字段进行拆分
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import (create_engine, event, Column, Integer, String, Float, DateTime, Text, LargeBinary,
+                        ForeignKey, UniqueConstraint, Index, text)
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
+from typing import Tuple
+import threading
+import hashlib
+import sqlite3
+import zlib
 import os
 
+try:
+    import zstandard
+except ImportError:  # zstd为可选依赖，没有时用zlib
+    zstandard = None
+
+from config import (DATABASE_URL, SQLITE_CACHE_MB, SQLITE_MMAP_MB, SQLITE_BUSY_TIMEOUT,
+                    SQLITE_JOURNAL_MODE)
+
 Base = declarative_base()
 
 
@@ -17,10 +32,32 @@ class Property(Base):
     字段设计参考Summo入稿表头，并对复合字段进行拆分
     """
     __tablename__ = 'properties'
+    __table_args__ = (
+        # 按各脚本的查询模式建立索引（反響数筛选/排序、按区域/沿線/駅/間取り分组、按抓取时间增量读取）
+        Index('ix_properties_response', 'estimated_response'),
+        Index('ix_properties_area_response', 'area_name', 'estimated_response'),
+        Index('ix_properties_city', 'address_city'),
+        Index('ix_properties_line_station', 'railway_line', 'station'),
+        Index('ix_properties_station', 'station'),
+        Index('ix_properties_plan_response', 'floor_plan', 'estimated_response'),
+        Index('ix_properties_scraped_at', 'scraped_at'),
+        # 增量处理（Parquet导出/汇总表）按更新时间读取变化的行
+        Index('ix_properties_updated_at', 'updated_at'),
+        # 自然键：同一物件重复抓取时更新而不是新增一行
+        Index('ux_properties_listing_key', 'listing_key', unique=True),
+        # 训练数据（train_model_v2.load_training_data）只需要有賃料和面積的行；
+        # 全量读取时仍是顺序扫描，按区域/反響数统计训练样本时走这个部分索引
+        Index('ix_properties_training', 'area_name', 'estimated_response',
+              sqlite_where=text('rent IS NOT NULL AND area_sqm IS NOT NULL'),
+              postgresql_where=text('rent IS NOT NULL AND area_sqm IS NOT NULL')),
+    )
 
     # 主键
     id = Column(Integer, primary_key=True, autoincrement=True)
 
+    # 物件自然键（由物件名/号室/住所/駅/間取り/面積/築年生成，没有物件名等时加賃料/管理費，见 make_listing_key）
+    listing_key = Column(String(40), comment='物件识别键')
+
     # 物件基本信息（拆分后）
     property_name = Column(String(255), comment='物件名')
     room_number = Column(String(50), comment='号室')
@@ -53,10 +90,20 @@ class Property(Base):
     management_fee = Column(Integer, comment='管理費（円）')
     deposit = Column(String(50), comment='敷金')
     key_money = Column(String(50), comment='礼金')
+    # 敷金/礼金的数值形式（入库时由 database.fees 换算）
+    deposit_months = Column(Float, comment='敷金（月数）')
+    deposit_yen = Column(Integer, comment='敷金（円）')
+    zero_deposit = Column(Integer, comment='敷金なし（0/1）')
+    key_money_months = Column(Float, comment='礼金（月数）')
+    key_money_yen = Column(Integer, comment='礼金（円）')
+    zero_key_money = Column(Integer, comment='礼金なし（0/1）')
 
     # 设备和条件
     facilities = Column(Text, comment='設備（JSON形式）')
     conditions = Column(Text, comment='入居条件（JSON形式）')
+    # 按固定词表解析的位掩码（见 database.flags 和 property_flags 表）
+    facility_flags = Column(Integer, comment='設備位掩码')
+    condition_flags = Column(Integer, comment='入居条件位掩码')
 
     # 推定反響数（核心指标）
     estimated_response = Column(Integer, comment='推定反響数（件/月）')
@@ -67,8 +114,8 @@ class Property(Base):
     contract_period = Column(String(50), comment='契約期間')
     renewal_fee = Column(String(50), comment='更新料')
 
-    # 原始数据备份
-    raw_data = Column(Text, comment='原始HTML或JSON数据')
+    # 原始数据备份：压缩保存在 property_raw 表，访问 raw_data 时才加载（见 PropertyRaw）
+    raw = relationship('PropertyRaw', uselist=False, lazy='select', cascade='all, delete-orphan')
     source_url = Column(String(500), comment='来源URL')
 
     # 抓取相关
@@ -79,6 +126,20 @@ class Property(Base):
     def __repr__(self):
         return f"<Property(id={self.id}, name={self.property_name}, room={self.room_number}, response={self.estimated_response})>"
 
+    @property
+    def raw_data(self):
+        """原始HTML或行文本（按需从 property_raw 加载并解压）"""
+        return self.raw.text if self.raw is not None else None
+
+    @raw_data.setter
+    def raw_data(self, value):
+        if not value:
+            self.raw = None
+            return
+        if self.raw is None:
+            self.raw = PropertyRaw()
+        self.raw.text = value
+
     def to_dict(self):
         """转换为字典，方便数据分析使用"""
         return {
@@ -104,8 +165,14 @@ class Property(Base):
             'management_fee': self.management_fee,
             'deposit': self.deposit,
             'key_money': self.key_money,
+            'deposit_months': self.deposit_months,
+            'key_money_months': self.key_money_months,
+            'zero_deposit': self.zero_deposit,
+            'zero_key_money': self.zero_key_money,
             'facilities': self.facilities,
             'conditions': self.conditions,
+            'facility_flags': self.facility_flags,
+            'condition_flags': self.condition_flags,
             'estimated_response': self.estimated_response,
             'response_rank': self.response_rank,
             'available_date': self.available_date,
@@ -114,26 +181,356 @@ class Property(Base):
         }
 
 
+# 生成自然键的字段：物件本身的属性，不含賃料/反響数等会随时间变化的值
+LISTING_KEY_FIELDS = ('property_name', 'room_number', 'address_city', 'address_detail',
+                      'station', 'floor_plan', 'area_sqm', 'built_year')
+
+# 区分物件的字段：一覧页的简略数据（scrape_mass）没有这些字段时，同一駅・間取り・面積・築年的不同物件
+# 只靠上面的字段会得到相同的键，此时键中再加入賃料/管理費（賃料变化后视为另一条记录）
+IDENTITY_FIELDS = ('property_name', 'room_number', 'address_detail')
+FALLBACK_KEY_FIELDS = ('rent', 'management_fee')
+
+# make_listing_key 读取的全部字段（回填键时需要查询这些列）
+KEY_SOURCE_FIELDS = LISTING_KEY_FIELDS + FALLBACK_KEY_FIELDS
+
+
+def make_listing_key(data) -> str:
+    """
+    由物件属性生成稳定的识别键（SHA1前32位）
+    Args:
+        data: dict 或 Property
+    """
+    def get(field):
+        value = data.get(field) if isinstance(data, dict) else getattr(data, field, None)
+        if value is None:
+            return ''
+        try:
+            if value != value:  # NaN
+                return ''
+        except TypeError:
+            pass
+        if field == 'area_sqm':
+            return f"{float(value):.2f}"
+        if field in ('built_year', 'rent', 'management_fee'):
+            try:
+                return str(int(float(value)))
+            except ValueError:
+                pass
+        return ' '.join(str(value).split())
+
+    fields = LISTING_KEY_FIELDS
+    if not any(get(field) for field in IDENTITY_FIELDS):
+        fields += FALLBACK_KEY_FIELDS
+    raw = '|'.join(get(field) for field in fields)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+class ResponseAggregate(Base):
+    """
+    推定反響数的分组汇总（按 区域/沿線/駅/間取り）
+    由 database.aggregates.refresh_aggregates 在每次抓取后增量更新，
+    评估器和特征计算从这里读取高/中/低反響的分档
+    """
+    __tablename__ = 'response_aggregates'
+
+    dimension = Column(String(20), primary_key=True, comment='分组列（area_name/railway_line/station/floor_plan/all）')
+    value = Column(String(200), primary_key=True, comment='分组值')
+    count = Column(Integer, comment='物件数')
+    mean = Column(Float, comment='平均推定反響数')
+    p25 = Column(Float)
+    p50 = Column(Float)
+    p75 = Column(Float)
+    p90 = Column(Float)
+    source_updated_at = Column(DateTime, comment='计算时已包含的物件最新更新时间')
+    computed_at = Column(DateTime, default=datetime.now, comment='计算时间')
+
+    def __repr__(self):
+        return f"<ResponseAggregate({self.dimension}={self.value}, count={self.count}, mean={self.mean})>"
+
+
+class PropertyFeature(Base):
+    """
+    模型特征存储（按 物件id + 特征版本）
+    由 analysis.features.refresh_features 在物件更新后增量重算，训练直接读取；
+    列顺序即模型的特征顺序
+    """
+    __tablename__ = 'property_features'
+
+    property_id = Column(Integer, primary_key=True, comment='物件id')
+    version = Column(String(40), primary_key=True, comment='特征版本（定义+配置的哈希）')
+    source_updated_at = Column(DateTime, comment='计算时物件的更新时间')
+    computed_at = Column(DateTime, default=datetime.now, comment='计算时间')
+
+    # 基础特征
+    rent = Column(Float)
+    area_sqm = Column(Float)
+    built_year = Column(Float)
+    walk_minutes = Column(Float)
+    management_fee = Column(Float)
+    # 费用相关
+    total_rent = Column(Float)
+    deposit = Column(Float, comment='敷金（月数）')
+    key_money = Column(Float, comment='礼金（月数）')
+    initial_cost = Column(Float)
+    zero_deposit = Column(Float)
+    zero_key_money = Column(Float)
+    # 派生特征
+    rent_per_sqm = Column(Float)
+    total_rent_per_sqm = Column(Float)
+    age = Column(Float)
+    # 分类编码
+    city_encoded = Column(Float)
+    heat_level = Column(Float)
+    walk_level = Column(Float)
+    plan_type = Column(Float)
+    building_type = Column(Float)
+    rent_level = Column(Float)
+    area_level = Column(Float)
+
+    def __repr__(self):
+        return f"<PropertyFeature(property_id={self.property_id}, version={self.version})>"
+
+
+class PropertyFlag(Base):
+    """設備/入居条件词表：facility_flags / condition_flags 中各位的含义"""
+    __tablename__ = 'property_flags'
+
+    kind = Column(String(20), primary_key=True, comment='facility / condition')
+    bit = Column(Integer, primary_key=True, comment='位号')
+    mask = Column(Integer, nullable=False, comment='1 << bit')
+    label = Column(String(50), nullable=False, comment='标签')
+    aliases = Column(String(255), comment='匹配用的别名（逗号分隔）')
+
+    def __repr__(self):
+        return f"<PropertyFlag(kind={self.kind}, bit={self.bit}, label={self.label})>"
+
+
+class PropertySnapshot(Base):
+    """
+    物件历史（只追加）
+    每次抓取时与数据库中的当前值比较，只记录有变化的字段（其余为NULL）；
+    新物件的第一条快照记录全部字段。当前状态见视图 property_current
+    """
+    __tablename__ = 'property_snapshots'
+    __table_args__ = (
+        # 某物件的历史 / 每个物件的最新快照
+        Index('ix_snapshots_listing_time', 'listing_key', 'captured_at'),
+        Index('ix_snapshots_run', 'run_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    listing_key = Column(String(40), nullable=False, comment='物件识别键')
+    run_id = Column(String(40), nullable=False, comment='抓取批次')
+    captured_at = Column(DateTime, nullable=False, default=datetime.now, comment='记录时间')
+
+    # 跟踪的字段（NULL表示本次没有变化）
+    rent = Column(Integer, comment='賃料（円）')
+    management_fee = Column(Integer, comment='管理費（円）')
+    deposit_months = Column(Float, comment='敷金（月数）')
+    key_money_months = Column(Float, comment='礼金（月数）')
+    estimated_response = Column(Integer, comment='推定反響数（件/月）')
+    response_rank = Column(String(20), comment='反響ランク')
+    available_date = Column(String(50), comment='入居可能日')
+
+    def __repr__(self):
+        return f"<PropertySnapshot(listing_key={self.listing_key}, run={self.run_id}, rent={self.rent}, response={self.estimated_response})>"
+
+
+def compress_raw(value: str) -> Tuple[bytes, str]:
+    """压缩原始数据，返回 (压缩后数据, 编码名)"""
+    data = value.encode('utf-8')
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), 'zstd'
+    return zlib.compress(data, 6), 'zlib'
+
+
+def decompress_raw(data: bytes, codec: str) -> str:
+    """按编码名解压原始数据"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("该原始数据使用zstd压缩，需要安装 zstandard")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == 'zlib':
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+class PropertyRaw(Base):
+    """
+    物件原始数据（与properties一对一）
+    原始HTML/行文本体积大且只有重新解析和调试时才用到，单独压缩保存，
+    分析查询只读取properties的事实列
+    """
+    __tablename__ = 'property_raw'
+
+    property_id = Column(Integer, ForeignKey('properties.id', ondelete='CASCADE'), primary_key=True)
+    codec = Column(String(10), nullable=False, comment='压缩编码（zstd/zlib）')
+    data = Column(LargeBinary, nullable=False, comment='压缩后的原始数据')
+    raw_size = Column(Integer, comment='压缩前字节数')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
+    @property
+    def text(self) -> str:
+        return decompress_raw(self.data, self.codec)
+
+    @text.setter
+    def text(self, value: str):
+        self.data, self.codec = compress_raw(value)
+        self.raw_size = len(value.encode('utf-8'))
+
+    def __repr__(self):
+        return f"<PropertyRaw(property_id={self.property_id}, codec={self.codec}, size={self.raw_size})>"
+
+
+def iter_raw_data(conn, ids=None):
+    """
+    逐行读取原始数据（重新解析用），返回 (property_id, 原始文本)
+    Args:
+        conn: sqlite3连接（connect_sqlite）
+        ids: 只读取这些物件，默认全部
+    """
+    sql = 'SELECT property_id, codec, data FROM property_raw'
+    if ids is None:
+        batches = [None]
+    else:
+        ids = list(ids)
+        batches = [ids[i:i + 500] for i in range(0, len(ids), 500)]
+    for batch in batches:
+        if batch is None:
+            cursor = conn.execute(sql)
+        else:
+            cursor = conn.execute(f"{sql} WHERE property_id IN ({','.join('?' * len(batch))})", batch)
+        for property_id, codec, data in cursor:
+            yield property_id, decompress_raw(data, codec)
+
+
+class CrawlTask(Base):
+    """
+    抓取任务队列（多进程/多机器分工）
+    worker 领取任务时获得带过期时间的租约，工作中定期续约；租约过期的任务会被其他worker重新领取
+    """
+    __tablename__ = 'crawl_tasks'
+    __table_args__ = (
+        UniqueConstraint('area_name', 'page_start', name='uq_crawl_tasks_area_page'),
+        Index('ix_crawl_tasks_status_lease', 'status', 'lease_expires_at'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    area_name = Column(String(100), nullable=False, comment='市郡区名')
+    page_start = Column(Integer, nullable=False, default=1, comment='起始页')
+    page_end = Column(Integer, comment='结束页（含），为空表示到最后一页')
+
+    # pending / leased / done / failed
+    status = Column(String(20), nullable=False, default='pending', comment='任务状态')
+    worker_id = Column(String(100), comment='当前持有租约的worker')
+    lease_token = Column(String(64), comment='租约令牌（续约/完成时校验）')
+    lease_expires_at = Column(Float, comment='租约过期时间（UNIX时间戳）')
+    heartbeat_at = Column(Float, comment='最近一次续约时间')
+    attempts = Column(Integer, nullable=False, default=0, comment='已领取次数')
+
+    result_count = Column(Integer, comment='保存的物件数')
+    last_page = Column(Integer, comment='最后抓取的页码')
+    error = Column(Text, comment='最近一次失败原因')
+    created_at = Column(DateTime, default=datetime.now, comment='创建时间')
+    finished_at = Column(DateTime, comment='完成时间')
+
+    def __repr__(self):
+        return f"<CrawlTask(id={self.id}, area={self.area_name}, pages={self.page_start}-{self.page_end}, status={self.status})>"
+
+
+# 进程内共享的引擎和会话工厂（按数据库URL缓存），避免每次调用都重新建连接池
+_engines = {}
+_session_factories = {}
+_engine_lock = threading.Lock()
+
+
+# 本进程使用的SQLite日志模式（默认 SQLITE_JOURNAL_MODE，worker --shared-volume 时为 DELETE）
+_journal_mode = SQLITE_JOURNAL_MODE
+
+JOURNAL_MODES = ('WAL', 'DELETE', 'TRUNCATE', 'PERSIST')
+
+
+def set_sqlite_journal_mode(mode: str):
+    """
+    设置本进程之后打开的SQLite连接的日志模式，已创建的SQLite引擎会被丢弃（新连接使用新模式）
+    日志模式保存在数据库文件中：同一个文件的所有进程需使用相同的模式
+    """
+    global _journal_mode
+    mode = mode.upper()
+    if mode not in JOURNAL_MODES:
+        raise ValueError(f"不支持的SQLite日志模式: {mode}（可用: {', '.join(JOURNAL_MODES)}）")
+    with _engine_lock:
+        _journal_mode = mode
+        for url in [url for url in _engines if url.startswith('sqlite')]:
+            _engines.pop(url).dispose()
+
+
+def apply_sqlite_pragmas(dbapi_conn):
+    """
+    SQLite连接设置：日志模式（默认WAL，读写互不阻塞）、synchronous（WAL下NORMAL即可保证崩溃不损坏，
+    其他模式为FULL）、页缓存、内存映射读取（非WAL时关闭：共享卷上不可靠）、临时表放内存、等待写锁的超时
+    """
+    wal = _journal_mode == 'WAL'
+    cursor = dbapi_conn.cursor()
+    cursor.execute(f'PRAGMA journal_mode={_journal_mode}')
+    cursor.execute(f"PRAGMA synchronous={'NORMAL' if wal else 'FULL'}")
+    cursor.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}')
+    cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024 if wal else 0}')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}')
+    cursor.close()
+
+
 def get_engine(database_url=None):
-    """获取数据库引擎"""
+    """获取数据库引擎（同一URL在进程内只创建一次）"""
     if database_url is None:
-        database_url = os.getenv("DATABASE_URL", "sqlite:///data/properties.db")
-    return create_engine(database_url, echo=False)
+        database_url = DATABASE_URL
+    with _engine_lock:
+        engine = _engines.get(database_url)
+        if engine is None:
+            if database_url.startswith('sqlite'):
+                engine = create_engine(database_url, echo=False,
+                                       connect_args={'timeout': SQLITE_BUSY_TIMEOUT})
+                event.listen(engine, 'connect', lambda conn, _record: apply_sqlite_pragmas(conn))
+            else:
+                engine = create_engine(database_url, echo=False, pool_pre_ping=True)
+            _engines[database_url] = engine
+        return engine
 
 
 def get_session(engine=None):
-    """获取数据库会话"""
+    """获取数据库会话（会话工厂按引擎缓存）"""
     if engine is None:
         engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    with _engine_lock:
+        factory = _session_factories.get(engine)
+        if factory is None:
+            factory = _session_factories[engine] = sessionmaker(bind=engine)
+    return factory()
+
+
+def connect_sqlite(database_url=None) -> sqlite3.Connection:
+    """
+    直接用sqlite3连接数据库（pandas.read_sql等），与get_engine使用相同的连接设置
+    Args:
+        database_url: 数据库URL或文件路径，默认 DATABASE_URL
+    """
+    if database_url is None:
+        database_url = DATABASE_URL
+    path = make_url(database_url).database if '://' in database_url else database_url
+    conn = sqlite3.connect(path or ':memory:', timeout=SQLITE_BUSY_TIMEOUT)
+    apply_sqlite_pragmas(conn)
+    return conn
 
 
 def init_db(engine=None):
-    """初始化数据库，创建所有表"""
+    """初始化数据库，创建所有表，并对已有数据库执行未应用的迁移"""
+    from database.migrations import migrate
+
     if engine is None:
         engine = get_engine()
     Base.metadata.create_all(engine)
+    migrate(engine)
     print("数据库初始化完成")
     return engine
 
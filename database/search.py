@@ -0,0 +1,212 @@
+"""
+物件名/住所的全文检索（SQLite FTS5 + trigram分词）
+property_search 是 properties 的外部内容索引（property_name / address_detail / station），
+由触发器随 properties 的写入同步。查询时把名称拆成3字组做OR检索并按bm25排序，
+名称写法略有不同（"コーポ田中" / "コーポ 田中Ⅱ"）也能找到候选，不再逐行比较子串或翻页查找
+用法: python -m database.search 物件名 [--rent 85000] [--area 25.5]
+      python -m database.search --rebuild
+"""
+import os
+import sys
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import get_engine
+
+
+SEARCH_TABLE = 'property_search'
+SEARCH_COLUMNS = ('property_name', 'address_detail', 'station')
+
+# bm25 的列权重（与 SEARCH_COLUMNS 对应）：名称最重要
+COLUMN_WEIGHTS = (10.0, 3.0, 1.0)
+
+# 一次查询最多使用的3字组数（很长的住所只取前面部分）
+MAX_TRIGRAMS = 32
+
+# trigram分词需要 SQLite 3.34.0 以上
+MIN_SQLITE_VERSION = (3, 34, 0)
+
+# 默认的賃料/面積容差（与SUUMO等页面匹配时的经验值：±0.15万円, ±2㎡）
+RENT_TOLERANCE = 1500
+AREA_TOLERANCE = 2.0
+
+_CREATE_SQL = [
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        {', '.join(SEARCH_COLUMNS)}, content='properties', content_rowid='id', tokenize='trigram'
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS properties_search_ai AFTER INSERT ON properties BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS properties_search_ad AFTER DELETE ON properties BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+    END''',
+    # 重复抓取时upsert会SET所有列，只在检索列的值确实变化时才重建该行的索引
+    f'''CREATE TRIGGER IF NOT EXISTS properties_search_au AFTER UPDATE OF {', '.join(SEARCH_COLUMNS)} ON properties
+    WHEN {' OR '.join(f'old.{c} IS NOT new.{c}' for c in SEARCH_COLUMNS)}
+    BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in SEARCH_COLUMNS)});
+        INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + c for c in SEARCH_COLUMNS)});
+    END''',
+]
+
+
+def fts_unavailable_reason(conn) -> Optional[str]:
+    """不能创建全文索引的原因（非SQLite、SQLite版本过低、没有编译FTS5），可以创建时返回None"""
+    if conn.dialect.name != 'sqlite':
+        return f"{conn.dialect.name} 不支持FTS5"
+    version = conn.execute(text('SELECT sqlite_version()')).scalar()
+    if tuple(int(part) for part in version.split('.')[:3]) < MIN_SQLITE_VERSION:
+        return f"SQLite {version} 不支持trigram分词（需要 {'.'.join(map(str, MIN_SQLITE_VERSION))} 以上）"
+    if not conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        return f"SQLite {version} 没有编译FTS5"
+    return None
+
+
+def has_search_index(conn) -> bool:
+    if conn.dialect.name != 'sqlite':
+        return False
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': SEARCH_TABLE}).first() is not None
+
+
+def create_search_index(conn, rebuild: bool = True) -> bool:
+    """
+    创建 property_search 索引和同步触发器（仅SQLite），rebuild时从properties重建索引内容
+    不支持时只打印原因并跳过（search_properties 退回到LIKE），升级SQLite后用 --rebuild 创建
+    Returns:
+        是否创建了索引
+    """
+    reason = fts_unavailable_reason(conn)
+    if reason:
+        print(f"  {reason}，跳过全文索引")
+        return False
+    for sql in _CREATE_SQL:
+        conn.execute(text(sql))
+    if rebuild:
+        conn.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    return True
+
+
+def normalize(value: Optional[str]) -> str:
+    """全角/半角统一（NFKC），去掉空白"""
+    if not value:
+        return ''
+    return ''.join(unicodedata.normalize('NFKC', value).split())
+
+
+def _trigrams(value: str) -> List[str]:
+    grams = dict.fromkeys(value[i:i + 3] for i in range(len(value) - 2))
+    return list(grams)[:MAX_TRIGRAMS]
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_query(name: str, columns: Sequence[str] = SEARCH_COLUMNS) -> Optional[str]:
+    """
+    名称 -> FTS5 MATCH 表达式：原文和NFKC规范化后的3字组取OR（不足3字时返回None）
+    Args:
+        columns: 只在这些列中查找
+    """
+    grams = []
+    for variant in dict.fromkeys((''.join((name or '').split()), normalize(name))):
+        grams.extend(g for g in _trigrams(variant) if g not in grams)
+    if not grams:
+        return None
+    expression = ' OR '.join(_quote(g) for g in grams)
+    if tuple(columns) != SEARCH_COLUMNS:
+        expression = '{' + ' '.join(columns) + '} : (' + expression + ')'
+    return expression
+
+
+def search_properties(name: str, rent: Optional[float] = None, area_sqm: Optional[float] = None,
+                      columns: Sequence[str] = SEARCH_COLUMNS, limit: int = 10, engine=None,
+                      rent_tolerance: float = RENT_TOLERANCE,
+                      area_tolerance: float = AREA_TOLERANCE) -> List[Dict]:
+    """
+    查找与名称/住所相似的物件（按相似度排序）
+    Args:
+        name: 物件名或住所（SUUMO/REINS/Notion上的写法均可）
+        rent: 指定时只返回賃料在 ±rent_tolerance 以内的物件
+        area_sqm: 指定时只返回面積在 ±area_tolerance 以内的物件
+        columns: 在哪些列中查找，默认 SEARCH_COLUMNS
+        limit: 最多返回的候选数
+    Returns:
+        [{id, listing_key, property_name, room_number, address_detail, station, rent, area_sqm, score}]，
+        score越小越相似（bm25）
+    """
+    if engine is None:
+        engine = get_engine()
+    params = {'limit': limit}
+    where = []
+    if rent is not None:
+        where.append('p.rent BETWEEN :rent_min AND :rent_max')
+        params.update(rent_min=rent - rent_tolerance, rent_max=rent + rent_tolerance)
+    if area_sqm is not None:
+        where.append('p.area_sqm BETWEEN :area_min AND :area_max')
+        params.update(area_min=area_sqm - area_tolerance, area_max=area_sqm + area_tolerance)
+
+    select_columns = ('p.id, p.listing_key, p.property_name, p.room_number, p.address_detail, '
+                      'p.station, p.rent, p.area_sqm')
+    with engine.connect() as conn:
+        indexed = has_search_index(conn)
+    expression = match_query(name, columns) if indexed else None
+    if expression is None:
+        # trigram无法检索不足3字的名称（或没有全文索引），退回到LIKE
+        column = columns[0]
+        where.insert(0, f'p.{column} LIKE :pattern')
+        params['pattern'] = f"%{(name or '').strip()}%"
+        sql = f'''
+            SELECT {select_columns}, 0.0 AS score FROM properties p
+            WHERE {' AND '.join(where)} ORDER BY length(p.{column}) LIMIT :limit
+        '''
+    else:
+        where.insert(0, f'{SEARCH_TABLE} MATCH :query')
+        params['query'] = expression
+        weights = ', '.join(str(w) for w in COLUMN_WEIGHTS)
+        sql = f'''
+            SELECT {select_columns}, bm25({SEARCH_TABLE}, {weights}) AS score
+            FROM {SEARCH_TABLE} JOIN properties p ON p.id = {SEARCH_TABLE}.rowid
+            WHERE {' AND '.join(where)}
+            ORDER BY score LIMIT :limit
+        '''
+    with engine.connect() as conn:
+        return [dict(row) for row in conn.execute(text(sql), params).mappings()]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='按物件名/住所查找候选物件')
+    parser.add_argument('name', nargs='?', help='物件名或住所')
+    parser.add_argument('--rent', type=float, help='賃料（円）')
+    parser.add_argument('--area', type=float, help='面積（㎡）')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true', help='创建/重建全文索引（升级SQLite后补建）')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        with get_engine().begin() as conn:
+            if create_search_index(conn):
+                print("全文索引已重建")
+    if not args.name:
+        if not args.rebuild:
+            parser.error('需要物件名或 --rebuild')
+        return
+
+    for row in search_properties(args.name, rent=args.rent, area_sqm=args.area, limit=args.limit):
+        print(f"{row['score']:8.2f}  #{row['id']} {row['property_name']} {row['room_number'] or ''}  "
+              f"{row['rent']} 円 / {row['area_sqm']} ㎡  {row['address_detail'] or ''} {row['station'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+抓取任务队列（租约 + 心跳）
+多个进程/机器共享同一个数据库，各自用自己的账号会话抓取：
+（同一台机器上的多个进程可以共用SQLite文件；多台机器通过共享卷使用SQLite文件时，所有进程都要用DELETE日志模式
+ —— SQLITE_JOURNAL_MODE=DELETE 或 worker --shared-volume，WAL不能跨主机。多台机器建议使用PostgreSQL等数据库服务器）
+- worker 领取一个区域（或区域内的页码范围），获得带过期时间的租约
+- 工作中后台线程定期续约；租约丢失时 worker 在下一页之前停止
+- 完成后释放；worker 崩溃后租约过期，任务自动被其他 worker 重新领取
+领取使用带条件的单条 UPDATE（比较并交换），不依赖跨进程锁
+"""
+import os
+import sys
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update, insert, func, or_, and_
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATABASE_URL, LEASE_TTL_SECONDS, TASK_MAX_ATTEMPTS
+from database.models import Base, CrawlTask, get_engine, set_sqlite_journal_mode
+from database.bulk import _dialect_insert
+
+
+tasks = CrawlTask.__table__
+
+
+class LeaseLost(Exception):
+    """租约已过期并被其他worker领取"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """一个已领取的任务；后台线程定期续约"""
+
+    def __init__(self, queue: 'WorkQueue', task: Dict, token: str):
+        self.queue = queue
+        self.task = task
+        self.token = token
+        self.lost = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+
+    @property
+    def id(self) -> int:
+        return self.task['id']
+
+    def __getitem__(self, key):
+        return self.task[key]
+
+    def _heartbeat_loop(self):
+        interval = max(self.queue.lease_ttl / 3, 1)
+        while not self._stop_event.wait(interval):
+            try:
+                if not self.queue.heartbeat(self):
+                    self.lost = True
+                    print(f"  [任务队列] 任务 {self.id} 的租约已丢失")
+                    return
+            except Exception as e:
+                # 数据库暂时不可用时下次再试，租约TTL内恢复即可
+                print(f"  [任务队列] 续约失败: {e}")
+
+    def check(self):
+        """在每页之前调用，租约丢失时停止当前任务"""
+        if self.lost:
+            raise LeaseLost(f"任务 {self.id} ({self.task['area_name']}) 的租约已丢失")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        return False
+
+
+class WorkQueue:
+    """基于数据库表 crawl_tasks 的任务队列"""
+
+    def __init__(self, database_url: str = DATABASE_URL, worker_id: Optional[str] = None,
+                 lease_ttl: int = LEASE_TTL_SECONDS, max_attempts: int = TASK_MAX_ATTEMPTS,
+                 journal_mode: Optional[str] = None):
+        """
+        Args:
+            database_url: 数据库URL（与properties使用同一个库，结果直接写入properties表）
+            worker_id: worker标识，默认 主机名-进程号
+            lease_ttl: 租约有效期（秒），worker每 ttl/3 续约一次
+            max_attempts: 同一任务最多领取次数，超过后标记为failed
+            journal_mode: SQLite日志模式（共享卷上为 'DELETE'），对本进程的所有SQLite连接生效，默认 SQLITE_JOURNAL_MODE
+        """
+        if journal_mode:
+            set_sqlite_journal_mode(journal_mode)
+        self.engine = get_engine(database_url)
+        Base.metadata.create_all(self.engine, tables=[tasks])
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+
+    def enqueue_areas(self, areas: List[str], pages_per_task: Optional[int] = None,
+                      max_pages: int = 20) -> int:
+        """
+        按区域（或区域内的页码范围）生成任务，已存在的任务不重复添加
+        Args:
+            areas: 区域列表
+            pages_per_task: 每个任务的页数，None表示一个区域一个任务
+            max_pages: 每个区域最多抓取的页数
+        Returns:
+            新增任务数
+        """
+        rows = []
+        for area in areas:
+            if not pages_per_task:
+                rows.append({'area_name': area, 'page_start': 1, 'page_end': max_pages})
+                continue
+            for start in range(1, max_pages + 1, pages_per_task):
+                rows.append({'area_name': area, 'page_start': start,
+                             'page_end': min(start + pages_per_task - 1, max_pages)})
+
+        with self.engine.begin() as conn:
+            before = conn.execute(select(func.count()).select_from(tasks)).scalar()
+            now = datetime.now()
+            rows = [{'status': 'pending', 'attempts': 0, 'created_at': now, **row} for row in rows]
+            dialect_insert = _dialect_insert(conn.dialect.name)
+            if dialect_insert is not None:
+                conn.execute(dialect_insert(tasks).on_conflict_do_nothing(
+                    index_elements=['area_name', 'page_start']), rows)
+            else:
+                # 其他数据库不支持ON CONFLICT：逐行检查是否已存在
+                for row in rows:
+                    exists = conn.execute(select(tasks.c.id).where(
+                        tasks.c.area_name == row['area_name'], tasks.c.page_start == row['page_start']
+                    )).first()
+                    if exists is None:
+                        conn.execute(insert(tasks).values(**row))
+            after = conn.execute(select(func.count()).select_from(tasks)).scalar()
+        return after - before
+
+    def _claimable(self, now: float):
+        """可领取的条件：待处理，或租约已过期"""
+        return or_(
+            tasks.c.status == 'pending',
+            and_(tasks.c.status == 'leased', tasks.c.lease_expires_at < now),
+        )
+
+    def claim(self) -> Optional[Lease]:
+        """
+        领取一个任务（优先页码小的，同一区域的前面几页先抓）
+        Returns:
+            Lease，没有可领取的任务时返回None
+        """
+        while True:
+            now = time.time()
+            with self.engine.begin() as conn:
+                # 重试次数用尽的过期任务不再领取
+                conn.execute(
+                    update(tasks)
+                    .where(self._claimable(now), tasks.c.attempts >= self.max_attempts)
+                    .values(status='failed', worker_id=None, lease_token=None)
+                )
+                row = conn.execute(
+                    select(tasks).where(self._claimable(now))
+                    .order_by(tasks.c.page_start, tasks.c.id).limit(1)
+                ).mappings().first()
+                if row is None:
+                    return None
+
+                token = uuid.uuid4().hex
+                # 比较并交换：只有仍可领取时才更新成功，避免两个worker拿到同一任务
+                result = conn.execute(
+                    update(tasks)
+                    .where(tasks.c.id == row['id'], self._claimable(now))
+                    .values(status='leased', worker_id=self.worker_id, lease_token=token,
+                            lease_expires_at=now + self.lease_ttl, heartbeat_at=now,
+                            attempts=tasks.c.attempts + 1)
+                )
+            if result.rowcount == 1:
+                if row['status'] == 'leased':
+                    print(f"  [任务队列] 回收过期租约: {row['area_name']} (原worker: {row['worker_id']})")
+                return Lease(self, dict(row), token)
+
+    def _owned(self, lease: Lease):
+        return and_(tasks.c.id == lease.id, tasks.c.lease_token == lease.token,
+                    tasks.c.status == 'leased')
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """续约，返回False表示租约已被回收"""
+        now = time.time()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(tasks).where(self._owned(lease))
+                .values(lease_expires_at=now + self.lease_ttl, heartbeat_at=now)
+            )
+        return result.rowcount == 1
+
+    def complete(self, lease: Lease, result_count: int, last_page: int,
+                 area_exhausted: bool = False) -> bool:
+        """
+        完成并释放任务
+        Args:
+            area_exhausted: 该区域已没有更多符合条件的页面，同区域后续页码范围直接标记完成
+        """
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(tasks).where(self._owned(lease))
+                .values(status='done', result_count=result_count, last_page=last_page,
+                        lease_token=None, lease_expires_at=None, error=None,
+                        finished_at=datetime.now())
+            )
+            if area_exhausted:
+                conn.execute(
+                    update(tasks)
+                    .where(tasks.c.area_name == lease['area_name'],
+                           tasks.c.page_start > last_page,
+                           tasks.c.status == 'pending')
+                    .values(status='done', result_count=0, error='区域已无更多页面',
+                            finished_at=datetime.now())
+                )
+        return result.rowcount == 1
+
+    def fail(self, lease: Lease, error: str, last_page: Optional[int] = None):
+        """释放失败的任务：未超过重试次数时放回队列，否则标记为failed"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(tasks).where(self._owned(lease))
+                .values(status='pending' if lease['attempts'] + 1 < self.max_attempts else 'failed',
+                        worker_id=None, lease_token=None, lease_expires_at=None,
+                        last_page=last_page, error=error[:1000])
+            )
+
+    def summary(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(tasks.c.status, func.count()).group_by(tasks.c.status)
+            ).all()
+        return {status: count for status, count in rows}
+
+    def reset_failed(self) -> int:
+        """把failed任务放回队列"""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(tasks).where(tasks.c.status == 'failed')
+                .values(status='pending', attempts=0, error=None)
+            )
+        return result.rowcount
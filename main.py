@@ -10,7 +10,7 @@ import argparse
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 
-def run_scraper(headless: bool = False):
+def run_scraper(headless: bool = False, profile_memory: bool = False):
     """运行爬虫抓取数据"""
     from scraper.scraper import SummoScraper
 
@@ -18,7 +18,7 @@ def run_scraper(headless: bool = False):
     print("启动数据抓取...")
     print("=" * 50)
 
-    scraper = SummoScraper(headless=headless)
+    scraper = SummoScraper(headless=headless, profile_memory=profile_memory)
 
     try:
         scraper.start()
@@ -45,7 +45,7 @@ def run_scraper(headless: bool = False):
         scraper.stop()
 
 
-def run_analysis():
+def run_analysis(backend: str = None):
     """运行数据分析"""
     from analysis.analyzer import PropertyAnalyzer
 
@@ -53,7 +53,7 @@ def run_analysis():
     print("启动数据分析...")
     print("=" * 50)
 
-    analyzer = PropertyAnalyzer()
+    analyzer = PropertyAnalyzer(backend=backend)
 
     try:
         analyzer.run_full_analysis()
@@ -111,6 +111,111 @@ def inspect_page(url: str = None):
         scraper.stop()
 
 
+def enqueue_tasks(areas: str = None, pages_per_task: int = None):
+    """把区域（或区域内的页码范围）加入抓取任务队列"""
+    from database.work_queue import WorkQueue
+
+    print("=" * 50)
+    print("生成抓取任务...")
+    print("=" * 50)
+
+    if areas:
+        area_list = [a.strip() for a in areas.split(',') if a.strip()]
+    else:
+        # 从页面获取区域列表（有未过期的缓存时直接使用）
+        from scraper.scraper import SummoScraper
+        scraper = SummoScraper()
+        area_list = scraper.nav_cache.get_areas()
+        if not area_list:
+            try:
+                scraper.start()
+                if not scraper.login() or not scraper.navigate_to_property_search():
+                    print("登录或导航失败，无法获取区域列表")
+                    return
+                area_list = scraper.get_tokyo_areas()
+            finally:
+                scraper.stop()
+
+    queue = WorkQueue()
+    added = queue.enqueue_areas(area_list, pages_per_task=pages_per_task)
+    print(f"新增 {added} 个任务，队列状态: {queue.summary()}")
+
+
+def run_worker(headless: bool = False, worker_id: str = None, max_tasks: int = None,
+               profile_memory: bool = False, shared_volume: bool = False):
+    """
+    作为任务队列的worker抓取（可在多台机器/多个账号上同时运行）
+    shared_volume: SQLite文件在共享卷上（多台机器）时使用DELETE日志模式（WAL不能跨主机）
+    """
+    from scraper.scraper import SummoScraper
+    from database.work_queue import WorkQueue
+
+    print("=" * 50)
+    print("启动抓取worker...")
+    print("=" * 50)
+
+    queue = WorkQueue(worker_id=worker_id, journal_mode='DELETE' if shared_volume else None)
+    scraper = SummoScraper(headless=headless, profile_memory=profile_memory)
+
+    try:
+        # 每个worker启动自己的浏览器：多个worker连接同一个常驻浏览器会共用同一个页面和登录会话
+        scraper.start(use_daemon=False)
+
+        if not scraper.login():
+            print("登录失败，请检查 .env 文件中的账号密码配置")
+            return
+
+        if not scraper.navigate_to_property_search():
+            print("导航到搜索页面失败")
+            return
+
+        scraper.run_worker(queue, max_tasks=max_tasks)
+
+    except KeyboardInterrupt:
+        print("\n用户中断，未完成的任务将在租约过期后被其他worker接手")
+    finally:
+        scraper.stop()
+
+
+def export_snapshot(full: bool = False):
+    """把上次导出后变更的物件追加到Parquet数据集（供分析/训练读取）"""
+    from database.export import export_parquet, read_watermark
+    from config import PARQUET_DIR
+
+    print("=" * 50)
+    print("导出Parquet快照...")
+    print("=" * 50)
+
+    n = export_parquet(full=full)
+    watermark = read_watermark()
+    print(f"导出 {n} 行到 {PARQUET_DIR}")
+    if watermark:
+        print(f"水位: {watermark['updated_at']}")
+
+
+def run_browser_daemon(headless: bool = False, port: int = None, login: bool = True):
+    """运行常驻浏览器，供后续抓取任务通过CDP连接复用"""
+    from scraper.browser_daemon import run_daemon
+    from config import BROWSER_CDP_PORT
+
+    print("=" * 50)
+    print("启动常驻浏览器...")
+    print("=" * 50)
+
+    run_daemon(headless=headless, port=port or BROWSER_CDP_PORT, login=login)
+
+
+def run_maintenance(dry_run: bool = False):
+    """数据库维护：去重、清理过期原始数据、归档旧快照、VACUUM/ANALYZE"""
+    from database.maintenance import run_maintenance as maintain, print_report
+
+    print("=" * 50)
+    print("数据库维护...")
+    print("=" * 50)
+
+    print_report(maintain(dry_run=dry_run))
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -120,15 +225,23 @@ def main():
 示例用法:
   python main.py init        # 初始化数据库
   python main.py scrape      # 运行爬虫抓取数据
+  python main.py scrape --profile-memory  # 抓取并报告每个区域的内存增长
   python main.py analyze     # 运行数据分析
+  python main.py analyze --backend duckdb  # 分组统计用DuckDB执行（可与pandas后端对比结果）
   python main.py inspect     # 检查页面结构（调试用）
   python main.py all         # 运行完整流程（抓取+分析）
+  python main.py daemon      # 启动常驻浏览器（之后的抓取任务自动连接复用）
+  python main.py enqueue     # 生成抓取任务（每个区域一个任务，--pages-per-task 按页码拆分）
+  python main.py worker      # 领取任务并抓取（多个进程/机器可同时运行；多台机器共享SQLite文件时加 --shared-volume）
+  python main.py export      # 增量导出Parquet快照（--full 全量重建）
+  python main.py maintain    # 去重、清理过期原始数据、归档旧快照、VACUUM/ANALYZE（--dry-run 只统计）
         """
     )
 
     parser.add_argument(
         'command',
-        choices=['init', 'scrape', 'analyze', 'inspect', 'all'],
+        choices=['init', 'scrape', 'analyze', 'inspect', 'all', 'daemon', 'enqueue', 'worker', 'export',
+                 'maintain'],
         help='要执行的命令'
     )
 
@@ -138,30 +251,113 @@ def main():
         help='使用无头模式运行爬虫'
     )
 
+    parser.add_argument(
+        '--profile-memory',
+        action='store_true',
+        help='开启内存剖析：定期记录Python堆、浏览器RSS和JS句柄数（用于scrape命令）'
+    )
+
     parser.add_argument(
         '--url',
         type=str,
         help='指定要检查的URL（用于inspect命令）'
     )
 
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='常驻浏览器的CDP端口（用于daemon命令）'
+    )
+
+    parser.add_argument(
+        '--no-login',
+        action='store_true',
+        help='常驻浏览器启动时不自动登录（用于daemon命令）'
+    )
+
+    parser.add_argument(
+        '--areas',
+        type=str,
+        help='逗号分隔的区域列表（用于enqueue命令，默认从页面获取）'
+    )
+
+    parser.add_argument(
+        '--pages-per-task',
+        type=int,
+        help='每个任务的页数（用于enqueue命令，默认一个区域一个任务）'
+    )
+
+    parser.add_argument(
+        '--worker-id',
+        type=str,
+        help='worker标识（用于worker命令，默认 主机名-进程号）'
+    )
+
+    parser.add_argument(
+        '--shared-volume',
+        action='store_true',
+        help='SQLite文件在多台机器共享的卷上（用于worker命令，使用DELETE日志模式；enqueue等其他命令设置 SQLITE_JOURNAL_MODE=DELETE）'
+    )
+
+    parser.add_argument(
+        '--max-tasks',
+        type=int,
+        help='最多处理的任务数（用于worker命令，默认直到队列为空）'
+    )
+
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='删除已有数据集后全量导出（用于export命令）'
+    )
+
+    parser.add_argument(
+        '--backend',
+        choices=['pandas', 'duckdb'],
+        help='分析的分组统计后端（用于analyze命令，默认 ANALYTICS_BACKEND）'
+    )
+
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='只统计将被清理的行数，不修改数据库（用于maintain命令）'
+    )
+
     args = parser.parse_args()
 
     if args.command == 'init':
         init_database()
 
     elif args.command == 'scrape':
-        run_scraper(headless=args.headless)
+        run_scraper(headless=args.headless, profile_memory=args.profile_memory)
 
     elif args.command == 'analyze':
-        run_analysis()
+        run_analysis(backend=args.backend)
 
     elif args.command == 'inspect':
         inspect_page(args.url)
 
     elif args.command == 'all':
         init_database()
-        run_scraper(headless=args.headless)
-        run_analysis()
+        run_scraper(headless=args.headless, profile_memory=args.profile_memory)
+        run_analysis(backend=args.backend)
+
+    elif args.command == 'enqueue':
+        enqueue_tasks(areas=args.areas, pages_per_task=args.pages_per_task)
+
+    elif args.command == 'worker':
+        run_worker(headless=args.headless, worker_id=args.worker_id,
+                   max_tasks=args.max_tasks, profile_memory=args.profile_memory,
+                   shared_volume=args.shared_volume)
+
+    elif args.command == 'daemon':
+        run_browser_daemon(headless=args.headless, port=args.port, login=not args.no_login)
+
+    elif args.command == 'export':
+        export_snapshot(full=args.full)
+
+    elif args.command == 'maintain':
+        run_maintenance(dry_run=args.dry_run)
 
 
 if __name__ == "__main__":
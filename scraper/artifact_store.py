@@ -0,0 +1,316 @@
+"""
+调试产物存储（内容寻址）
+页面HTML和截图按内容哈希去重保存，文本压缩存储，并按 run/区域/页码 建立索引
+超过容量上限时按最近访问时间（LRU）淘汰
+"""
+import os
+import sys
+import gzip
+import hashlib
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ARTIFACT_DIR, ARTIFACT_MAX_MB
+
+try:
+    import zstandard
+except ImportError:  # zstd为可选依赖，没有时退回gzip
+    zstandard = None
+
+
+# 文本类产物（需要压缩）；截图等二进制已是压缩格式，原样保存
+TEXT_KINDS = {'html', 'txt', 'json'}
+
+
+def _compress(data: bytes) -> Tuple[bytes, str]:
+    """压缩文本数据，返回 (压缩后数据, 编码名)"""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data), 'zstd'
+    return gzip.compress(data, compresslevel=6), 'gzip'
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    """按编码名解压"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("该产物使用zstd压缩，需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    return data
+
+
+class ArtifactStore:
+    """内容寻址的产物存储"""
+
+    def __init__(self, root: str = ARTIFACT_DIR, max_mb: int = ARTIFACT_MAX_MB,
+                 run_id: Optional[str] = None):
+        """
+        Args:
+            root: 存储目录
+            max_mb: 容量上限（MB，按压缩后大小计算），<=0 表示不限制
+            run_id: 本次运行ID，默认使用当前时间
+        """
+        self.root = root
+        self.max_bytes = max_mb * 1024 * 1024
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(self.root, 'index.db'))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                raw_size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT NOT NULL,
+                area TEXT,
+                page INTEGER,
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs(digest),
+                url TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_run_area_page ON entries(run_id, area, page);
+            CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries(digest);
+            CREATE INDEX IF NOT EXISTS ix_blobs_last_access ON blobs(last_access);
+        """)
+        self.conn.commit()
+
+    def _blob_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.{ext}")
+
+    def put(self, data: Union[bytes, str], kind: str, name: str,
+            area: Optional[str] = None, page: Optional[int] = None,
+            url: Optional[str] = None) -> Optional[str]:
+        """
+        保存一个产物（单个内容压缩后超过容量上限时不保存）
+        Args:
+            data: 内容（str按UTF-8编码）
+            kind: 产物类型（html/png/txt等，同时作为扩展名）
+            name: 产物名（如 property_list、login_error）
+            area: 区域名
+            page: 页码
+            url: 页面URL
+        Returns:
+            内容哈希；超过容量上限未保存时为None
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+
+        row = self.conn.execute('SELECT digest FROM blobs WHERE digest = ?', (digest,)).fetchone()
+        if row:
+            # 相同内容已存在，只更新访问时间
+            self.conn.execute('UPDATE blobs SET last_access = ? WHERE digest = ?', (now, digest))
+        else:
+            if kind in TEXT_KINDS:
+                stored, codec = _compress(data)
+            else:
+                stored, codec = data, 'raw'
+            if 0 < self.max_bytes < len(stored):
+                # 保存后会把整个存储连同自己一起淘汰掉
+                print(f"  [产物存储] {name}.{kind} 大小 {len(stored) / 1024 / 1024:.1f} MB 超过容量上限，不保存")
+                return None
+            ext = kind if codec == 'raw' else f"{kind}.{'zst' if codec == 'zstd' else 'gz'}"
+
+            path = self._blob_path(digest, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(stored)
+            os.replace(tmp_path, path)
+
+            self.conn.execute(
+                'INSERT INTO blobs (digest, codec, ext, raw_size, stored_size, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (digest, codec, ext, len(data), len(stored), now, now)
+            )
+
+        self.conn.execute(
+            'INSERT INTO entries (run_id, area, page, name, kind, digest, url, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (self.run_id, area, page, name, kind, digest, url, now)
+        )
+        self.conn.commit()
+
+        if not row:
+            self._evict(keep=digest)
+        return digest
+
+    def put_page(self, page, name: str, area: Optional[str] = None,
+                 page_num: Optional[int] = None, html: bool = True,
+                 screenshot: bool = True, full_page: bool = False) -> Dict[str, str]:
+        """
+        保存Playwright页面的截图和HTML
+        Returns:
+            {kind: digest}（未保存的类型不包含在内）
+        """
+        saved = {}
+        url = page.url
+        if screenshot:
+            saved['png'] = self.put(page.screenshot(full_page=full_page), 'png', name,
+                                    area=area, page=page_num, url=url)
+        if html:
+            saved['html'] = self.put(page.content(), 'html', name,
+                                     area=area, page=page_num, url=url)
+        return {kind: digest for kind, digest in saved.items() if digest}
+
+    def resolve(self, prefix: str) -> str:
+        """把哈希前缀（如 list 显示的前12位）解析为完整哈希，前缀不唯一时报错"""
+        prefix = prefix.lower()
+        if not prefix or any(c not in '0123456789abcdef' for c in prefix):
+            raise KeyError(f"无效的哈希: {prefix}")
+        # 十六进制哈希按字符串范围查找（可以使用主键索引）
+        rows = self.conn.execute(
+            'SELECT digest FROM blobs WHERE digest >= ? AND digest < ? LIMIT 2', (prefix, prefix + 'g')
+        ).fetchall()
+        if not rows:
+            raise KeyError(f"产物不存在或已被淘汰: {prefix}")
+        if len(rows) > 1:
+            raise KeyError(f"哈希前缀不唯一，请输入更长的前缀: {prefix}")
+        return rows[0]['digest']
+
+    def get(self, digest: str) -> bytes:
+        """按哈希（或唯一的哈希前缀）读取原始内容"""
+        digest = self.resolve(digest)
+        row = self.conn.execute('SELECT codec, ext FROM blobs WHERE digest = ?', (digest,)).fetchone()
+
+        with open(self._blob_path(digest, row['ext']), 'rb') as f:
+            data = _decompress(f.read(), row['codec'])
+
+        self.conn.execute('UPDATE blobs SET last_access = ? WHERE digest = ?', (time.time(), digest))
+        self.conn.commit()
+        return data
+
+    def find(self, run_id: Optional[str] = None, area: Optional[str] = None,
+             page: Optional[int] = None, name: Optional[str] = None,
+             kind: Optional[str] = None) -> List[Dict]:
+        """按 run/区域/页码/名称 查询索引，返回最新的在前"""
+        conditions = []
+        params = []
+        for col, val in (('run_id', run_id), ('area', area), ('page', page),
+                         ('name', name), ('kind', kind)):
+            if val is not None:
+                conditions.append(f"e.{col} = ?")
+                params.append(val)
+
+        sql = ('SELECT e.*, b.raw_size, b.stored_size FROM entries e '
+               'JOIN blobs b ON b.digest = e.digest')
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY e.id DESC'
+        return [dict(r) for r in self.conn.execute(sql, params).fetchall()]
+
+    def export(self, digest: str, path: str):
+        """把产物解压导出为普通文件（先读取内容，产物不存在时不会留下空文件）"""
+        data = self.get(digest)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def stats(self) -> Dict:
+        """存储统计"""
+        row = self.conn.execute(
+            'SELECT COUNT(*) AS blobs, COALESCE(SUM(raw_size), 0) AS raw_bytes, '
+            'COALESCE(SUM(stored_size), 0) AS stored_bytes FROM blobs'
+        ).fetchone()
+        entries = self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {'entries': entries, **dict(row)}
+
+    def _evict(self, keep: Optional[str] = None):
+        """
+        超过容量上限时，按最近访问时间淘汰最旧的内容
+        Args:
+            keep: 刚写入的内容哈希，不参与淘汰
+        """
+        if self.max_bytes <= 0:
+            return
+
+        total = self.conn.execute('SELECT COALESCE(SUM(stored_size), 0) FROM blobs').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for row in self.conn.execute(
+            'SELECT digest, ext, stored_size FROM blobs WHERE digest != ? ORDER BY last_access ASC', (keep or '',)
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(row['digest'], row['ext']))
+            except FileNotFoundError:
+                pass
+            self.conn.execute('DELETE FROM entries WHERE digest = ?', (row['digest'],))
+            self.conn.execute('DELETE FROM blobs WHERE digest = ?', (row['digest'],))
+            total -= row['stored_size']
+            evicted += 1
+
+        self.conn.commit()
+        print(f"  [产物存储] 淘汰 {evicted} 个旧产物，当前 {total / 1024 / 1024:.1f} MB")
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    """命令行: 查看或导出产物"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='调试产物存储')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ls = sub.add_parser('list', help='列出产物')
+    ls.add_argument('--run')
+    ls.add_argument('--area')
+    ls.add_argument('--page', type=int)
+    ls.add_argument('--name')
+    ls.add_argument('--limit', type=int, default=50)
+
+    ex = sub.add_parser('export', help='导出产物为文件')
+    ex.add_argument('digest', help='内容哈希（可以是 list 显示的前缀）')
+    ex.add_argument('path')
+
+    sub.add_parser('stats', help='存储统计')
+
+    args = parser.parse_args()
+    store = ArtifactStore()
+
+    try:
+        if args.command == 'list':
+            for e in store.find(args.run, args.area, args.page, args.name)[:args.limit]:
+                print(f"{e['run_id']}  {e['area'] or '-':8}  p{e['page'] or '-':<3} "
+                      f"{e['name']}.{e['kind']}  {e['digest'][:12]}  "
+                      f"{e['raw_size']:,} -> {e['stored_size']:,} bytes")
+        elif args.command == 'export':
+            try:
+                store.export(args.digest, args.path)
+            except KeyError as e:
+                print(e.args[0])
+                sys.exit(1)
+            print(f"已导出: {args.path}")
+        elif args.command == 'stats':
+            s = store.stats()
+            print(f"条目: {s['entries']}, 内容: {s['blobs']}")
+            print(f"原始大小: {s['raw_bytes'] / 1024 / 1024:.1f} MB, "
+                  f"存储大小: {s['stored_bytes'] / 1024 / 1024:.1f} MB")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+常驻浏览器守护进程
+启动一个Chromium并保持运行（持久化用户目录，forrent/REINS/SUUMO 登录状态常驻），
+各脚本通过 connect_over_cdp 连接复用，省去每次启动浏览器和登录的时间
+
+启动: python main.py daemon
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from playwright.sync_api import sync_playwright, Browser, Page
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (BASE_URL, BROWSER_CDP_PORT, BROWSER_CDP_URL,
+                    BROWSER_PROFILE_DIR, BROWSER_DAEMON_STATE)
+
+
+# 常驻标签页（保持各站点会话）
+PROFILE_URLS = {
+    'forrent': BASE_URL,
+    'reins': "https://system.reins.jp/login/main/KG/GKG001200",
+    'suumo': "https://suumo.jp/chintai/tokyo/",
+}
+
+# 浏览器上下文配置，模拟真实浏览器
+CONTEXT_OPTIONS = dict(
+    viewport={'width': 1920, 'height': 1080},
+    locale='ja-JP',
+    timezone_id='Asia/Tokyo',
+    # 添加更多真实浏览器特征
+    extra_http_headers={
+        'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    },
+)
+
+# 浏览器启动参数（反检测）
+LAUNCH_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-infobars',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--lang=ja-JP',
+]
+
+# 注入页面的JavaScript，隐藏自动化特征
+STEALTH_SCRIPT = """
+    // 隐藏webdriver标识
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+
+    // 隐藏自动化相关属性
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5]
+    });
+
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['ja-JP', 'ja', 'en-US', 'en']
+    });
+
+    // 模拟Chrome浏览器
+    window.chrome = {
+        runtime: {}
+    };
+
+    // 隐藏Playwright特征
+    delete window.__playwright;
+    delete window.__pw_manual;
+"""
+
+
+def get_daemon_endpoint() -> Optional[str]:
+    """获取常驻浏览器的CDP地址，未运行时返回None"""
+    if BROWSER_CDP_URL:
+        return BROWSER_CDP_URL
+    if not os.path.exists(BROWSER_DAEMON_STATE):
+        return None
+    try:
+        with open(BROWSER_DAEMON_STATE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('endpoint')
+    except Exception:
+        return None
+
+
+def attach_browser(playwright, profile: str = None, timeout: int = 2000) -> Optional[Tuple[Browser, Page]]:
+    """
+    连接到常驻浏览器，在其登录状态的上下文中新开一个标签页
+    Args:
+        playwright: 已启动的Playwright实例
+        profile: 站点名（forrent/reins/suumo），仅用于日志
+        timeout: 连接超时（毫秒）
+    Returns:
+        (browser, page)；常驻浏览器未运行时返回None，由调用方自行启动浏览器
+    """
+    endpoint = get_daemon_endpoint()
+    if not endpoint:
+        return None
+
+    start = time.time()
+    try:
+        browser = playwright.chromium.connect_over_cdp(endpoint, timeout=timeout)
+    except Exception as e:
+        print(f"常驻浏览器不可用({endpoint})，改为新启动浏览器: {e}")
+        return None
+
+    # 持久化上下文即默认上下文，各站点的cookie都在其中
+    context = browser.contexts[0] if browser.contexts else browser.new_context(**CONTEXT_OPTIONS)
+    page = context.new_page()
+    page.add_init_script(STEALTH_SCRIPT)
+    page.set_default_timeout(30000)
+
+    print(f"已连接常驻浏览器 {endpoint} [{profile or '-'}] ({time.time() - start:.2f}s)")
+    return browser, page
+
+
+def open_browser(playwright, profile: str = None, headless: bool = False) -> Tuple[Browser, object, Page, bool]:
+    """
+    脚本用: 优先连接常驻浏览器，未运行时按原方式新启动一个
+    Returns:
+        (browser, context, page, attached)
+    """
+    attached = attach_browser(playwright, profile)
+    if attached:
+        browser, page = attached
+        return browser, page.context, page, True
+
+    browser = playwright.chromium.launch(headless=headless)
+    context = browser.new_context(viewport={'width': 1920, 'height': 1080}, locale='ja-JP')
+    page = context.new_page()
+    return browser, context, page, False
+
+
+def close_browser(browser: Browser, page: Page, attached: bool):
+    """脚本用: 常驻浏览器只关闭本次的标签页，自己启动的浏览器直接关闭"""
+    if attached:
+        try:
+            page.close()
+        except Exception:
+            pass
+    else:
+        browser.close()
+
+
+def run_daemon(headless: bool = False, port: int = BROWSER_CDP_PORT,
+               login: bool = True, keepalive_minutes: int = 0):
+    """
+    运行常驻浏览器，直到 Ctrl+C
+    Args:
+        headless: 是否无头模式
+        port: CDP调试端口
+        login: 是否自动登录forrent（账号读取.env）
+        keepalive_minutes: 定期刷新常驻标签页以保持会话，0表示不刷新
+            （forrent的检索状态保存在服务端会话中，抓取进行中刷新可能打乱其他任务的页面状态）
+    """
+    from scraper.scraper import SummoScraper, USER_AGENTS
+
+    os.makedirs(BROWSER_PROFILE_DIR, exist_ok=True)
+    playwright = sync_playwright().start()
+
+    context = playwright.chromium.launch_persistent_context(
+        BROWSER_PROFILE_DIR,
+        headless=headless,
+        args=LAUNCH_ARGS + [f'--remote-debugging-port={port}'],
+        user_agent=USER_AGENTS[0],
+        **CONTEXT_OPTIONS
+    )
+    context.add_init_script(STEALTH_SCRIPT)
+
+    # 为各站点打开常驻标签页
+    pages = {}
+    for name, url in PROFILE_URLS.items():
+        page = context.pages[0] if not pages and context.pages else context.new_page()
+        try:
+            page.goto(url, wait_until='domcontentloaded')
+        except Exception as e:
+            print(f"  打开 {name} 失败: {e}")
+        pages[name] = page
+
+    if login:
+        scraper = SummoScraper(headless=headless)
+        scraper.page = pages['forrent']
+        if scraper.login():
+            print("forrent 已登录")
+        else:
+            print("forrent 自动登录失败，可在浏览器窗口中手动登录")
+
+    endpoint = f"http://127.0.0.1:{port}"
+    os.makedirs(os.path.dirname(BROWSER_DAEMON_STATE), exist_ok=True)
+    with open(BROWSER_DAEMON_STATE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'endpoint': endpoint,
+            'pid': os.getpid(),
+            'started_at': datetime.now().isoformat(),
+            'profiles': list(PROFILE_URLS),
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"常驻浏览器已启动: {endpoint}")
+    print("其他脚本将自动连接复用。按 Ctrl+C 关闭。")
+
+    try:
+        last_refresh = time.time()
+        while True:
+            time.sleep(1)
+            if keepalive_minutes and time.time() - last_refresh > keepalive_minutes * 60:
+                for name, page in pages.items():
+                    try:
+                        if not page.is_closed():
+                            page.reload(wait_until='domcontentloaded')
+                    except Exception as e:
+                        print(f"  刷新 {name} 失败: {e}")
+                last_refresh = time.time()
+    except KeyboardInterrupt:
+        print("\n关闭常驻浏览器...")
+    finally:
+        if os.path.exists(BROWSER_DAEMON_STATE):
+            os.remove(BROWSER_DAEMON_STATE)
+        context.close()
+        playwright.stop()
@@ -11,21 +11,14 @@ from playwright.sync_api import sync_playwright
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import SUMMO_USERNAME, SUMMO_PASSWORD, BASE_URL
+from scraper.artifact_store import ArtifactStore
 
 
-def save_page_state(page, name: str):
-    """保存页面状态"""
-    os.makedirs("data/debug", exist_ok=True)
+def save_page_state(page, name: str, store: ArtifactStore):
+    """保存页面状态（截图+HTML，写入产物存储）"""
+    saved = store.put_page(page, name, full_page=True)
 
-    # 保存截图
-    page.screenshot(path=f"data/debug/{name}.png", full_page=True)
-
-    # 保存HTML
-    html = page.content()
-    with open(f"data/debug/{name}.html", "w", encoding="utf-8") as f:
-        f.write(html)
-
-    print(f"已保存: data/debug/{name}.png 和 data/debug/{name}.html")
+    print(f"已保存: {name} (png={saved.get('png', '-')[:12]}, html={saved.get('html', '-')[:12]})")
     print(f"当前URL: {page.url}")
     print(f"页面标题: {page.title()}")
 
@@ -88,6 +81,9 @@ def main():
     print("按照提示操作，分析页面结构")
     print("=" * 60)
 
+    store = ArtifactStore()
+    print(f"调试产物将保存到 {store.root} (run: {store.run_id})")
+
     playwright = sync_playwright().start()
 
     browser = playwright.chromium.launch(
@@ -118,7 +114,7 @@ def main():
         print("\n[步骤1] 访问登录页面...")
         page.goto(BASE_URL, wait_until='networkidle')
         time.sleep(2)
-        save_page_state(page, "01_login_page")
+        save_page_state(page, "01_login_page", store)
         analyze_page(page)
 
         input("\n按Enter继续登录...")
@@ -142,7 +138,7 @@ def main():
                 submit_btn.click()
                 time.sleep(3)
 
-        save_page_state(page, "02_after_login")
+        save_page_state(page, "02_after_login", store)
         analyze_page(page)
 
         input("\n按Enter继续（如需手动操作请现在进行）...")
@@ -159,7 +155,7 @@ def main():
 
         input("\n完成后按Enter保存页面状态...")
 
-        save_page_state(page, "03_search_result")
+        save_page_state(page, "03_search_result", store)
         analyze_page(page)
 
         # 分析物件列表
@@ -189,9 +185,11 @@ def main():
         input("\n按Enter继续或Ctrl+C退出...")
 
         # 保存最终状态
-        save_page_state(page, "04_final")
+        save_page_state(page, "04_final", store)
 
-        print("\n调试完成！请检查 data/debug/ 目录中的文件")
+        print("\n调试完成！导出页面文件:")
+        print(f"  python scraper/artifact_store.py list --run {store.run_id}")
+        print(f"  python scraper/artifact_store.py export <digest> data/debug/<name>.html")
         print("根据分析结果调整 scraper.py 中的选择器")
 
         input("\n按Enter关闭浏览器...")
@@ -205,6 +203,7 @@ def main():
     finally:
         browser.close()
         playwright.stop()
+        store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+"""
+内存剖析（--profile-memory）
+长时间抓取时定期记录 Python 堆（tracemalloc）、浏览器进程RSS 和存活的JS句柄数，
+每个区域结束时输出内存增长最多的代码位置，便于在机器开始换页之前发现泄漏和无界缓冲
+"""
+import os
+import gc
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BROWSER_DAEMON_STATE
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，没有时不统计浏览器RSS
+    psutil = None
+
+try:
+    from playwright.sync_api import ElementHandle, JSHandle
+except ImportError:
+    ElementHandle = JSHandle = None
+
+
+MB = 1024 * 1024
+
+# 只统计项目代码和第三方库的分配，忽略tracemalloc和剖析器自身
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def _browser_rss(root_pid: int) -> Optional[int]:
+    """统计 root_pid 下所有Chromium子进程的RSS总和（字节）"""
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process(root_pid).children(recursive=True)
+    except psutil.Error:
+        return None
+
+    total = 0
+    for proc in children:
+        try:
+            if 'chrom' in proc.name().lower():
+                total += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+def _browser_root_pid(attached: bool) -> int:
+    """浏览器进程树的根：自己启动的是本进程，连接常驻浏览器时是daemon进程"""
+    if attached and os.path.exists(BROWSER_DAEMON_STATE):
+        try:
+            with open(BROWSER_DAEMON_STATE, 'r', encoding='utf-8') as f:
+                return json.load(f)['pid']
+        except (OSError, ValueError, KeyError):
+            pass
+    return os.getpid()
+
+
+def _count_py_handles() -> Dict[str, int]:
+    """统计Python侧仍然存活的Playwright句柄（未释放的会一直占用页面里的远程对象）"""
+    if ElementHandle is None:
+        return {}
+    counts = {'element_handles': 0, 'js_handles': 0}
+    for obj in gc.get_objects():
+        if isinstance(obj, ElementHandle):
+            counts['element_handles'] += 1
+        elif isinstance(obj, JSHandle):
+            counts['js_handles'] += 1
+    return counts
+
+
+class MemoryProfiler:
+    """定期快照 + 按区域的内存增长报告"""
+
+    def __init__(self, page=None, attached: bool = False, interval_sec: int = 60,
+                 top_n: int = 10, frames: int = 10,
+                 log_path: Optional[str] = None):
+        """
+        Args:
+            page: Playwright页面（用于读取JS堆和DOM计数）
+            attached: 是否连接的常驻浏览器（决定浏览器进程树的根）
+            interval_sec: 后台采样间隔（秒）
+            top_n: 每个区域报告的增长位置数
+            frames: tracemalloc保留的调用栈深度
+            log_path: 采样记录（JSON Lines），默认 data/memory_profile_<时间>.jsonl
+        """
+        self.page = page
+        self.interval_sec = interval_sec
+        self.top_n = top_n
+        self.frames = frames
+        self.log_path = log_path or f"data/memory_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        self.browser_pid = _browser_root_pid(attached)
+
+        self._cdp = None
+        self._last_snapshot = None
+        self._area_start = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._owns_tracing = False  # tracemalloc是否由本实例启动
+
+    def start(self):
+        """开始跟踪（tracemalloc + 后台定期采样）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._owns_tracing = True
+        self._last_snapshot = self._take_snapshot()
+        self._area_start = time.time()
+
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+        if psutil is None:
+            print("[内存剖析] 未安装 psutil，不统计浏览器进程RSS")
+        print(f"[内存剖析] 已启动，采样间隔 {self.interval_sec} 秒，记录: {self.log_path}")
+
+    def stop(self):
+        """停止跟踪并输出最终汇总"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.checkpoint('结束')
+        # 调用方事先已开启的跟踪保持不变
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def _take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def _write(self, record: Dict):
+        with self._lock:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _sample_loop(self):
+        """后台线程：只采集不需要访问Playwright的指标（sync API不能跨线程调用）"""
+        while not self._stop_event.wait(self.interval_sec):
+            current, peak = tracemalloc.get_traced_memory()
+            self._write({
+                'type': 'sample',
+                'time': datetime.now().isoformat(),
+                'py_traced': current,
+                'py_peak': peak,
+                'browser_rss': _browser_rss(self.browser_pid),
+            })
+
+    def _page_metrics(self) -> Dict[str, int]:
+        """通过CDP读取页面的JS堆大小和DOM节点/监听器数量"""
+        if self.page is None:
+            return {}
+        try:
+            if self._cdp is None:
+                self._cdp = self.page.context.new_cdp_session(self.page)
+                self._cdp.send('Performance.enable')
+            metrics = {m['name']: m['value']
+                       for m in self._cdp.send('Performance.getMetrics')['metrics']}
+            counters = self._cdp.send('Memory.getDOMCounters')
+            return {
+                'js_heap_used': int(metrics.get('JSHeapUsedSize', 0)),
+                'js_heap_total': int(metrics.get('JSHeapTotalSize', 0)),
+                'dom_nodes': counters.get('nodes', 0),
+                'dom_documents': counters.get('documents', 0),
+                'js_event_listeners': counters.get('jsEventListeners', 0),
+            }
+        except Exception as e:
+            # 页面已关闭或重新创建时CDP会话失效，下次重新建立
+            self._cdp = None
+            return {'error': str(e)}
+
+    def checkpoint(self, label: str, rows: Optional[int] = None) -> Dict:
+        """
+        区域结束时调用：与上一个检查点比较并打印增长最多的位置
+        Args:
+            label: 检查点名称（通常是区域名）
+            rows: 当前缓存的数据行数（如 len(self.all_data)）
+        Returns:
+            本次记录
+        """
+        if not tracemalloc.is_tracing():
+            return {}
+
+        snapshot = self._take_snapshot()
+        stats = snapshot.compare_to(self._last_snapshot, 'lineno')
+        self._last_snapshot = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        browser_rss = _browser_rss(self.browser_pid)
+        handles = _count_py_handles()
+        page_metrics = self._page_metrics()
+
+        growth = [s for s in stats if s.size_diff > 0][:self.top_n]
+        record = {
+            'type': 'checkpoint',
+            'label': label,
+            'time': datetime.now().isoformat(),
+            'elapsed_sec': round(time.time() - self._area_start, 1),
+            'rows': rows,
+            'py_traced': current,
+            'py_peak': peak,
+            'browser_rss': browser_rss,
+            **handles,
+            **page_metrics,
+            'top_growth': [
+                {
+                    'site': f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                    'size_diff': s.size_diff,
+                    'count_diff': s.count_diff,
+                }
+                for s in growth
+            ],
+        }
+        self._write(record)
+        self._area_start = time.time()
+
+        self._print(record)
+        return record
+
+    def _print(self, record: Dict):
+        line = f"  [内存剖析] {record['label']}: Python {record['py_traced'] / MB:.1f} MB (峰值 {record['py_peak'] / MB:.1f} MB)"
+        if record['browser_rss'] is not None:
+            line += f", 浏览器RSS {record['browser_rss'] / MB:.0f} MB"
+        if 'js_heap_used' in record:
+            line += f", JS堆 {record['js_heap_used'] / MB:.1f} MB, DOM节点 {record['dom_nodes']}"
+        if 'element_handles' in record:
+            line += f", 存活句柄 {record['element_handles'] + record['js_handles']}"
+        if record['rows'] is not None:
+            line += f", 缓存行数 {record['rows']}"
+        print(line)
+
+        for item in record['top_growth']:
+            print(f"    +{item['size_diff'] / 1024:8.1f} KB  +{item['count_diff']:<6} {item['site']}")
+
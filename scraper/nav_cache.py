@@ -0,0 +1,122 @@
+"""
+导航缓存
+记录每种页面上各菜单文字是在哪个frame、用哪个选择器点到的，下次直接定位；
+区域列表按TTL缓存，避免每次都扫描所有frame的所有链接
+"""
+import os
+import sys
+import json
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import NAV_CACHE_PATH, AREA_CACHE_TTL_HOURS
+
+
+# 单次往返扫描frame中的所有链接，返回第一个匹配项的下标和属性
+# 匹配规则与原逐个链接比较一致：文字相等/包含，或title包含
+FIND_LINK_JS = """
+(links, text) => {
+    for (let i = 0; i < links.length; i++) {
+        const a = links[i];
+        const linkText = (a.innerText || '').trim();
+        const title = a.getAttribute('title') || '';
+        if (linkText === text || linkText.includes(text) || title.includes(text)) {
+            return {index: i, text: linkText, title: title, href: a.getAttribute('href') || ''};
+        }
+    }
+    return null;
+}
+"""
+
+# 单次往返收集frame中的所有区域链接（文字 + href）
+AREA_LINKS_JS = """
+links => links.map(a => [(a.innerText || '').trim(), a.getAttribute('href') || ''])
+"""
+
+
+def frame_key(frame) -> str:
+    """frame标识：优先name，没有时使用URL路径最后一段"""
+    if frame.name:
+        return frame.name
+    path = urlparse(frame.url).path.rstrip('/')
+    return path.rsplit('/', 1)[-1] or 'main'
+
+
+def page_type(page) -> str:
+    """页面类型：各frame的URL路径（不含查询参数）组合，区分菜单/区域选择/列表等页面"""
+    parts = []
+    for frame in page.frames:
+        path = urlparse(frame.url).path.rstrip('/')
+        parts.append(path.rsplit('/', 1)[-1] or '-')
+    return '|'.join(sorted(set(parts)))
+
+
+def _quote(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def link_selector(text: str, match: Dict) -> str:
+    """为扫描命中的链接生成稳定的直接选择器（href可能带会话ID，放在文字之后）"""
+    href = match.get('href', '')
+    if match.get('title') and text in match['title']:
+        return f'a[title="{_quote(match["title"])}"]'
+    if match.get('text') == text:
+        return f'a:text-is("{_quote(text)}")'
+    if href and not href.startswith('javascript') and href != '#':
+        return f'a[href="{_quote(href)}"]'
+    return f'a:text-is("{_quote(match["text"])}")'
+
+
+class NavigationCache:
+    """按页面类型保存 菜单文字 -> (frame, 选择器)，并缓存区域列表"""
+
+    def __init__(self, path: str = NAV_CACHE_PATH, area_ttl_hours: float = AREA_CACHE_TTL_HOURS):
+        self.path = path
+        self.area_ttl = area_ttl_hours * 3600
+        self.data = {'routes': {}, 'areas': {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"  导航缓存读取失败，重新建立: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, ptype: str, label: str) -> Optional[Dict]:
+        """查找已记录的路径，返回 {'frame', 'selector', ...} 或 None"""
+        return self.data['routes'].get(ptype, {}).get(label)
+
+    def record(self, ptype: str, label: str, frame, selector: str):
+        """记录某页面上菜单文字对应的frame和选择器"""
+        routes = self.data['routes'].setdefault(ptype, {})
+        old = routes.get(label)
+        key = frame_key(frame)
+        if old and old['frame'] == key and old['selector'] == selector:
+            return
+        routes[label] = {'frame': key, 'selector': selector, 'updated_at': time.time()}
+        self._save()
+
+    def forget(self, ptype: str, label: str):
+        """直接定位失败（页面改版）时删除记录，回退到扫描"""
+        if self.data['routes'].get(ptype, {}).pop(label, None) is not None:
+            self._save()
+
+    def get_areas(self) -> Optional[List[str]]:
+        """未过期时返回缓存的区域列表"""
+        cached = self.data.get('areas') or {}
+        if cached.get('items') and time.time() - cached.get('fetched_at', 0) < self.area_ttl:
+            return list(cached['items'])
+        return None
+
+    def set_areas(self, areas: List[str]):
+        self.data['areas'] = {'items': list(areas), 'fetched_at': time.time()}
+        self._save()
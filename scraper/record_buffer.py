@@ -0,0 +1,240 @@
+"""
+抓取结果的列式缓冲
+每条物件如果用dict保存，约20个重复的键和装箱的数字会占用大量内存；
+这里按列保存：只有整数的列用 array('q')，其他数值列用 array('d')（缺失为NaN），
+重复度高的文字列用字典编码（codes + 类别表），其余文字列用list。
+转换为DataFrame/Arrow时数值列和编码列直接共享内存（只读视图），不再逐行复制
+"""
+import math
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow为可选依赖，只有to_arrow需要
+    pa = None
+
+
+# 重复度高的文字列（区域/沿線/駅/間取り等），按字典编码保存
+CATEGORY_COLUMNS = {
+    'area_name', 'address_prefecture', 'address_city', 'railway_line', 'station',
+    'floor_plan', 'property_type', 'structure', 'response_rank',
+    'deposit_type', 'key_money_type',
+}
+
+NAN = float('nan')
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _view(col: array, dtype) -> np.ndarray:
+    """数组内存的只读numpy视图：DataFrame/Arrow与缓冲共享内存，不能通过它们改写缓冲中的数据"""
+    values = np.frombuffer(col, dtype=dtype) if len(col) else np.empty(0, dtype=dtype)
+    values.flags.writeable = False
+    return values
+
+
+def _push(col: array, value) -> array:
+    """
+    追加到数组；数组内存正被DataFrame/Arrow共享时不能扩容，
+    此时先复制一份（已导出的DataFrame保持不变）
+    """
+    try:
+        col.append(value)
+        return col
+    except BufferError:
+        col = array(col.typecode, col)
+        col.append(value)
+        return col
+
+
+class _CategoryColumn:
+    """字典编码的文字列：codes为int32数组，-1表示缺失"""
+
+    __slots__ = ('codes', 'categories', 'index')
+
+    def __init__(self, size: int = 0):
+        self.codes = array('i', [-1]) * size
+        self.categories: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes = _push(self.codes, -1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.categories)
+            self.index[value] = code
+            self.categories.append(value)
+        self.codes = _push(self.codes, code)
+
+    def get(self, i: int):
+        code = self.codes[i]
+        return None if code < 0 else self.categories[code]
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes) + sum(len(c.encode('utf-8')) for c in self.categories)
+
+    def to_pandas(self) -> pd.Categorical:
+        codes = _view(self.codes, np.int32)
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.categories, dtype=object))
+
+    def to_arrow(self):
+        codes = _view(self.codes, np.int32)
+        indices = pa.array(codes, mask=codes < 0)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.categories, type=pa.string()))
+
+
+class RecordBuffer:
+    """
+    按列保存的物件记录，接口与 list[dict] 兼容（append/extend/len/迭代/下标）
+    新出现的字段自动加列，之前的行补缺失值；
+    to_dataframe() 得到的DataFrame与缓冲共享内存：数值列和编码列是只读视图，
+    直接赋值会报错（需要修改时先 df.copy()），之后继续追加时该列会先复制
+    """
+
+    def __init__(self, rows: Optional[Iterable[Dict]] = None):
+        self._numeric: Dict[str, array] = {}
+        self._category: Dict[str, _CategoryColumn] = {}
+        self._object: Dict[str, list] = {}
+        self._order: List[str] = []  # 列的出现顺序（与DataFrame(list_of_dicts)一致）
+        self._size = 0
+        if rows is not None:
+            self.extend(rows)
+
+    def _add_column(self, key: str, value):
+        """按第一个非空值的类型建列，之前的行补缺失值"""
+        if key in CATEGORY_COLUMNS and (value is None or isinstance(value, str)):
+            self._category[key] = _CategoryColumn(self._size)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            # 之前的行缺失时只能用浮点列（与 DataFrame(list_of_dicts) 的类型推断相同）
+            if isinstance(value, int) and not self._size:
+                self._numeric[key] = array('q')
+            else:
+                self._numeric[key] = array('d', [NAN]) * self._size
+        else:
+            self._object[key] = [None] * self._size
+        self._order.append(key)
+
+    def append(self, row: Dict):
+        for key, value in row.items():
+            if key not in self._numeric and key not in self._category and key not in self._object:
+                self._add_column(key, value)
+
+        for key, col in list(self._numeric.items()):
+            value = row.get(key)
+            if col.typecode == 'q' and not (isinstance(value, int) and INT64_MIN <= value <= INT64_MAX):
+                if value is None or isinstance(value, (int, float)):
+                    # 出现缺失值或小数：整数列改为浮点列
+                    col = self._numeric[key] = array('d', col)
+            if value is None:
+                self._numeric[key] = _push(col, NAN)
+            elif isinstance(value, (int, float)):
+                self._numeric[key] = _push(col, value)
+            else:
+                # 同一字段出现非数值（如 '―'），整列改为普通列
+                self._object[key] = [None if math.isnan(v) else v for v in col] + [value]
+                del self._numeric[key]
+        for key, col in self._category.items():
+            value = row.get(key)
+            if value is not None and not isinstance(value, str):
+                value = str(value)
+            col.append(value)
+        for key, col in self._object.items():
+            # 刚从数值列转换过来的列已在上面追加
+            if len(col) == self._size:
+                col.append(row.get(key))
+        self._size += 1
+
+    def extend(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.append(row)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def _row(self, i: int) -> Dict:
+        row = {}
+        for key in self._order:
+            if key in self._numeric:
+                value = self._numeric[key][i]
+                if not math.isnan(value):
+                    row[key] = value
+            elif key in self._category:
+                value = self._category[key].get(i)
+                if value is not None:
+                    row[key] = value
+            else:
+                value = self._object[key][i]
+                if value is not None:
+                    row[key] = value
+        return row
+
+    def __getitem__(self, i):
+        """返回第i行的dict（只包含非空字段）；切片返回dict列表"""
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(self._size):
+            yield self._row(i)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._order)
+
+    def nbytes(self) -> int:
+        """列数据占用的字节数（不含list中字符串对象本身）"""
+        total = sum(col.itemsize * len(col) for col in self._numeric.values())
+        total += sum(col.nbytes() for col in self._category.values())
+        total += sum(8 * len(col) for col in self._object.values())
+        return total
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        转换为DataFrame：数值列直接引用数组内存（只有整数的列为int64，其余float64，缺失为NaN），
+        字典编码列转为category类型（共享codes）
+        """
+        data = {}
+        for key in self._order:
+            if key in self._numeric:
+                col = self._numeric[key]
+                data[key] = _view(col, np.int64 if col.typecode == 'q' else np.float64)
+            elif key in self._category:
+                data[key] = self._category[key].to_pandas()
+            else:
+                data[key] = pd.array(self._object[key], dtype=object)
+        return pd.DataFrame(data, copy=False)
+
+    def to_arrow(self):
+        """转换为Arrow表：数值列零拷贝（NaN转为null），字典编码列转为dictionary类型"""
+        if pa is None:
+            raise RuntimeError("to_arrow 需要安装 pyarrow")
+        arrays = []
+        for key in self._order:
+            if key in self._numeric:
+                col = self._numeric[key]
+                values = _view(col, np.int64 if col.typecode == 'q' else np.float64)
+                arrays.append(pa.array(values, from_pandas=True))
+            elif key in self._category:
+                arrays.append(self._category[key].to_arrow())
+            else:
+                col = self._object[key]
+                try:
+                    arrays.append(pa.array(col))
+                except (pa.ArrowTypeError, pa.ArrowInvalid):
+                    # 数值和文字混合的列（如敷金 1.0 / '―'）统一转为文字
+                    arrays.append(pa.array([None if v is None else str(v) for v in col]))
+        return pa.Table.from_arrays(arrays, names=list(self._order))
@@ -0,0 +1,50 @@
+"""
+抓取过程中的故障恢复
+记录当前 区域/排序状态/页码，出错时由 SummoScraper 恢复到该位置后重试；
+同一区域失败次数过多时熔断，跳过该区域而不是反复重试
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+class StepFailed(Exception):
+    """抓取步骤失败（导航/搜索/排序/翻页返回失败，或严格模式下解析出错）"""
+
+
+class AreaAborted(Exception):
+    """区域重试次数用尽或已熔断，放弃该区域剩余页面"""
+
+    def __init__(self, area: str, page_num: int, reason: str):
+        super().__init__(f"{area} 第{page_num}页: {reason}")
+        self.area = area
+        self.page_num = page_num
+        self.reason = reason
+
+
+@dataclass
+class ScrapePosition:
+    """当前抓取位置（最后一次成功的状态）"""
+    area: Optional[str] = None
+    sorted: bool = False
+    page_num: int = 1
+
+    def __str__(self):
+        if self.area is None:
+            return "区域选择页"
+        return f"{self.area} {'已排序' if self.sorted else '未排序'} 第{self.page_num}页"
+
+
+class AreaCircuitBreaker:
+    """按区域统计失败次数，达到上限后熔断"""
+
+    def __init__(self, max_failures: int):
+        self.max_failures = max_failures
+        self.failures: Dict[str, int] = {}
+
+    def record_failure(self, area: str) -> bool:
+        """记录一次失败，返回该区域是否已熔断"""
+        self.failures[area] = self.failures.get(area, 0) + 1
+        return self.is_open(area)
+
+    def is_open(self, area: str) -> bool:
+        return self.failures.get(area, 0) >= self.max_failures
@@ -11,6 +11,7 @@ import time
 import random
 from datetime import datetime
 from typing import List, Dict, Optional
+from urllib.parse import urljoin
 
 from playwright.sync_api import sync_playwright, Page, Browser
 from tqdm import tqdm
@@ -18,8 +19,16 @@ from tqdm import tqdm
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import SUMMO_USERNAME, SUMMO_PASSWORD, BASE_URL, MIN_RESPONSE_COUNT
+from config import (SUMMO_USERNAME, SUMMO_PASSWORD, BASE_URL, MIN_RESPONSE_COUNT,
+                    SCRAPE_MAX_RETRIES, AREA_FAILURE_LIMIT)
 from database.models import Property, get_session, init_db, get_engine
+from database.bulk import upsert_properties
+from scraper.artifact_store import ArtifactStore
+from scraper.memory_profiler import MemoryProfiler
+from scraper.recovery import StepFailed, AreaAborted, ScrapePosition, AreaCircuitBreaker
+from scraper.nav_cache import (NavigationCache, page_type, frame_key, link_selector,
+                               FIND_LINK_JS, AREA_LINKS_JS)
+from scraper.browser_daemon import attach_browser, LAUNCH_ARGS, CONTEXT_OPTIONS, STEALTH_SCRIPT
 
 
 # 真实浏览器User-Agent列表
@@ -30,20 +39,81 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
 ]
 
+# 列表每页件数
+PAGE_SIZE = 50
+
+# 分页链接中的页码/偏移参数
+PAGE_PARAM_RE = re.compile(
+    r'([?&](?:page|pageNo|pageNum|currentPage|pageIndex|offset|start|startIndex)=)(\d+)',
+    re.IGNORECASE
+)
+OFFSET_PARAMS = {'offset', 'start', 'startindex'}
+
+# 单次往返取出frame中所有链接及其是否位于分页器内，并读取当前页码
+# 分页器 = 「次へ/前へ」链接外层中最近的、同时包含数字页码链接的元素
+# 当前页码 = 分页器中标记为current/active的元素，或不在链接内的纯数字文字
+PAGER_JS = r"""
+els => {
+    const text = el => (el.innerText || el.textContent || '').trim();
+    const isNav = t => /次へ|次の\d*件|前へ|前の\d*件/.test(t) || t === '次' || t === '前';
+    const pageNo = t => {
+        const m = /^[\[(（【]?\s*(\d+)\s*[\])）】]?$/.exec(t.trim());
+        return m ? parseInt(m[1], 10) : null;
+    };
+    let pager = null;
+    const nav = els.find(a => isNav(text(a)));
+    if (nav) {
+        for (let el = nav.parentElement, depth = 0; el && depth < 4; el = el.parentElement, depth++) {
+            if (els.some(a => a !== nav && el.contains(a) && /^\d+$/.test(text(a)))) {
+                pager = el;
+                break;
+            }
+        }
+        pager = pager || nav.parentElement;
+    }
+    let current = null;
+    if (pager) {
+        const marked = pager.querySelector('[aria-current], .current, .active, .selected, .is-current');
+        if (marked) current = pageNo(text(marked));
+        if (current === null) {
+            const walker = document.createTreeWalker(pager, NodeFilter.SHOW_TEXT);
+            for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+                if (node.parentElement && node.parentElement.closest('a')) continue;
+                current = pageNo(node.textContent);
+                if (current !== null) break;
+            }
+        }
+    }
+    return {
+        current: current,
+        links: els.map((a, i) => [i, text(a), a.getAttribute('href') || '', !!pager && pager.contains(a)]),
+    };
+}
+"""
+
 
 class SummoScraper:
     """Summo入稿爬虫类（带反反爬虫策略）"""
 
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, profile_memory: bool = False):
         """
         初始化爬虫
         Args:
             headless: 是否使用无头模式
+            profile_memory: 是否开启内存剖析（每个区域结束时报告内存增长）
         """
         self.headless = headless
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
         self.session = None
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.artifacts: Optional[ArtifactStore] = None
+        self.attached = False  # 是否连接的是常驻浏览器
+        self.profile_memory = profile_memory
+        self.memory_profiler: Optional[MemoryProfiler] = None
+        self.nav_cache = NavigationCache()
+        self.position = ScrapePosition()  # 当前抓取位置，出错时恢复到这里
+        self.breaker = AreaCircuitBreaker(AREA_FAILURE_LIMIT)
 
     def _random_delay(self, min_sec: float = 0.5, max_sec: float = 2.0):
         """随机延迟，模拟人类操作"""
@@ -67,56 +137,104 @@ class SummoScraper:
             except:
                 pass
 
+    def _capture(self, name: str, area: str = None, page_num: int = None,
+                 html: bool = False, full_page: bool = False):
+        """
+        保存调试截图（和HTML）到产物存储
+        相同内容只存一份，失败不影响抓取流程
+        """
+        if not self.page or not self.artifacts:
+            return
+        try:
+            self.artifacts.put_page(self.page, name, area=area, page_num=page_num,
+                                    html=html, full_page=full_page)
+        except Exception as e:
+            print(f"  保存调试产物失败({name}): {e}")
+
+    def _click_cached(self, text: str) -> bool:
+        """
+        按导航缓存直接定位并点击（不扫描所有链接）
+        定位失败时删除该记录，由调用方回退到扫描
+        """
+        ptype = page_type(self.page)
+        route = self.nav_cache.lookup(ptype, text)
+        if not route:
+            return False
+
+        for frame in self.page.frames:
+            if frame_key(frame) != route['frame']:
+                continue
+            try:
+                target = frame.locator(route['selector']).first
+                if target.count() > 0:
+                    print(f"  在frame {route['frame']} 中直接定位(缓存): {text}")
+                    self._random_delay(0.5, 1)
+                    target.click()
+                    self._random_delay(2, 3)
+                    return True
+            except Exception as e:
+                print(f"  缓存定位点击失败: {e}")
+            break
+
+        self.nav_cache.forget(ptype, text)
+        return False
+
     def _click_in_frames(self, text: str, frames=None) -> bool:
         """
         在所有frame中查找并点击包含指定文字的链接
-        支持: inner text, title属性, alt属性
+        先按导航缓存直接定位，未命中时扫描: title属性, inner text, alt属性
+        扫描命中后记录frame和选择器，下次直接定位
         Args:
             text: 要查找的文字
             frames: frame列表，如果为None则使用当前页面的frames
         Returns:
             是否成功点击
         """
+        if self._click_cached(text):
+            return True
+
         if frames is None:
             frames = self.page.frames
+        ptype = page_type(self.page)
 
         for frame in frames:
             try:
                 # 方法1: 通过title属性查找（SUUMO菜单使用title）
-                elem = frame.query_selector(f'a[title*="{text}"]')
+                selector = f'a[title*="{text}"]'
+                elem = frame.query_selector(selector)
                 if elem:
                     print(f"  在frame {frame.name} 中找到(title): {text}")
                     self._random_delay(0.5, 1)
                     try:
                         elem.click()
+                        self.nav_cache.record(ptype, text, frame, selector)
                         self._random_delay(2, 3)
                         return True
                     except Exception as click_err:
                         print(f"  点击失败: {click_err}")
 
-                # 方法2: 通过inner text精确查找
-                links = frame.query_selector_all('a')
-                for link in links:
+                # 方法2: 通过inner text查找（一次往返比较frame内所有链接）
+                match = frame.eval_on_selector_all('a', FIND_LINK_JS, text)
+                if match:
+                    print(f"  在frame {frame.name} 中找到链接: '{match['text']}' title='{match['title']}'")
+                    self._random_delay(0.5, 1)
                     try:
-                        link_text = link.inner_text().strip()
-                        link_title = link.get_attribute('title') or ''
-                        # 精确匹配或包含匹配
-                        if link_text == text or text in link_text or text in link_title:
-                            print(f"  在frame {frame.name} 中找到链接: '{link_text}' title='{link_title}'")
-                            self._random_delay(0.5, 1)
-                            link.click()
-                            self._random_delay(2, 3)
-                            return True
-                    except Exception as e:
-                        continue
+                        frame.locator('a').nth(match['index']).click()
+                        self.nav_cache.record(ptype, text, frame, link_selector(text, match))
+                        self._random_delay(2, 3)
+                        return True
+                    except Exception as click_err:
+                        print(f"  点击失败: {click_err}")
 
                 # 方法3: 检查图片alt
-                imgs = frame.query_selector_all(f'img[alt*="{text}"]')
+                selector = f'img[alt*="{text}"]'
+                imgs = frame.query_selector_all(selector)
                 if imgs:
                     print(f"  在frame {frame.name} 中找到图片: {text}")
                     self._random_delay(0.5, 1)
                     try:
                         imgs[0].click()
+                        self.nav_cache.record(ptype, text, frame, selector)
                         self._random_delay(2, 3)
                         return True
                     except Exception as click_err:
@@ -129,67 +247,39 @@ class SummoScraper:
         print(f"  未找到: {text}")
         return False
 
-    def start(self):
-        """启动浏览器（带反检测配置）"""
+    def start(self, use_daemon: bool = True):
+        """
+        启动浏览器（带反检测配置）
+        Args:
+            use_daemon: 常驻浏览器在运行时直接连接（python main.py daemon），否则新启动
+        """
         self.playwright = sync_playwright().start()
 
-        # 选择随机User-Agent
-        user_agent = random.choice(USER_AGENTS)
-
-        # 启动浏览器，添加反检测参数
-        self.browser = self.playwright.chromium.launch(
-            headless=self.headless,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-infobars',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--lang=ja-JP',
-            ]
-        )
-
-        # 创建浏览器上下文，模拟真实浏览器
-        context = self.browser.new_context(
-            user_agent=user_agent,
-            viewport={'width': 1920, 'height': 1080},
-            locale='ja-JP',
-            timezone_id='Asia/Tokyo',
-            # 添加更多真实浏览器特征
-            extra_http_headers={
-                'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            }
-        )
-
-        self.page = context.new_page()
-
-        # 注入JavaScript隐藏自动化特征
-        self.page.add_init_script("""
-            // 隐藏webdriver标识
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
+        attached = attach_browser(self.playwright, 'forrent') if use_daemon else None
+        if attached:
+            self.browser, self.page = attached
+            self.attached = True
+            user_agent = self.page.evaluate('navigator.userAgent')
+        else:
+            # 选择随机User-Agent
+            user_agent = random.choice(USER_AGENTS)
 
-            // 隐藏自动化相关属性
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5]
-            });
+            # 启动浏览器，添加反检测参数
+            self.browser = self.playwright.chromium.launch(
+                headless=self.headless,
+                args=LAUNCH_ARGS
+            )
 
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['ja-JP', 'ja', 'en-US', 'en']
-            });
+            # 创建浏览器上下文，模拟真实浏览器
+            context = self.browser.new_context(
+                user_agent=user_agent,
+                **CONTEXT_OPTIONS
+            )
 
-            // 模拟Chrome浏览器
-            window.chrome = {
-                runtime: {}
-            };
+            self.page = context.new_page()
 
-            // 隐藏Playwright特征
-            delete window.__playwright;
-            delete window.__pw_manual;
-        """)
+            # 注入JavaScript隐藏自动化特征
+            self.page.add_init_script(STEALTH_SCRIPT)
 
         # 设置超时时间
         self.page.set_default_timeout(30000)
@@ -198,17 +288,38 @@ class SummoScraper:
         engine = init_db()
         self.session = get_session(engine)
 
+        # 调试产物存储
+        self.artifacts = ArtifactStore(run_id=self.run_id)
+
+        if self.profile_memory:
+            self.memory_profiler = MemoryProfiler(
+                page=self.page, attached=self.attached,
+                log_path=f"data/memory_profile_{self.run_id}.jsonl"
+            )
+            self.memory_profiler.start()
+
         print(f"浏览器启动成功 (User-Agent: {user_agent[:50]}...)")
 
     def stop(self):
         """关闭浏览器"""
+        if self.memory_profiler:
+            # 在页面关闭之前输出最终汇总
+            self.memory_profiler.stop()
         if self.session:
             self.session.close()
-        if self.browser:
+        if self.artifacts:
+            self.artifacts.close()
+        if self.attached:
+            # 常驻浏览器只关闭本次打开的标签页，保留登录状态
+            try:
+                self.page.close()
+            except Exception:
+                pass
+        elif self.browser:
             self.browser.close()
         if hasattr(self, 'playwright'):
             self.playwright.stop()
-        print("浏览器已关闭")
+        print("已断开常驻浏览器" if self.attached else "浏览器已关闭")
 
     def login(self) -> bool:
         """
@@ -257,7 +368,7 @@ class SummoScraper:
 
             if not username_input:
                 print("未找到用户名输入框，可能已经登录或页面结构不同")
-                self.page.screenshot(path="data/login_page.png")
+                self._capture("login_page", html=True)
                 return self._check_if_logged_in()
 
             print(f"找到用户名输入框")
@@ -320,13 +431,13 @@ class SummoScraper:
 
         except Exception as e:
             print(f"登录失败: {e}")
-            self.page.screenshot(path="data/login_error.png")
+            self._capture("login_error", html=True)
             return False
 
     def _check_if_logged_in(self) -> bool:
         """检查是否已登录"""
         try:
-            self.page.screenshot(path="data/current_page.png")
+            self._capture("current_page")
             print(f"当前页面URL: {self.page.url}")
 
             # 检查是否还在登录页面
@@ -360,7 +471,7 @@ class SummoScraper:
                 print(f"  Frame {i}: name={frame.name}, url={frame.url[:60]}...")
 
             # 保存当前页面用于调试
-            self.page.screenshot(path="data/step0_main.png")
+            self._capture("step0_main")
 
             # 获取导航frame (navi)
             navi_frame = None
@@ -378,7 +489,8 @@ class SummoScraper:
             # 菜单按钮HTML: <a class="menu_btn" id="menu_5" title="会社間流通">
             # 使用 title 属性或 id 来定位
             print("步骤1: 点击会社間流通...")
-            clicked = False
+            clicked = self._click_cached("会社間流通")
+            ptype = page_type(self.page)
 
             # 方法1: 通过title属性查找
             menu_selectors = [
@@ -388,6 +500,8 @@ class SummoScraper:
             ]
 
             for selector in menu_selectors:
+                if clicked:
+                    break
                 try:
                     elem = navi_frame.query_selector(selector)
                     if elem:
@@ -395,12 +509,13 @@ class SummoScraper:
                         self._random_delay(0.5, 1)
                         elem.click()
                         clicked = True
+                        self.nav_cache.record(ptype, "会社間流通", navi_frame, selector)
                         self._random_delay(2, 3)
                         break
                 except Exception as e:
                     print(f"  选择器 {selector} 失败: {e}")
 
-            self.page.screenshot(path="data/step1_after_menu.png")
+            self._capture("step1_after_menu")
 
             if not clicked:
                 print("  未能点击会社間流通菜单")
@@ -413,6 +528,7 @@ class SummoScraper:
 
             # 步骤2: 直接点击東京（在関東区域下）
             print("步骤2: 点击東京...")
+            ptype = page_type(self.page)
             tokyo_clicked = self._click_in_frames("東京", frames)
 
             if not tokyo_clicked:
@@ -420,17 +536,19 @@ class SummoScraper:
                 print("  尝试通过href查找東京链接...")
                 for frame in frames:
                     try:
-                        link = frame.query_selector('a[href*="todofukenCd=13"]')
+                        selector = 'a[href*="todofukenCd=13"]'
+                        link = frame.query_selector(selector)
                         if link:
                             print("  找到東京链接(href)")
                             link.click()
                             tokyo_clicked = True
+                            self.nav_cache.record(ptype, "東京", frame, selector)
                             self._random_delay(2, 3)
                             break
                     except:
                         continue
 
-            self.page.screenshot(path="data/step2_tokyo.png")
+            self._capture("step2_tokyo")
 
             if not tokyo_clicked:
                 print("  未能点击東京链接")
@@ -438,7 +556,7 @@ class SummoScraper:
 
             self._random_delay(2, 3)
 
-            self.page.screenshot(path="data/tokyo_areas.png")
+            self._capture("tokyo_areas")
             print("成功导航到东京区域选择页面")
             return True
 
@@ -446,41 +564,42 @@ class SummoScraper:
             print(f"导航失败: {e}")
             import traceback
             traceback.print_exc()
-            self.page.screenshot(path="data/navigation_error.png")
+            self._capture("navigation_error", html=True)
             return False
 
-    def get_tokyo_areas(self) -> List[str]:
+    def get_tokyo_areas(self, refresh: bool = False) -> List[str]:
         """
         从当前页面获取东京所有市郡区列表
+        结果按 AREA_CACHE_TTL_HOURS 缓存，过期或 refresh=True 时重新扫描页面
         Returns:
             市郡区名称列表
         """
+        if not refresh:
+            cached = self.nav_cache.get_areas()
+            if cached:
+                print(f"使用缓存的区域列表: {len(cached)} 个区域")
+                return cached
+
         areas = []
         try:
             frames = self.page.frames
 
-            # 在frames中查找区域链接
+            # 在frames中查找区域链接（每个frame一次往返取回所有链接）
             for frame in frames:
                 try:
-                    # 查找所有包含"区"或"市"的链接
-                    links = frame.query_selector_all('a')
-                    for link in links:
-                        try:
-                            text = link.inner_text().strip()
-                            href = link.get_attribute('href') or ''
-                            # 筛选区域链接（包含shiguCd参数或以区/市结尾）
-                            if ('shiguCd' in href or 'todofukenCd' in href) and text:
-                                if ('区' in text or '市' in text) and len(text) < 15:
-                                    if text not in areas and text != '東京':
-                                        areas.append(text)
-                        except:
-                            continue
+                    for text, href in frame.eval_on_selector_all('a', AREA_LINKS_JS):
+                        # 筛选区域链接（包含shiguCd参数或以区/市结尾）
+                        if ('shiguCd' in href or 'todofukenCd' in href) and text:
+                            if ('区' in text or '市' in text) and len(text) < 15:
+                                if text not in areas and text != '東京':
+                                    areas.append(text)
                 except:
                     continue
 
             # 如果从页面获取到区域，直接返回
             if areas:
                 print(f"从页面获取到 {len(areas)} 个区域: {areas[:5]}...")
+                self.nav_cache.set_areas(areas)
                 return areas
 
             # 如果无法自动获取，使用东京23区的预设列表
@@ -611,7 +730,7 @@ class SummoScraper:
                         continue
 
                 if search_clicked:
-                    self.page.screenshot(path=f"data/search_{area_name}.png")
+                    self._capture("search", area=area_name)
                     return True
 
             # 方法2: 直接点击区域链接
@@ -633,7 +752,7 @@ class SummoScraper:
                     except:
                         continue
 
-                self.page.screenshot(path=f"data/search_{area_name}.png")
+                self._capture("search", area=area_name)
                 return True
             else:
                 print(f"  未找到区域链接: {area_name}")
@@ -699,25 +818,35 @@ class SummoScraper:
             print(f"排序失败: {e}")
             return False
 
-    def scrape_property_list(self, area_name: str) -> List[Dict]:
+    def scrape_property_list(self, area_name: str, page_num: int = None,
+                             strict: bool = False) -> List[Dict]:
         """
         抓取当前页面的物件列表
         页面结构：表格，每行是一个物件
         Args:
             area_name: 当前区域名称
+            page_num: 当前页码（用于调试产物索引）
+            strict: 严格模式，物件表格所在frame中有行解析出错，或没有找到物件表格而其他frame出错时
+                    抛出 StepFailed，由调用方恢复页面后重试（默认跳过出错的行）；
+                    与物件表格无关的frame（广告等）出错只打印
         Returns:
             物件数据列表
         """
         properties = []
+        table_errors = []  # 物件表格所在frame中的错误
+        other_errors = []  # 其他frame中的错误
+        table_found = False  # 是否有frame中找到了物件表格
         try:
             self._random_delay(1, 2)
             frames = self.page.frames
 
             # 保存当前页面用于调试
-            self.page.screenshot(path=f"data/property_list_{area_name}.png")
+            self._capture("property_list", area=area_name, page_num=page_num, html=True)
 
             # 在所有frame中查找物件表格
             for frame in frames:
+                frame_errors = []
+                has_table = False
                 try:
                     frame_url = frame.url
                     frame_name = frame.name or "unnamed"
@@ -745,6 +874,7 @@ class SummoScraper:
                         if not is_property_table:
                             continue
 
+                        has_table = True
                         print(f"  在frame '{frame_name}' 表格{table_idx} 中找到 {len(rows)-1} 个数据行")
 
                         # 遍历数据行（跳过表头）
@@ -771,25 +901,40 @@ class SummoScraper:
                                     # 因为后面的物件反響数只会更低
 
                             except Exception as row_err:
+                                frame_errors.append(f"第{row_idx}行: {row_err}")
                                 continue
 
                         # 如果找到物件表格就跳出
                         if properties:
                             break
 
-                    if properties:
-                        break
-
                 except Exception as frame_err:
-                    continue
+                    frame_errors.append(f"frame {frame.name or 'unnamed'}: {frame_err}")
+
+                table_found = table_found or has_table
+                (table_errors if has_table else other_errors).extend(frame_errors)
+                if properties:
+                    break
 
             print(f"找到 {len(properties)} 个物件 (反響数>={MIN_RESPONSE_COUNT})")
 
         except Exception as e:
+            if strict:
+                raise StepFailed(f"抓取物件列表失败: {e}") from e
             print(f"抓取物件列表失败: {e}")
             import traceback
             traceback.print_exc()
 
+        if strict and table_errors:
+            raise StepFailed(f"{len(table_errors)} 处解析出错，{table_errors[0]}")
+        if strict and not table_found and other_errors:
+            # 没有找到物件表格：表格可能就在出错的frame中
+            # （找到表格但没有达到阈值的物件是正常的，如按反響数排序的最后几页）
+            raise StepFailed(f"没有找到物件表格，{len(other_errors)} 处frame出错，{other_errors[0]}")
+        if table_errors:
+            print(f"  {len(table_errors)} 处解析出错（已跳过），{table_errors[0]}")
+        if other_errors:
+            print(f"  其他frame中 {len(other_errors)} 处出错（已忽略），{other_errors[0]}")
         return properties
 
     def _extract_property_data_from_row(self, row, cells, area_name: str, row_text: str) -> Optional[Dict]:
@@ -981,31 +1126,227 @@ class SummoScraper:
             return None
 
     def save_properties(self, properties: List[Dict]):
-        """保存物件数据到数据库"""
-        saved_count = 0
-        for prop_data in properties:
-            try:
-                property_obj = Property(**prop_data)
-                self.session.add(property_obj)
-                saved_count += 1
-            except Exception as e:
-                print(f"保存物件失败: {e}")
-                continue
-
+        """
+        保存物件数据到数据库
+        按物件自然键批量upsert：重复抓取的物件更新原有行，而不是新增重复行
+        """
         try:
-            self.session.commit()
+            saved_count = upsert_properties(self.session, properties)
             print(f"成功保存 {saved_count} 个物件")
         except Exception as e:
             print(f"提交数据库失败: {e}")
             self.session.rollback()
 
+    def _needs_login(self) -> bool:
+        """会话是否已失效（回到了登录页）"""
+        if 'login' in self.page.url.lower():
+            return True
+        for frame in self.page.frames:
+            try:
+                if frame.query_selector('input[type="password"]'):
+                    return True
+            except Exception:
+                continue
+        return False
+
+    def _recover(self) -> bool:
+        """
+        恢复到 self.position 记录的位置：必要时重新登录，
+        重新进入区域、恢复排序，并直接跳回出错的页码
+        """
+        pos = self.position
+        print(f"  恢复到: {pos}")
+        try:
+            if self.page.is_closed():
+                self.page = self.page.context.new_page()
+                self.page.set_default_timeout(30000)
+
+            if self._needs_login():
+                print("  会话已失效，重新登录...")
+                if not self.login():
+                    return False
+
+            if not self.navigate_to_property_search():
+                return False
+            if pos.area is None:
+                return True
+            if not self.search_area(pos.area):
+                return False
+            if pos.sorted and not self.filter_by_response_count():
+                return False
+            if pos.page_num > 1 and not self._goto_page(pos.page_num, 1):
+                return False
+
+            print(f"  已恢复: {pos}")
+            return True
+        except Exception as e:
+            print(f"  恢复失败: {e}")
+            return False
+
+    def _sort_by_response(self) -> Optional[bool]:
+        """排序步骤：排序链接不存在不算出错，返回None以免触发重试"""
+        return True if self.filter_by_response_count() else None
+
+    def _run_step(self, name: str, step, *args, **kwargs):
+        """
+        执行一个抓取步骤；返回False或抛出异常视为失败，
+        恢复到 self.position 后重试，最多 SCRAPE_MAX_RETRIES 次
+        Raises:
+            AreaAborted: 重试次数用尽或该区域已熔断
+        """
+        pos = self.position
+        for attempt in range(SCRAPE_MAX_RETRIES + 1):
+            try:
+                result = step(*args, **kwargs)
+                if result is False:
+                    raise StepFailed(f"{name}失败")
+                return result
+            except Exception as e:
+                reason = str(e)
+                print(f"  {name}出错 ({pos}): {reason}")
+                self._capture(f"error_{name}", area=pos.area, page_num=pos.page_num, html=True)
+
+            if pos.area and self.breaker.record_failure(pos.area):
+                raise AreaAborted(pos.area, pos.page_num, f"失败次数达到 {AREA_FAILURE_LIMIT} 次，熔断")
+            if attempt == SCRAPE_MAX_RETRIES:
+                break
+
+            print(f"  第{attempt + 1}次重试 {name}...")
+            self._random_delay(2 * (attempt + 1), 3 * (attempt + 1))
+            self._recover()
+
+        raise AreaAborted(pos.area, pos.page_num, f"{name}重试 {SCRAPE_MAX_RETRIES} 次仍失败: {reason}")
+
+    def _listing_total(self) -> Optional[int]:
+        """从列表页的 "1-50件/1234件" 文字读取物件总数，读不到时返回None"""
+        for frame in self.page.frames:
+            try:
+                match = re.search(r'/\s*(\d+)\s*件', frame.inner_text('body'))
+                if match:
+                    return int(match.group(1))
+            except Exception:
+                continue
+        return None
+
+    def _scrape_area_pages(self, area: str, enter: bool = True, start_page: int = 1,
+                           end_page: int = 20, lease=None) -> tuple:
+        """
+        抓取单个区域的高反響页面，每一步出错时恢复位置后重试
+        Args:
+            area: 区域名
+            enter: 是否需要先回到东京区域选择页面
+            start_page: 起始页（>1时直接跳页）
+            end_page: 结束页（含），防止无限翻页
+            lease: 任务队列租约，每页之前检查是否仍持有
+        Returns:
+            (保存的物件数, 区域是否已没有更多符合条件的页面)
+        """
+        area_count = 0
+        self.position = ScrapePosition()
+
+        if enter:
+            self._run_step("导航", self.navigate_to_property_search)
+
+        self._run_step("搜索区域", self.search_area, area)
+        self.position = ScrapePosition(area=area)
+
+        # 按推定反響数排序（降序）；找不到排序链接时（如无物件）按原顺序继续
+        self.position.sorted = bool(self._run_step("排序", self._sort_by_response))
+
+        if start_page > 1:
+            total = self._listing_total()
+            if total is not None and start_page > (total + PAGE_SIZE - 1) // PAGE_SIZE:
+                print(f"  共 {total} 件，没有第{start_page}页")
+                self.position.page_num = start_page - 1
+                return area_count, True
+            self._run_step("跳页", self._goto_page, start_page, 1)
+            self.position.page_num = start_page
+
+        # 处理分页 - 继续抓取直到没有更多高反响物件
+        while True:
+            if lease is not None:
+                lease.check()
+
+            page_num = self.position.page_num
+            properties = self._run_step("抓取列表", self.scrape_property_list,
+                                        area, page_num=page_num, strict=True)
+            if properties:
+                self.save_properties(properties)
+                area_count += len(properties)
+                print(f"  第{page_num}页: {len(properties)} 个物件")
+            elif page_num > 1:
+                # 没有找到符合条件的物件，停止翻页
+                print(f"  第{page_num}页: 无符合条件物件，停止")
+                return area_count, True
+
+            if not self._has_next_page():
+                return area_count, True
+            if page_num >= end_page:
+                return area_count, False
+
+            self._random_delay(1, 2)
+            self._run_step("翻页", self._goto_next_page)
+            self.position.page_num = page_num + 1
+
+    def run_worker(self, queue, max_tasks: Optional[int] = None) -> int:
+        """
+        作为任务队列的worker运行：领取区域/页码范围，抓取期间续约，完成后释放
+        多个worker（各自的账号会话）可同时运行，不会重复抓取同一区域
+        Args:
+            queue: database.work_queue.WorkQueue
+            max_tasks: 最多处理的任务数，None表示直到队列为空
+        Returns:
+            完成的任务数
+        """
+        from database.work_queue import LeaseLost
+
+        done = 0
+        at_area_selection = True  # 登录并导航后，第一个任务已在区域选择页面
+
+        while max_tasks is None or done < max_tasks:
+            lease = queue.claim()
+            if lease is None:
+                print(f"[{queue.worker_id}] 队列中没有可领取的任务")
+                break
+
+            area = lease['area_name']
+            print(f"\n[{queue.worker_id}] 领取任务 {lease.id}: {area} 第{lease['page_start']}-{lease['page_end']}页")
+            with lease:
+                try:
+                    count, exhausted = self._scrape_area_pages(
+                        area, enter=not at_area_selection,
+                        start_page=lease['page_start'], end_page=lease['page_end'] or 20,
+                        lease=lease
+                    )
+                    queue.complete(lease, count, self.position.page_num, area_exhausted=exhausted)
+                    print(f"  任务 {lease.id} 完成: {count} 个物件")
+                    done += 1
+                except LeaseLost as e:
+                    # 任务已被其他worker接手，不再写状态
+                    print(f"  {e}，放弃该任务")
+                except AreaAborted as e:
+                    queue.fail(lease, e.reason, last_page=e.page_num)
+                    print(f"  任务 {lease.id} 失败，放回队列: {e.reason}")
+                except Exception as e:
+                    queue.fail(lease, str(e), last_page=self.position.page_num)
+                    raise
+            at_area_selection = False
+            self._profile_checkpoint(area)
+
+        print(f"[{queue.worker_id}] 结束，完成 {done} 个任务，队列状态: {queue.summary()}")
+        return done
+
     def scrape_all_areas(self):
-        """抓取东京所有区域的物件数据"""
+        """
+        抓取东京所有区域的物件数据
+        某一步出错时恢复到出错前的 区域/排序/页码 继续，同一区域失败过多则熔断跳过
+        """
         # 先获取区域列表
         areas = self.get_tokyo_areas()
         total_properties = 0
         area_stats = {}
         skipped_areas = []
+        aborted = {}
 
         print(f"\n开始抓取 {len(areas)} 个区域的数据...")
 
@@ -1015,55 +1356,23 @@ class SummoScraper:
             # 随机延迟，避免被检测
             self._random_delay(1, 2)
 
-            area_count = 0
-
-            # 每次都重新导航到东京区域选择页面，确保状态正确
-            if idx > 0:  # 第一次已经在正确页面
-                if not self.navigate_to_property_search():
-                    print(f"  导航失败，跳过 {area}")
-                    skipped_areas.append(area)
-                    continue
-
-            if self.search_area(area):
-                # 按推定反響数排序（降序）
-                self.filter_by_response_count()
-
-                # 抓取第一页
-                properties = self.scrape_property_list(area)
-
-                if properties:
-                    self.save_properties(properties)
-                    area_count += len(properties)
-                    print(f"  第1页: {len(properties)} 个物件")
-
-                # 处理分页 - 继续抓取直到没有更多高反响物件
-                page_num = 1
-                max_pages = 20  # 最多抓取20页，防止无限循环
-
-                while page_num < max_pages and self._has_next_page():
-                    page_num += 1
-                    self._random_delay(1, 2)
+            try:
+                # 每次都重新导航到东京区域选择页面，确保状态正确（第一次已经在正确页面）
+                area_count, _ = self._scrape_area_pages(area, enter=idx > 0)
+            except AreaAborted as e:
+                print(f"  放弃 {area}: {e.reason}")
+                skipped_areas.append(area)
+                aborted[area] = e.page_num
+                self._profile_checkpoint(area, rows=total_properties)
+                continue
 
-                    if not self._goto_next_page():
-                        break
+            total_properties += area_count
+            area_stats[area] = area_count
 
-                    page_properties = self.scrape_property_list(area)
-                    if page_properties:
-                        self.save_properties(page_properties)
-                        area_count += len(page_properties)
-                        print(f"  第{page_num}页: {len(page_properties)} 个物件")
-                    else:
-                        # 没有找到符合条件的物件，停止翻页
-                        print(f"  第{page_num}页: 无符合条件物件，停止")
-                        break
+            if area_count > 0:
+                print(f"  {area} 共: {area_count} 个物件")
 
-                total_properties += area_count
-                area_stats[area] = area_count
-
-                if area_count > 0:
-                    print(f"  {area} 共: {area_count} 个物件")
-            else:
-                skipped_areas.append(area)
+            self._profile_checkpoint(area, rows=total_properties)
 
         # 打印统计信息
         print(f"\n{'='*50}")
@@ -1075,8 +1384,15 @@ class SummoScraper:
                 print(f"  {area}: {count}")
         if skipped_areas:
             print(f"\n跳过的区域 ({len(skipped_areas)}个): {', '.join(skipped_areas[:10])}...")
+            for area, page_num in aborted.items():
+                print(f"  {area}: 停在第{page_num}页 (失败 {self.breaker.failures.get(area, 0)} 次)")
         print(f"{'='*50}")
 
+    def _profile_checkpoint(self, label: str, rows: Optional[int] = None):
+        """内存剖析检查点（未开启 --profile-memory 时不做任何事）"""
+        if self.memory_profiler:
+            self.memory_profiler.checkpoint(label, rows=rows)
+
     def _has_next_page(self) -> bool:
         """检查是否有下一页 - 在frames中查找"""
         try:
@@ -1127,6 +1443,160 @@ class SummoScraper:
             print(f"翻页失败: {e}")
             return False
 
+    def _pager_state(self) -> tuple:
+        """
+        一次性取出各frame分页器中的链接文字和href，以及当前页码（每个frame一次往返）
+        只保留分页器容器内的链接，或href带页码/偏移参数的页码链接，
+        避免把表格中的数字链接、「前月」等普通链接当成分页链接
+        Returns:
+            ([(frame, 链接序号, 文字, href), ...], 当前页码或None)
+        """
+        links = []
+        current = None
+        for frame in self.page.frames:
+            try:
+                state = frame.eval_on_selector_all('a', PAGER_JS)
+            except Exception:
+                continue
+            if current is None:
+                current = state.get('current')
+            for idx, text, href, in_pager in state.get('links', []):
+                if not (text.isdigit() or '次' in text or '前' in text):
+                    continue
+                if in_pager or PAGE_PARAM_RE.search(href):
+                    links.append((frame, idx, text, href))
+        return links, current
+
+    def _confirm_page(self, target_page: int) -> Optional[int]:
+        """
+        跳转后读取分页器中的当前页码
+        Returns:
+            实际页码；读不到页码时按已到达target_page处理
+        """
+        _, current = self._pager_state()
+        if current is None:
+            print(f"  (未能读取当前页码，按第{target_page}页处理)")
+            return target_page
+        if current != target_page:
+            print(f"  跳转后位于第{current}页，不是第{target_page}页")
+        return current
+
+    def _pager_url(self, links: List[tuple], target_page: int, current_page: int) -> Optional[tuple]:
+        """
+        根据分页链接href中的页码/偏移参数推算目标页URL
+        Returns:
+            (frame, url) 或 None
+        """
+        known = []  # (frame, 页码, 参数值, href, match)
+        for frame, idx, text, href in links:
+            if not href or href.startswith('javascript'):
+                continue
+            m = PAGE_PARAM_RE.search(href)
+            if not m:
+                continue
+            if text.isdigit():
+                page_no = int(text)
+            elif '次' in text:
+                page_no = current_page + 1
+            else:
+                continue
+            known.append((frame, page_no, int(m.group(2)), href, m))
+
+        if not known:
+            return None
+
+        frame, page_no, value, href, m = known[0]
+        # 两个已知点可直接求出步长；只有一个时按参数名判断是页码还是行偏移
+        step = None
+        for _, other_no, other_value, _, _ in known[1:]:
+            if other_no != page_no:
+                step = (other_value - value) // (other_no - page_no)
+                break
+        if not step:
+            step = PAGE_SIZE if m.group(1).lower().strip('?&=') in OFFSET_PARAMS else 1
+
+        target_value = value + (target_page - page_no) * step
+        if target_value < 0:
+            return None
+
+        url = href[:m.start(2)] + str(target_value) + href[m.end(2):]
+        return frame, urljoin(frame.url, url)
+
+    def _goto_page(self, target_page: int, current_page: int = 1, max_hops: int = 10) -> bool:
+        """
+        直接跳转到第N页，而不是逐页点击「次へ」
+        依次尝试: 分页器中的页码链接 -> 按URL参数构造目标页 -> 跳到最近的可见页码再继续
+        Args:
+            target_page: 目标页码（从1开始）
+            current_page: 当前页码
+            max_hops: 最大跳转次数
+        Returns:
+            是否到达目标页
+        """
+        if target_page == current_page:
+            return True
+
+        for _ in range(max_hops):
+            links, _ = self._pager_state()
+
+            # 方法1: 分页器中直接有目标页码
+            hit = next(((frame, idx) for frame, idx, text, href in links if text == str(target_page)), None)
+            if hit:
+                frame, idx = hit
+                self._move_mouse_randomly()
+                frame.locator('a').nth(idx).click()
+                self._random_delay(2, 3)
+                before, current_page = current_page, self._confirm_page(target_page)
+                if current_page == target_page:
+                    print(f"  跳转到第{target_page}页 (页码链接)")
+                    return True
+                if current_page == before:
+                    break  # 点击后页码没有变化，不再重复点击
+                continue
+
+            # 方法2: 从分页链接的URL参数推算
+            resolved = self._pager_url(links, target_page, current_page)
+            if resolved:
+                frame, url = resolved
+                try:
+                    frame.goto(url)
+                    self._random_delay(2, 3)
+                    before, current_page = current_page, self._confirm_page(target_page)
+                    if current_page == target_page:
+                        print(f"  跳转到第{target_page}页 (URL)")
+                        return True
+                    if current_page == before:
+                        break
+                    continue
+                except Exception as e:
+                    print(f"  URL跳转失败: {e}")
+
+            # 方法3: 分页器只显示附近页码时，先跳到离目标最近的一页
+            between = []
+            for frame, idx, text, href in links:
+                if text.isdigit():
+                    n = int(text)
+                    if min(current_page, target_page) < n < max(current_page, target_page):
+                        between.append((abs(target_page - n), n, frame, idx))
+            if between:
+                _, n, frame, idx = min(between, key=lambda x: x[0])
+                frame.locator('a').nth(idx).click()
+                self._random_delay(1.5, 2.5)
+                current_page = self._confirm_page(n)
+                continue
+
+            # 方法4: 只能前进一页
+            if target_page > current_page and self._goto_next_page():
+                current_page = self._confirm_page(current_page + 1)
+                if current_page == target_page:
+                    return True
+                continue
+
+            break
+
+        print(f"  无法跳转到第{target_page}页 (当前第{current_page}页)")
+        return False
+
     def _go_back_to_area_selection(self):
         """返回区域选择页面"""
         try:
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 
 # 物件信息
 PROPERTY = {
@@ -30,9 +31,7 @@ def main():
     print(f"  沿線: {PROPERTY['railway']} {PROPERTY['station']}駅 徒歩{PROPERTY['walk_minutes']}分")
 
     playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context(viewport={"width": 1920, "height": 1080}, locale="ja-JP")
-    page = context.new_page()
+    browser, context, page, attached = open_browser(playwright, 'suumo')
 
     rent_man = PROPERTY['rent'] / 10000
 
@@ -238,7 +237,7 @@ def main():
         print("=" * 70)
 
     finally:
-        browser.close()
+        close_browser(browser, page, attached)
         playwright.stop()
 
 if __name__ == "__main__":
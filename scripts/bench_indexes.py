@@ -0,0 +1,156 @@
+"""
+properties 索引基准
+在合成数据上对比加索引（迁移1）前后各常用查询的执行计划和耗时，默认 10k / 1M 行
+用法: python scripts/bench_indexes.py [--rows 10000 1000000]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from database.models import Property
+from database.migrations import migrate
+
+
+AREAS = ["千代田区", "中央区", "港区", "新宿区", "文京区", "台東区", "墨田区", "江東区",
+         "品川区", "目黒区", "大田区", "世田谷区", "渋谷区", "中野区", "杉並区", "豊島区",
+         "北区", "荒川区", "板橋区", "練馬区", "足立区", "葛飾区", "江戸川区",
+         "八王子市", "立川市", "武蔵野市", "三鷹市", "府中市", "調布市", "町田市"]
+LINES = [f"路線{i}線" for i in range(60)]
+PLANS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK", "2LDK", "3LDK", "ワンルーム"]
+
+# 各脚本中的典型查询
+QUERIES = [
+    ('训练数据', '''
+        SELECT rent, management_fee, deposit, key_money, area_sqm, floor_plan, property_type,
+               built_year, railway_line, station, walk_minutes, area_name, estimated_response
+        FROM properties
+        WHERE estimated_response IS NOT NULL AND rent IS NOT NULL AND area_sqm IS NOT NULL
+    ''', ()),
+    ('训练样本按区域统计', '''
+        SELECT area_name, COUNT(*), AVG(estimated_response) FROM properties
+        WHERE rent IS NOT NULL AND area_sqm IS NOT NULL AND estimated_response >= 10
+        GROUP BY area_name
+    ''', ()),
+    ('高反響Top100', '''
+        SELECT id, property_name, estimated_response FROM properties
+        WHERE estimated_response >= 10 ORDER BY estimated_response DESC LIMIT 100
+    ''', ()),
+    ('区域内高反響', '''
+        SELECT COUNT(*), AVG(rent) FROM properties
+        WHERE area_name = ? AND estimated_response >= 10
+    ''', ('新宿区',)),
+    ('按区域分组', '''
+        SELECT area_name, COUNT(*), AVG(estimated_response) FROM properties GROUP BY area_name
+    ''', ()),
+    ('市区町村', 'SELECT COUNT(*) FROM properties WHERE address_city = ?', ('渋谷区',)),
+    ('沿線+駅', 'SELECT COUNT(*) FROM properties WHERE railway_line = ? AND station = ?', ('路線3線', '駅3_7')),
+    ('駅', 'SELECT COUNT(*), AVG(estimated_response) FROM properties WHERE station = ?', ('駅3_7',)),
+    ('間取り高反響', '''
+        SELECT COUNT(*) FROM properties WHERE floor_plan = ? AND estimated_response >= 10
+    ''', ('1LDK',)),
+    ('最近抓取', 'SELECT COUNT(*) FROM properties WHERE scraped_at >= ?', ('2026-06-25',)),
+]
+
+
+def create_database(path: str, rows: int, seed: int = 0):
+    """建表（不含索引）并写入合成数据"""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(CreateTable(Property.__table__))
+    engine.dispose()
+
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    conn = sqlite3.connect(path)
+
+    def generate():
+        for i in range(rows):
+            area = rng.choice(AREAS)
+            line = rng.randrange(len(LINES))
+            has_size = rng.random() < 0.9
+            yield (
+                f"物件{i % 5000}", area, area, LINES[line], f"駅{line}_{rng.randrange(12)}",
+                rng.choice(PLANS),
+                rng.randrange(40000, 250000, 1000) if has_size else None,
+                round(rng.uniform(15, 80), 2) if has_size else None,
+                min(int(rng.expovariate(0.25)), 30),
+                (start + timedelta(seconds=i * 15_552_000 // rows)).isoformat(' '),
+            )
+
+    conn.executemany(
+        'INSERT INTO properties (property_name, area_name, address_city, railway_line, station, '
+        'floor_plan, rent, area_sqm, estimated_response, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        generate()
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_queries(path: str):
+    """返回 {查询名: (执行计划, 耗时ms, 结果行数)}"""
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, sql, params in QUERIES:
+        plan = ' / '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+        best = None
+        for _ in range(3):
+            t0 = time.perf_counter()
+            n = len(conn.execute(sql, params).fetchall())
+            elapsed = (time.perf_counter() - t0) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (plan, best, n)
+    conn.close()
+    return results
+
+
+def run(rows: int):
+    print(f"\n{'=' * 70}\n{rows:,} 行\n{'=' * 70}")
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    try:
+        t0 = time.perf_counter()
+        create_database(path, rows)
+        print(f"生成数据: {time.perf_counter() - t0:.1f}s")
+
+        before = run_queries(path)
+
+        t0 = time.perf_counter()
+        engine = create_engine(f"sqlite:///{path}")
+        migrate(engine, verbose=False)
+        engine.dispose()
+        print(f"建立索引 + ANALYZE: {time.perf_counter() - t0:.1f}s")
+
+        after = run_queries(path)
+
+        for name, _, _ in QUERIES:
+            plan_b, ms_b, n = before[name]
+            plan_a, ms_a, _ = after[name]
+            print(f"\n[{name}] {n:,} 行结果  {ms_b:.1f}ms -> {ms_a:.1f}ms ({ms_b / max(ms_a, 0.001):.1f}x)")
+            print(f"  前: {plan_b}")
+            print(f"  后: {plan_a}")
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='properties 索引基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+    args = parser.parse_args()
+
+    for n in args.rows:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+对比 list[dict] 与 RecordBuffer 保存抓取结果的内存占用和转DataFrame耗时
+用与 DetailedDataCollector 相同字段的合成数据，分别测 10k / 100k 行
+"""
+import os
+import sys
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from scraper.record_buffer import RecordBuffer
+
+
+AREAS = ["新宿区", "渋谷区", "品川区", "目黒区", "中野区", "豊島区", "江戸川区",
+         "大田区", "北区", "世田谷区", "板橋区", "港区", "杉並区", "練馬区"]
+LINES = ["JR山手線", "東京メトロ丸ノ内線", "京王線", "小田急線", "東急東横線", "都営新宿線"]
+STATIONS = ["新宿", "渋谷", "中野", "高円寺", "大井町", "目黒", "池袋", "練馬", "蒲田", "赤羽"]
+PLANS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK", "2LDK", "3LDK", "ワンルーム"]
+TYPES = ["マンション", "アパート", "一戸建て", "テラスハウス"]
+NAMES = ["メゾン", "ハイツ", "コーポ", "レジデンス", "パレス", "グランド"]
+
+
+def synthetic_rows(n: int, seed: int = 0):
+    """生成与 _extract_basic_info 输出结构相同的行（部分字段随机缺失）"""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    for i in range(n):
+        area = rng.choice(AREAS)
+        row = {
+            'area_name': area,
+            'address_city': area,
+            'scraped_at': (start + timedelta(seconds=i)).isoformat(),
+            'estimated_response': round(rng.uniform(0, 10), 1),
+            'rent': rng.randrange(40000, 250000, 1000),
+            'management_fee': rng.choice([0, 3000, 5000, 8000, 10000]),
+            'area_sqm': round(rng.uniform(15, 80), 2),
+            'floor_plan': rng.choice(PLANS),
+            'property_type': rng.choice(TYPES),
+            'built_year': rng.randint(1975, 2025),
+            'built_month': rng.randint(1, 12),
+            'railway_line': rng.choice(LINES),
+            'station': rng.choice(STATIONS),
+            'walk_minutes': rng.randint(1, 20),
+        }
+        if rng.random() < 0.8:
+            row['deposit'] = rng.choice([0, 1.0, 2.0])
+            row['deposit_type'] = 'none' if row['deposit'] == 0 else 'month'
+            row['key_money'] = rng.choice([0, 1.0])
+            row['key_money_type'] = 'none' if row['key_money'] == 0 else 'month'
+        if rng.random() < 0.6:
+            row['property_name'] = f"{rng.choice(NAMES)}{area}{i % 500}"
+            row['room_number'] = f"{rng.randint(1, 12)}0{rng.randint(1, 9)}号室"
+        yield row
+
+
+def measure(build):
+    """返回 (构建结果, 构建后保留的内存字节数, 耗时秒)"""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - t0
+
+
+def run(n: int):
+    print(f"\n=== {n:,} 行 ===")
+
+    rows, dict_bytes, dict_build = measure(lambda: list(synthetic_rows(n)))
+    df_dict, dict_df_sec = timed(lambda: pd.DataFrame(rows))
+    del rows, df_dict
+
+    buf, buf_bytes, buf_build = measure(lambda: RecordBuffer(synthetic_rows(n)))
+    df_buf, buf_df_sec = timed(buf.to_dataframe)
+    try:
+        _, buf_arrow_sec = timed(buf.to_arrow)
+    except RuntimeError:
+        buf_arrow_sec = None
+
+    print(f"{'':12} {'保留内存':>12} {'构建':>8} {'转DataFrame':>12}")
+    print(f"{'list[dict]':12} {dict_bytes / 1024 / 1024:>10.1f}MB {dict_build:>7.2f}s {dict_df_sec:>11.3f}s")
+    print(f"{'RecordBuffer':12} {buf_bytes / 1024 / 1024:>10.1f}MB {buf_build:>7.2f}s {buf_df_sec:>11.3f}s")
+    print(f"内存节省: {(1 - buf_bytes / dict_bytes) * 100:.0f}%  "
+          f"(DataFrame 内存: {df_buf.memory_usage(deep=True).sum() / 1024 / 1024:.1f}MB)")
+    if buf_arrow_sec is not None:
+        print(f"转Arrow: {buf_arrow_sec:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RecordBuffer 内存基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    for n in args.rows:
+        run(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+存储层基准
+在合成物件数据上，分别用SQLite默认设置和调优设置（apply_sqlite_pragmas：WAL、页缓存、mmap等）测:
+首次写入、重复抓取的upsert、按列读取、训练数据查询（原始列 / 特征表）、raw_data重新解析。
+结果写成JSON（含提交号和各库版本），用 --compare 与之前的结果逐项对比
+用法: python scripts/bench_storage.py [--rows 10000 100000 1000000] [--configs default tuned]
+                                       [--output 结果.json] [--compare 之前的结果.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import io
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import create_engine, event
+
+from database.models import Base, apply_sqlite_pragmas, connect_sqlite
+from database.migrations import migrate
+from database.bulk import upsert_properties
+from database.loader import load_properties
+from analysis.features import SOURCE_COLUMNS, load_features, refresh_features
+from scripts.parse_raw_data import update_database
+
+
+AREAS = ["千代田区", "中央区", "港区", "新宿区", "文京区", "台東区", "墨田区", "江東区",
+         "品川区", "目黒区", "大田区", "世田谷区", "渋谷区", "中野区", "杉並区", "豊島区",
+         "北区", "荒川区", "板橋区", "練馬区", "足立区", "葛飾区", "江戸川区",
+         "八王子市", "立川市", "武蔵野市", "三鷹市", "府中市", "調布市", "町田市"]
+LINES = [f"路線{i}線" for i in range(60)]
+PLANS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK", "2LDK", "3LDK", "ワンルーム"]
+TYPES = ["マンション", "アパート", "一戸建て", "テラスハウス"]
+STRUCTURES = ["RC", "SRC", "木造", "鉄骨"]
+NAMES = ["メゾン", "ハイツ", "コーポ", "レジデンス", "パレス", "グランド"]
+
+# 与 train_model_v2 的训练查询相同的列（该脚本导入时会切换工作目录，这里不直接import）
+TRAINING_COLUMNS = SOURCE_COLUMNS + ['railway_line', 'station', 'estimated_response']
+REQUIRED_COLUMNS = ['estimated_response', 'rent', 'area_sqm']
+
+# 分析器按列读取的典型投影
+PROJECTED_COLUMNS = ['area_name', 'floor_plan', 'railway_line', 'rent', 'area_sqm', 'estimated_response']
+
+CONFIGS = ('default', 'tuned')
+STAGES = ('insert', 'upsert', 'load_default', 'load_projected', 'training_query',
+          'feature_refresh', 'feature_load', 'reparse')
+
+# 写入时每批的行数（与抓取脚本每次保存的规模相当）
+WRITE_CHUNK = 50_000
+
+
+def synthetic_rows(start: int, stop: int, revision: int = 0, seed: int = 0):
+    """
+    生成物件行（含raw_data）。每行用独立的随机数，revision>0 时同一物件的识别字段不变，
+    每5个物件中有1个賃料/推定反響数变化（模拟重复抓取）
+    """
+    base_time = datetime(2026, 1, 1)
+    for i in range(start, stop):
+        rng = random.Random(seed * 1_000_003 + i)
+        area = rng.choice(AREAS)
+        line = rng.randrange(len(LINES))
+        station = f"St{line}-{rng.randrange(12)}"
+        walk = rng.randint(1, 20)
+        structure = rng.choice(STRUCTURES)
+        floors = rng.randint(2, 15)
+        fee = rng.choice([0, 3000, 5000, 8000, 10000])
+        property_type = rng.choice(TYPES)
+        rent = rng.randrange(40000, 250000, 1000)
+        response = min(int(rng.expovariate(0.25)), 30)
+        if revision and i % 5 == 0:
+            rent += 1000 * revision
+            response = max(response - revision, 0)
+        # 约3成的行缺少沿線/徒歩/構造等，由 reparse 从raw_data补全
+        parsed = rng.random() < 0.7
+        row = {
+            'property_name': f"{rng.choice(NAMES)}{area}{i}",
+            'room_number': f"{rng.randint(1, floors)}0{rng.randint(1, 9)}号室",
+            'address_prefecture': '東京都',
+            'address_city': area,
+            'address_detail': f"{area}{rng.randint(1, 5)}丁目",
+            'area_name': area,
+            'railway_line': LINES[line] if parsed else None,
+            'station': station if parsed else None,
+            'walk_minutes': walk if parsed else None,
+            'property_type': property_type,
+            'structure': structure if parsed else None,
+            'total_floors': floors if parsed else None,
+            'built_year': rng.randint(1975, 2025),
+            'floor_plan': rng.choice(PLANS),
+            'area_sqm': round(rng.uniform(15, 80), 2),
+            'rent': rent,
+            'management_fee': fee if parsed else None,
+            'deposit': rng.choice(['なし', '1ヶ月', '2ヶ月']),
+            'key_money': rng.choice(['なし', '1ヶ月']),
+            'estimated_response': response,
+            'scraped_at': base_time + timedelta(seconds=i),
+            'raw_data': (f"{LINES[line]}/{station} 徒歩{walk}分\n{property_type}\t{structure}\t"
+                         f"{rng.randint(1, floors)}階/{floors}階建\n敷金1ヶ月 礼金1ヶ月 管理費{fee:,}円"),
+        }
+        yield row
+
+
+def make_engine(path: str, config: str):
+    """default: SQLite默认设置（rollback日志、synchronous=FULL）；tuned: 与 get_engine 相同的连接设置"""
+    engine = create_engine(f"sqlite:///{path}")
+    if config == 'tuned':
+        event.listen(engine, 'connect', lambda conn, _record: apply_sqlite_pragmas(conn))
+    return engine
+
+
+def raw_connect(path: str, config: str) -> sqlite3.Connection:
+    return connect_sqlite(path) if config == 'tuned' else sqlite3.connect(path)
+
+
+def file_size_mb(path: str) -> float:
+    size = sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+    return round(size / 1024 / 1024, 2)
+
+
+def load_model_config():
+    with open(os.path.join(ROOT, 'models', 'model_config.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def timed(func, repeat: int = 1):
+    """返回 (最短耗时秒, 结果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(rows: int, config: str, stages, repeat: int) -> dict:
+    print(f"\n{'=' * 70}\n{rows:,} 行 / {config}\n{'=' * 70}")
+    directory = tempfile.mkdtemp(prefix='bench_storage_')
+    path = os.path.join(directory, 'properties.db')
+    engine = make_engine(path, config)
+    model_config = load_model_config()
+    results = {}
+
+    def record(stage, seconds, count):
+        results[stage] = {'seconds': round(seconds, 4), 'rows': int(count),
+                          'rows_per_s': round(count / seconds, 1) if seconds else None}
+        print(f"  {stage:<16} {seconds:9.3f}s  {count:>10,} 行")
+
+    def write(revision):
+        """分批写入，只计 upsert_properties 的耗时（不含生成合成数据）"""
+        seconds, written = 0.0, 0
+        for start in range(0, rows, WRITE_CHUNK):
+            chunk = list(synthetic_rows(start, min(start + WRITE_CHUNK, rows), revision))
+            elapsed, count = timed(lambda: upsert_properties(engine, chunk))
+            seconds += elapsed
+            written += count
+        return seconds, written
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            Base.metadata.create_all(engine)
+            migrate(engine, verbose=False)
+
+        # 写入类只测一次（会改变数据）；读取类取 repeat 次中最短
+        seconds, count = write(0)
+        record('insert', seconds, count)
+        size_after_insert = file_size_mb(path)
+
+        if 'upsert' in stages:
+            seconds, count = write(1)
+            record('upsert', seconds, count)
+
+        if 'load_default' in stages:
+            seconds, df = timed(lambda: load_properties(engine=engine), repeat)
+            record('load_default', seconds, len(df))
+
+        if 'load_projected' in stages:
+            seconds, df = timed(lambda: load_properties(PROJECTED_COLUMNS, engine=engine), repeat)
+            record('load_projected', seconds, len(df))
+
+        if 'training_query' in stages:
+            sql = f'''
+                SELECT {', '.join(TRAINING_COLUMNS)}
+                FROM properties
+                WHERE {' AND '.join(f'{col} IS NOT NULL' for col in REQUIRED_COLUMNS)}
+            '''
+
+            def training_query():
+                conn = raw_connect(path, config)
+                try:
+                    return pd.read_sql(sql, conn)
+                finally:
+                    conn.close()
+
+            seconds, df = timed(training_query, repeat)
+            record('training_query', seconds, len(df))
+
+        if 'feature_refresh' in stages or 'feature_load' in stages:
+            seconds, count = timed(lambda: refresh_features(model_config, engine=engine))
+            record('feature_refresh', seconds, count)
+
+        if 'feature_load' in stages:
+            seconds, df = timed(lambda: load_features(model_config, engine=engine, target='estimated_response',
+                                                      required=REQUIRED_COLUMNS), repeat)
+            record('feature_load', seconds, len(df))
+
+        if 'reparse' in stages:
+            conn = raw_connect(path, config)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, _ = timed(lambda: update_database(conn))
+            finally:
+                conn.close()
+            record('reparse', seconds, rows)
+
+        engine.dispose()
+        return {'rows': rows, 'config': config, 'stages': results,
+                'db_size_mb': {'after_insert': size_after_insert, 'final': file_size_mb(path)}}
+    finally:
+        engine.dispose()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def environment() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=30).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'pandas': pd.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def compare(base: dict, current: dict):
+    """按 (行数, 配置, 阶段) 对比两次结果的耗时"""
+    before = {(r['rows'], r['config'], stage): data['seconds']
+              for r in base['results'] for stage, data in r['stages'].items()}
+    print(f"\n{'=' * 70}\n对比 {base['environment'].get('commit')} -> {current['environment'].get('commit')}"
+          f"\n{'=' * 70}")
+    for r in current['results']:
+        for stage, data in r['stages'].items():
+            old = before.get((r['rows'], r['config'], stage))
+            if old is None:
+                continue
+            new = data['seconds']
+            print(f"  {r['rows']:>9,} {r['config']:<8} {stage:<16} {old:9.3f}s -> {new:9.3f}s "
+                  f"({old / max(new, 1e-6):.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='存储层基准（默认/调优SQLite设置）')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--configs', nargs='+', choices=CONFIGS, default=list(CONFIGS))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help='要测的阶段（insert总会执行）')
+    parser.add_argument('--repeat', type=int, default=3, help='读取类阶段重复次数（取最短）')
+    parser.add_argument('--output', help='结果JSON路径，默认 data/benchmarks/storage-<提交号>-<时间>.json')
+    parser.add_argument('--compare', help='与之前的结果JSON对比')
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'results': []}
+    for rows in args.rows:
+        for config in args.configs:
+            report['results'].append(run(rows, config, set(args.stages), args.repeat))
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(ROOT, 'data', 'benchmarks',
+                              f"storage-{report['environment']['commit'] or 'unknown'}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
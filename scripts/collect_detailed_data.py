@@ -8,12 +8,16 @@ import sys
 import time
 import re
 import random
+import argparse
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
 from scraper.scraper import SummoScraper
+from scraper.record_buffer import RecordBuffer
+from database.bulk import upsert_properties
+from database.aggregates import refresh_aggregates
 import pandas as pd
 
 # 目标数量
@@ -31,10 +35,11 @@ AREAS = [
 class DetailedDataCollector(SummoScraper):
     """收集详细物件数据 - 包括管理費、敷金、礼金、楼層、朝向"""
 
-    def __init__(self, target_count=TARGET_COUNT):
-        super().__init__(headless=False)
+    def __init__(self, target_count=TARGET_COUNT, profile_memory=False, write_db=False):
+        super().__init__(headless=False, profile_memory=profile_memory)
         self.target_count = target_count
-        self.all_data = []
+        self.write_db = write_db  # 同时写入主数据库
+        self.all_data = RecordBuffer()  # 列式保存，避免每行一个dict
         self.checkpoint_file = "data/detailed_properties_checkpoint.csv"
         self.output_file = "data/detailed_properties.csv"
 
@@ -238,7 +243,7 @@ class DetailedDataCollector(SummoScraper):
         if not self.all_data:
             return
 
-        df = pd.DataFrame(self.all_data)
+        df = self.all_data.to_dataframe()
         df.to_csv(self.checkpoint_file, index=False, encoding='utf-8-sig')
         print(f"    [检查点] 已保存 {len(df)} 件")
 
@@ -298,6 +303,7 @@ class DetailedDataCollector(SummoScraper):
 
             print(f"  本区总计: {area_collected} 件")
             self._save_checkpoint()
+            self._profile_checkpoint(area, rows=len(self.all_data))
 
         print(f"\n收集完成! 总计: {len(self.all_data)} 件")
 
@@ -307,7 +313,12 @@ class DetailedDataCollector(SummoScraper):
             print("无数据可保存")
             return
 
-        df = pd.DataFrame(self.all_data)
+        df = self.all_data.to_dataframe()
+        if self.write_db and self.session:
+            saved = upsert_properties(self.session, df)
+            print(f"\n已写入数据库: {saved} 件")
+            groups = refresh_aggregates(self.session.get_bind())
+            print(f"更新反響数汇总: {groups} 个分组")
 
         # 如果文件存在,追加并去重
         if os.path.exists(self.output_file):
@@ -332,11 +343,19 @@ class DetailedDataCollector(SummoScraper):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='收集物件数据')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='开启内存剖析，每个区域结束时报告内存增长最多的位置')
+    parser.add_argument('--db', action='store_true',
+                        help='除CSV外同时写入主数据库（按listing_key去重）')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("收集物件数据 (賃料, 管理費, 敷金, 礼金, 間取り, 築年等)")
     print("=" * 60)
 
-    collector = DetailedDataCollector(target_count=TARGET_COUNT)
+    collector = DetailedDataCollector(target_count=TARGET_COUNT, profile_memory=args.profile_memory,
+                                      write_db=args.db)
 
     try:
         collector.start()
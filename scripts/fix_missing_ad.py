@@ -8,7 +8,11 @@ import time
 import re
 import math
 import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 from dotenv import load_dotenv
 
 # 设置工作目录
@@ -177,9 +181,7 @@ def main():
         print(f'  - {p["reins_id"]}: 得分{p.get("score", "N/A")}, ¥{p["rent"]:,}, {p["railway"]}/{p["station"]}')
 
     playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context(viewport={'width': 1920, 'height': 1080}, locale='ja-JP')
-    page = context.new_page()
+    browser, context, page, attached = open_browser(playwright, 'suumo')
 
     print("\n启动浏览器...")
 
@@ -345,7 +347,7 @@ def main():
 
         time.sleep(2)
 
-    browser.close()
+    close_browser(browser, page, attached)
     playwright.stop()
     print('\n完成')
 
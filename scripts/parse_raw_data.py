@@ -1,10 +1,25 @@
 """
 从raw_data中重新解析并更新数据库中的缺失字段
 """
+import os
+import sys
 import re
-import sqlite3
+from datetime import datetime
+
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import connect_sqlite, iter_raw_data
+from database.fees import FEE_FIELDS, fill_fee_columns
+
+# parse_raw_data 可能返回的字段（update_database 只读取这些列比较是否为空）
+PARSED_FIELDS = ('railway_line', 'station', 'walk_minutes', 'property_type', 'deposit', 'key_money',
+                 'management_fee', 'structure', 'floor', 'total_floors', 'room_number', 'property_name')
+
+# update_database 每批处理的物件数（物件当前值和原始数据按批读取，内存与总行数无关）
+REPARSE_BATCH = 500
+
 def parse_raw_data(raw_text):
     """从原始文本中提取各字段"""
     data = {}
@@ -83,13 +98,18 @@ def parse_raw_data(raw_text):
     return data
 
 
-def update_database():
-    """更新数据库中的缺失字段"""
-    conn = sqlite3.connect('data/properties.db')
+def update_database(conn=None):
+    """
+    更新数据库中的缺失字段
+    Args:
+        conn: sqlite3连接，默认 connect_sqlite()（传入的连接提交后不关闭）
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_sqlite()
 
-    # 读取所有数据
-    df = pd.read_sql('SELECT * FROM properties', conn)
-    print(f"总记录数: {len(df)}")
+    total = conn.execute('SELECT COUNT(*) FROM properties').fetchone()[0]
+    print(f"总记录数: {total}")
 
     # 统计更新
     updates = {
@@ -105,36 +125,47 @@ def update_database():
     }
 
     cursor = conn.cursor()
-
-    for idx, row in df.iterrows():
-        raw_data = row['raw_data']
-        if not raw_data:
-            continue
-
-        parsed = parse_raw_data(raw_data)
-        if not parsed:
-            continue
-
-        # 构建UPDATE语句 - 只更新空值字段
-        update_fields = []
-        update_values = []
-
-        for field, value in parsed.items():
-            # 检查当前值是否为空
-            current_val = row.get(field)
-            if pd.isna(current_val) or current_val is None or current_val == '' or current_val == 0:
-                update_fields.append(f"{field} = ?")
-                update_values.append(value)
-                if field in updates:
-                    updates[field] += 1
-
-        if update_fields:
-            update_values.append(row['id'])
-            sql = f"UPDATE properties SET {', '.join(update_fields)} WHERE id = ?"
-            cursor.execute(sql, update_values)
+    now = datetime.now().isoformat(' ', timespec='microseconds')
+
+    # 原始数据在 property_raw 表中：按id分批读取当前值和原始数据，逐行解压
+    ids = [property_id for (property_id,) in conn.execute('SELECT property_id FROM property_raw ORDER BY property_id')]
+    for start in range(0, len(ids), REPARSE_BATCH):
+        batch = ids[start:start + REPARSE_BATCH]
+        df = pd.read_sql(
+            f"SELECT id, rent, {', '.join(PARSED_FIELDS)} FROM properties "
+            f"WHERE id IN ({','.join('?' * len(batch))})",
+            conn, params=batch, index_col='id'
+        )
+        for property_id, raw_data in iter_raw_data(conn, batch):
+            if not raw_data or property_id not in df.index:
+                continue
+            row = df.loc[property_id]
+
+            parsed = parse_raw_data(raw_data)
+            if not parsed:
+                continue
+
+            # 构建UPDATE语句 - 只更新空值字段
+            record = {}
+            for field, value in parsed.items():
+                # 检查当前值是否为空
+                current_val = row.get(field)
+                if pd.isna(current_val) or current_val is None or current_val == '' or current_val == 0:
+                    record[field] = value
+                    if field in updates:
+                        updates[field] += 1
+
+            if record:
+                # 敷金/礼金同时换算数值列（与入库时相同），更新时间使增量汇总/导出能感知变化
+                fill_fee_columns(record, source={**{f: record[f] for f in FEE_FIELDS if f in record},
+                                                 'rent': None if pd.isna(row.get('rent')) else row.get('rent')})
+                record['updated_at'] = now
+                sql = f"UPDATE properties SET {', '.join(f'{field} = ?' for field in record)} WHERE id = ?"
+                cursor.execute(sql, [*record.values(), property_id])
 
     conn.commit()
-    conn.close()
+    if own_conn:
+        conn.close()
 
     print("\n更新完成!")
     print("各字段更新数量:")
@@ -144,7 +175,7 @@ def update_database():
 
 def export_updated_csv():
     """导出更新后的数据为CSV"""
-    conn = sqlite3.connect('data/properties.db')
+    conn = connect_sqlite()
     df = pd.read_sql('SELECT * FROM properties', conn)
     conn.close()
 
@@ -16,6 +16,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
+from database.fees import fill_fee_columns
+from analysis.features import compute_features
 from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
@@ -89,20 +92,19 @@ class ReinsScraper:
         self.headless = headless
         self.browser = None
         self.page = None
+        self.attached = False
 
     def start(self):
+        """启动浏览器（常驻浏览器在运行时直接连接）"""
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=self.headless)
-        self.context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            locale='ja-JP',
+        self.browser, self.context, self.page, self.attached = open_browser(
+            self.playwright, 'reins', headless=self.headless
         )
-        self.page = self.context.new_page()
-        print("浏览器启动")
+        print("已连接常驻浏览器" if self.attached else "浏览器启动")
 
     def stop(self):
         if self.browser:
-            self.browser.close()
+            close_browser(self.browser, self.page, self.attached)
         if hasattr(self, 'playwright'):
             self.playwright.stop()
         print("浏览器关闭")
@@ -139,6 +141,11 @@ class ReinsScraper:
 
             print("登录成功")
             return True
+
+        # 常驻浏览器中已有登录会话时不会出现登录表单
+        if self.attached and not password_input:
+            print(f"已登录（常驻浏览器会话），当前URL: {self.page.url}")
+            return True
         return False
 
     def goto_bukken_search(self):
@@ -234,6 +241,9 @@ class ReinsScraper:
             if m:
                 data['key_money'] = float(m.group(1))
 
+            # 敷金/礼金换算为月数（与入库时相同的规则）
+            fill_fee_columns(data)
+
             return data
 
         except Exception as e:
@@ -312,6 +322,7 @@ class ReinsScraper:
                 m = re.search(r'礼金[：:\s]*(\d+(?:\.\d+)?)\s*[ヶヵ]?月?', text)
                 if m:
                     detail_data['key_money'] = m.group(1)
+                fill_fee_columns(detail_data)
 
                 # 提取建物构造
                 m = re.search(r'構造[：:\s]*([^\n\s]+)', text)
@@ -382,121 +393,28 @@ DIRECTION_MAP = {
 
 
 def prepare_features(data):
-    """准备模型特征 (V2 - 21个特征，与train_model_v2.py一致)"""
-    rent = data.get('rent', 80000)
-    area_sqm = data.get('area_sqm', 25)
-    built_year = data.get('built_year', 2010)
-    walk_minutes = data.get('walk_minutes', 10)
-    city = data.get('city', '')
-    floor_plan = data.get('floor_plan', '1K')
-    property_type = data.get('property_type', '')
-
-    # 费用相关特征
-    management_fee = data.get('management_fee', 0)
-    deposit = data.get('deposit', 1.0)
-    key_money = data.get('key_money', 1.0)
-
-    # 转换类型
-    if isinstance(deposit, str):
-        try:
-            deposit = float(deposit)
-        except:
-            deposit = 1.0
-    if isinstance(key_money, str):
-        try:
-            key_money = float(key_money)
-        except:
-            key_money = 1.0
-
-    # 派生特征
-    total_rent = rent + management_fee
-    rent_per_sqm = rent / area_sqm if area_sqm > 0 else 0
-    total_rent_per_sqm = total_rent / area_sqm if area_sqm > 0 else 0
-    age = 2026 - built_year
-
-    # 零礼金/零敷金标志
-    zero_deposit = 1 if deposit == 0 else 0
-    zero_key_money = 1 if key_money == 0 else 0
-
-    # 初期费用
-    initial_cost = deposit + key_money
-
-    # 区域热度三档
-    high_heat_areas = config.get('high_heat_areas', [])
-    mid_heat_areas = config.get('mid_heat_areas', [])
-
-    if city in high_heat_areas:
-        heat_level = 2
-    elif city in mid_heat_areas:
-        heat_level = 1
-    else:
-        heat_level = 0
-
-    # 徒步距离三档
-    if walk_minutes <= 5:
-        walk_level = 2
-    elif walk_minutes <= 10:
-        walk_level = 1
-    else:
-        walk_level = 0
-
-    # 户型三档
-    high_response_plans = config.get('high_response_plans', [])
-    mid_response_plans = config.get('mid_response_plans', [])
-
-    if floor_plan in high_response_plans:
-        plan_type = 2
-    elif floor_plan in mid_response_plans:
-        plan_type = 1
-    else:
-        plan_type = 0
-
-    # 建物类型编码
-    if 'マンション' in str(property_type):
-        building_type = 2
-    elif 'アパート' in str(property_type):
-        building_type = 1
-    else:
-        building_type = 0
-
-    # 租金等级
-    if rent < 60000:
-        rent_level = 0
-    elif rent < 80000:
-        rent_level = 1
-    elif rent < 100000:
-        rent_level = 2
-    elif rent < 150000:
-        rent_level = 3
-    else:
-        rent_level = 4
-
-    # 面积等级
-    if area_sqm < 20:
-        area_level = 0
-    elif area_sqm < 30:
-        area_level = 1
-    elif area_sqm < 50:
-        area_level = 2
-    else:
-        area_level = 3
-
-    # 区域编码
-    city_mapping = config.get('city_mapping', {})
-    city_encoded = city_mapping.get(city, 0)
-
-    # 特征列表 (21个特征 - V2模型格式)
-    # 顺序必须与model_config_v2.json中的feature_cols一致
-    features = [
-        rent, area_sqm, built_year, walk_minutes, management_fee,
-        total_rent, deposit, key_money, initial_cost,
-        zero_deposit, zero_key_money,
-        rent_per_sqm, total_rent_per_sqm, age,
-        city_encoded, heat_level, walk_level,
-        plan_type, building_type, rent_level, area_level
-    ]
-
-    return features
+    """准备模型特征 (V2 - 21个特征，与训练/特征表使用同一计算 analysis.features)"""
+    deposit = data.get('deposit_months')
+    key_money = data.get('key_money_months')
+    deposit = 1.0 if deposit is None else deposit
+    key_money = 1.0 if key_money is None else key_money
+    row = {
+        'rent': data.get('rent', 80000),
+        'area_sqm': data.get('area_sqm', 25),
+        'built_year': data.get('built_year', 2010),
+        'walk_minutes': data.get('walk_minutes', 10),
+        'management_fee': data.get('management_fee', 0),
+        # 敷金/礼金月数（抓取时由fill_fee_columns换算），缺失按1ヶ月
+        'deposit_months': deposit,
+        'key_money_months': key_money,
+        'zero_deposit': int(deposit == 0),
+        'zero_key_money': int(key_money == 0),
+        'area_name': data.get('city', ''),
+        'floor_plan': data.get('floor_plan', '1K'),
+        'property_type': data.get('property_type', ''),
+    }
+    # 顺序即 model_config_v2.json 中的 feature_cols
+    return compute_features(pd.DataFrame([row]), config).iloc[0].tolist()
 
 
 def predict_response(data):
@@ -605,14 +523,10 @@ def main():
                         update_props["建物_所在階"] = {"number": data['floor']}
                     if data.get('total_floors'):
                         update_props["建物_地上階層"] = {"number": data['total_floors']}
-                    if data.get('deposit'):
-                        # 敷金已经是月数
-                        deposit_val = float(data['deposit']) if isinstance(data['deposit'], str) else data['deposit']
-                        update_props["敷金(ヶ月)"] = {"number": deposit_val}
-                    if data.get('key_money'):
-                        # 礼金已经是月数
-                        key_money_val = float(data['key_money']) if isinstance(data['key_money'], str) else data['key_money']
-                        update_props["礼金(ヶ月)"] = {"number": key_money_val}
+                    if data.get('deposit_months'):
+                        update_props["敷金(ヶ月)"] = {"number": data['deposit_months']}
+                    if data.get('key_money_months'):
+                        update_props["礼金(ヶ月)"] = {"number": data['key_money_months']}
                     if data.get('direction'):
                         update_props["建物_バルコニー方向"] = {"rich_text": [{"text": {"content": data['direction']}}]}
 
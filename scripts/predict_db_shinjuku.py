@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 from dotenv import load_dotenv
 import numpy as np
 
@@ -108,9 +109,7 @@ def main():
     # 启动浏览器
     print("启动浏览器...")
     playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context(viewport={"width": 1920, "height": 1080}, locale="ja-JP")
-    page = context.new_page()
+    browser, context, page, attached = open_browser(playwright, 'reins')
 
     try:
         # 登录REINS
@@ -235,7 +234,7 @@ def main():
         print(f"\n完成! 成功更新 {success_count}/{len(bukken_list)} 个物件")
 
     finally:
-        browser.close()
+        close_browser(browser, page, attached)
         playwright.stop()
         print("浏览器关闭")
 
@@ -10,6 +10,7 @@ import re
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 from dotenv import load_dotenv
 import pandas as pd
 
@@ -25,22 +26,20 @@ class ReinsScraper:
         self.headless = headless
         self.browser = None
         self.page = None
+        self.attached = False
 
     def start(self):
-        """启动浏览器"""
+        """启动浏览器（常驻浏览器在运行时直接连接）"""
         self.playwright = sync_playwright().start()
-        self.browser = self.playwright.chromium.launch(headless=self.headless)
-        self.context = self.browser.new_context(
-            viewport={'width': 1920, 'height': 1080},
-            locale='ja-JP',
+        self.browser, self.context, self.page, self.attached = open_browser(
+            self.playwright, 'reins', headless=self.headless
         )
-        self.page = self.context.new_page()
-        print("浏览器启动")
+        print("已连接常驻浏览器" if self.attached else "浏览器启动")
 
     def stop(self):
         """关闭浏览器"""
         if self.browser:
-            self.browser.close()
+            close_browser(self.browser, self.page, self.attached)
         if hasattr(self, 'playwright'):
             self.playwright.stop()
         print("浏览器关闭")
@@ -81,6 +80,11 @@ class ReinsScraper:
 
             print(f"登录成功，当前URL: {self.page.url}")
             return True
+
+        # 常驻浏览器中已有登录会话时不会出现登录表单
+        if self.attached and not password_input:
+            print(f"已登录（常驻浏览器会话），当前URL: {self.page.url}")
+            return True
         return False
 
     def goto_bukken_search(self):
@@ -5,21 +5,26 @@ import os
 import sys
 import re
 import random
+import argparse
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from scraper.scraper import SummoScraper
+from scraper.record_buffer import RecordBuffer
+from database.bulk import upsert_properties
+from database.aggregates import refresh_aggregates
 import pandas as pd
 
 
 class MassScraper(SummoScraper):
     """大规模爬虫"""
 
-    def __init__(self, target_count=10000):
-        super().__init__(headless=False)
+    def __init__(self, target_count=10000, profile_memory=False, write_db=False):
+        super().__init__(headless=False, profile_memory=profile_memory)
         self.target_count = target_count
-        self.all_data = []
+        self.write_db = write_db  # 同时写入主数据库
+        self.all_data = RecordBuffer()  # 列式保存，避免每行一个dict
 
     def scrape_all(self):
         """爬取所有区域直到达到目标数量"""
@@ -63,6 +68,7 @@ class MassScraper(SummoScraper):
             area_data = self._scrape_area(area, per_area)
             self.all_data.extend(area_data)
             print(f"  本区获取: {len(area_data)}, 总计: {len(self.all_data)}")
+            self._profile_checkpoint(area, rows=len(self.all_data))
 
             # 每5个区保存一次（防止中断丢失数据）
             if (idx + 1) % 5 == 0:
@@ -186,7 +192,7 @@ class MassScraper(SummoScraper):
 
     def _save_checkpoint(self):
         """保存检查点（追加模式）"""
-        df_new = pd.DataFrame(self.all_data)
+        df_new = self.all_data.to_dataframe()
         checkpoint_path = 'data/mass_properties_checkpoint.csv'
 
         # 追加到现有检查点
@@ -201,7 +207,7 @@ class MassScraper(SummoScraper):
 
     def save(self):
         """保存最终数据（追加模式，不覆盖旧数据）"""
-        df_new = pd.DataFrame(self.all_data)
+        df_new = self.all_data.to_dataframe()
         output_path = 'data/mass_properties.csv'
 
         # 如果文件存在，追加数据
@@ -224,6 +230,15 @@ class MassScraper(SummoScraper):
         df_combined.to_csv(output_path, index=False, encoding='utf-8-sig')
         print(f"\n已保存到: {output_path}")
         print(f"本次新增: {len(df_new)} 条")
+        if self.write_db and self.session:
+            # 与主爬虫相同：不足1件/月（如0.5件/月）记为1，其余舍去小数（数据库列为整数）
+            rows = df_new.copy()
+            response = rows['estimated_response']
+            rows['estimated_response'] = response.where(~response.between(0, 1, inclusive='neither'), 1) // 1
+            saved = upsert_properties(self.session, rows)
+            print(f"已写入数据库: {saved} 条")
+            groups = refresh_aggregates(self.session.get_bind())
+            print(f"更新反響数汇总: {groups} 个分组")
         print(f"总记录数: {len(df_combined)} 条")
         print(f"\n反響数分布:")
         print(df_combined['estimated_response'].describe())
@@ -232,8 +247,15 @@ class MassScraper(SummoScraper):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='大规模爬取')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='开启内存剖析，每个区域结束时报告内存增长最多的位置')
+    parser.add_argument('--db', action='store_true',
+                        help='除CSV外同时写入主数据库（按listing_key去重）')
+    args = parser.parse_args()
+
     os.chdir(r"D:\Fango Ads")
-    scraper = MassScraper(target_count=10000)
+    scraper = MassScraper(target_count=10000, profile_memory=args.profile_memory, write_db=args.db)
 
     try:
         scraper.start()
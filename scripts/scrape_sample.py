@@ -1,5 +1,7 @@
 """
 抽样爬取 - 每个区随机爬取5%的物件用于分析
+分层抽样: 各区样本数按区内总数分配；区内按推定反響数降序排列后分段，
+每段（反響数档位）随机抽一页，直接跳页而不是逐页翻
 """
 import os
 import sys
@@ -9,10 +11,14 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from scraper.scraper import SummoScraper
+from scraper.scraper import SummoScraper, PAGE_SIZE
 import pandas as pd
 
 
+# 反響数档位（用于核对样本分布）
+RESPONSE_BANDS = [(0, 1, '<1'), (1, 3, '1-3'), (3, 5, '3-5'), (5, 10, '5-10'), (10, float('inf'), '10+')]
+
+
 class SampleScraper(SummoScraper):
     """抽样爬虫 - 每个区爬取5%样本"""
 
@@ -20,6 +26,7 @@ class SampleScraper(SummoScraper):
         super().__init__(headless=False)
         self.sample_ratio = sample_ratio
         self.all_data = []
+        self.page_loads = 0
 
     def scrape_all_areas_sample(self):
         """爬取所有区的5%样本"""
@@ -40,7 +47,10 @@ class SampleScraper(SummoScraper):
                 print(f"  无法进入，跳过")
                 continue
 
-            # 获取总数并计算抽样数
+            # 按反響数降序排列，使页码位置对应反響数档位
+            self.filter_by_response_count()
+
+            # 获取总数并计算抽样数（按区内总数比例分配）
             total = self._get_area_total()
             sample_count = max(10, int(total * self.sample_ratio))  # 最少10个
             print(f"  总数: {total}, 抽取: {sample_count}")
@@ -50,7 +60,7 @@ class SampleScraper(SummoScraper):
             self.all_data.extend(props)
             print(f"  实际获取: {len(props)}, 累计: {len(self.all_data)}")
 
-        print(f"\n爬取完成，共 {len(self.all_data)} 个物件")
+        print(f"\n爬取完成，共 {len(self.all_data)} 个物件，翻页/跳页 {self.page_loads} 次")
 
     def _get_area_total(self):
         """获取当前区的物件总数"""
@@ -65,39 +75,58 @@ class SampleScraper(SummoScraper):
                 continue
         return 200  # 默认值
 
+    def _plan_sample_pages(self, sample_count, total):
+        """
+        分层抽样计划
+        列表已按反響数降序，把所有页分成若干连续段（每段即一个反響数档位），
+        每段随机抽一页，并给出该页应抽取的件数
+        Returns:
+            [(页码, 抽取件数), ...]，页码升序
+        """
+        pages_total = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+        strata = min(pages_total, max(1, (sample_count + PAGE_SIZE - 1) // PAGE_SIZE + 1))
+
+        plan = []
+        remaining = sample_count
+        for i in range(strata):
+            first = i * pages_total // strata + 1
+            last = (i + 1) * pages_total // strata
+            quota = remaining // (strata - i)
+            remaining -= quota
+            plan.append((random.randint(first, last), quota))
+        return plan
+
     def _scrape_random_sample(self, area, sample_count, total):
-        """随机抽样爬取"""
+        """分层随机抽样爬取"""
         props = []
-        pages_total = (total + 49) // 50  # 总页数
-
-        if pages_total <= 1:
-            # 只有一页，直接爬
-            return self._scrape_page(area)
-
-        # 随机选择要爬的页码
-        pages_to_scrape = min(pages_total, (sample_count + 49) // 50 + 1)
-        selected_pages = sorted(random.sample(range(1, pages_total + 1),
-                                             min(pages_to_scrape, pages_total)))
+        plan = self._plan_sample_pages(sample_count, total)
+        print(f"  抽样页: {[p for p, _ in plan]}")
 
         current_page = 1
-        for target_page in selected_pages:
-            # 跳转到目标页
-            while current_page < target_page:
-                if self._has_next_page():
-                    self._goto_next_page()
-                    self._random_delay(1, 2)
-                    current_page += 1
-                else:
+        for target_page, quota in plan:
+            # 直接跳转到目标页
+            if target_page != current_page:
+                if not self._goto_page(target_page, current_page):
                     break
+                self.page_loads += 1
+                current_page = target_page
 
-            # 爬取当前页
+            # 在该页内随机抽取配额件数
             page_props = self._scrape_page(area)
+            if len(page_props) > quota:
+                page_props = random.sample(page_props, quota)
             props.extend(page_props)
 
-            if len(props) >= sample_count:
-                break
+        self._print_band_distribution(props)
+        return props
 
-        return props[:sample_count]
+    def _print_band_distribution(self, props):
+        """打印样本在各反響数档位的分布"""
+        counts = []
+        for low, high, label in RESPONSE_BANDS:
+            n = sum(1 for p in props if low <= p.get('estimated_response', 0) < high)
+            counts.append(f"{label}:{n}")
+        print(f"  反響数档位分布: {' '.join(counts)}")
 
     def _scrape_page(self, area):
         """爬取当前页所有物件"""
@@ -29,6 +29,7 @@ def log(msg):
         f.write(msg + '\n')
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 from dotenv import load_dotenv
 import requests
 
@@ -592,9 +593,7 @@ def main():
     # 启动浏览器
     log("\n启动浏览器...")
     playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context(viewport={"width": 1920, "height": 1080}, locale="ja-JP")
-    page = context.new_page()
+    browser, context, page, attached = open_browser(playwright, 'suumo')
 
     results = []
 
@@ -658,7 +657,7 @@ def main():
                 log("")
 
     finally:
-        browser.close()
+        close_browser(browser, page, attached)
         playwright.stop()
         log("浏览器关闭")
 
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
 from playwright.sync_api import sync_playwright
+from scraper.browser_daemon import open_browser, close_browser
 from dotenv import load_dotenv
 
 sys.stdout.reconfigure(line_buffering=True)
@@ -503,9 +504,7 @@ def main():
     # 启动浏览器
     print("\n启动浏览器...")
     playwright = sync_playwright().start()
-    browser = playwright.chromium.launch(headless=False)
-    context = browser.new_context(viewport={"width": 1920, "height": 1080}, locale="ja-JP")
-    page = context.new_page()
+    browser, context, page, attached = open_browser(playwright, 'suumo')
 
     results = []
 
@@ -544,7 +543,7 @@ def main():
                 print(f"  {r['reins_id']}: {rd.get('rank')}/{rd.get('total_properties')}{ad_str}")
 
     finally:
-        browser.close()
+        close_browser(browser, page, attached)
         playwright.stop()
         print("\n浏览器关闭")
 
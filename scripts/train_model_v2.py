@@ -6,7 +6,7 @@ import os
 import sys
 import json
 import pickle
-import sqlite3
+import argparse
 import pandas as pd
 import numpy as np
 from xgboost import XGBRegressor
@@ -16,167 +16,60 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.chdir(r"D:\Fango Ads")
 
-
-def load_training_data():
-    """从数据库加载训练数据"""
-    conn = sqlite3.connect('data/properties.db')
-
-    df = pd.read_sql('''
-        SELECT
-            rent, management_fee, deposit, key_money,
-            area_sqm, floor_plan, property_type,
-            built_year, railway_line, station, walk_minutes,
-            area_name, estimated_response
-        FROM properties
-        WHERE estimated_response IS NOT NULL
-          AND rent IS NOT NULL
-          AND area_sqm IS NOT NULL
-    ''', conn)
-
-    conn.close()
-
-    print(f"从数据库加载: {len(df)} 条")
-
-    # 添加city字段 (兼容旧配置)
-    df['city'] = df['area_name']
-
-    # 确保数值字段是数值类型
-    df['deposit'] = pd.to_numeric(df['deposit'], errors='coerce').fillna(1.0)
-    df['key_money'] = pd.to_numeric(df['key_money'], errors='coerce').fillna(1.0)
-    df['management_fee'] = pd.to_numeric(df['management_fee'], errors='coerce').fillna(0)
-
-    # 计算总租金 (賃料 + 管理費)
-    df['total_rent'] = df['rent'] + df['management_fee']
+from database.models import connect_sqlite
+from database.aggregates import apply_tiers, refresh_aggregates
+from analysis.features import FEATURE_COLUMNS, compute_features, feature_version, load_features, refresh_features
+
+# 训练用到的列
+TRAINING_COLUMNS = [
+    'rent', 'management_fee', 'deposit_months', 'key_money_months',
+    'zero_deposit', 'zero_key_money',
+    'area_sqm', 'floor_plan', 'property_type',
+    'built_year', 'railway_line', 'station', 'walk_minutes',
+    'area_name', 'estimated_response',
+]
+REQUIRED_COLUMNS = ['estimated_response', 'rent', 'area_sqm']
+
+
+def load_training_data(from_parquet=False):
+    """
+    加载训练数据
+    Args:
+        from_parquet: 从Parquet快照（python main.py export）按列读取，而不是查询数据库
+    """
+    if from_parquet:
+        from database.export import load_parquet
+
+        df = load_parquet(TRAINING_COLUMNS, not_null=REQUIRED_COLUMNS)
+        print(f"从Parquet快照加载: {len(df)} 条")
+    else:
+        conn = connect_sqlite()
+        df = pd.read_sql(f'''
+            SELECT {', '.join(TRAINING_COLUMNS)}
+            FROM properties
+            WHERE {' AND '.join(f'{col} IS NOT NULL' for col in REQUIRED_COLUMNS)}
+        ''', conn)
+        conn.close()
+        print(f"从数据库加载: {len(df)} 条")
 
     return df
 
 
 def prepare_features(df, config):
-    """准备模型特征"""
-    features = pd.DataFrame()
-
-    # 基础特征
-    features['rent'] = df['rent']
-    features['area_sqm'] = df['area_sqm']
-    features['built_year'] = df['built_year'].fillna(2000)
-    features['walk_minutes'] = df['walk_minutes'].fillna(10)
-
-    # 管理費
-    features['management_fee'] = df['management_fee'].fillna(0)
-
-    # 总租金
-    features['total_rent'] = df['total_rent']
-
-    # 计算派生特征
-    features['rent_per_sqm'] = features['rent'] / features['area_sqm'].replace(0, 1)
-    features['total_rent_per_sqm'] = features['total_rent'] / features['area_sqm'].replace(0, 1)
-    features['age'] = 2026 - features['built_year']
-
-    # 敷金/礼金处理 (可能是月数或金额)
-    # 如果值>100，认为是金额(円)，转换为月数
-    def normalize_deposit(val, rent):
-        if pd.isna(val):
-            return 1.0
-        if val > 100:  # 金额格式，转换为月数
-            return val / rent if rent > 0 else 1.0
-        return val  # 月数格式
-
-    features['deposit'] = df.apply(lambda r: normalize_deposit(r['deposit'], r['rent']), axis=1)
-    features['key_money'] = df.apply(lambda r: normalize_deposit(r['key_money'], r['rent']), axis=1)
-
-    # 是否零礼金/零敷金 (租客友好)
-    features['zero_deposit'] = (features['deposit'] == 0).astype(int)
-    features['zero_key_money'] = (features['key_money'] == 0).astype(int)
-
-    # 初期費用总额 (月数)
-    features['initial_cost'] = features['deposit'] + features['key_money']
-
-    # 区域热度编码
-    high_heat = config.get('high_heat_areas', [])
-    mid_heat = config.get('mid_heat_areas', [])
-
-    def get_heat_level(city):
-        if city in high_heat:
-            return 2
-        elif city in mid_heat:
-            return 1
-        return 0
-
-    features['heat_level'] = df['city'].fillna('').apply(get_heat_level)
-
-    # 徒步距离等级
-    def get_walk_level(w):
-        if pd.isna(w):
-            return 1
-        if w <= 5:
-            return 2
-        elif w <= 10:
-            return 1
-        return 0
-
-    features['walk_level'] = features['walk_minutes'].apply(get_walk_level)
-
-    # 户型等级
-    high_plans = config.get('high_response_plans', [])
-    mid_plans = config.get('mid_response_plans', [])
-
-    def get_plan_type(p):
-        if pd.isna(p):
-            return 0
-        if p in high_plans:
-            return 2
-        elif p in mid_plans:
-            return 1
-        return 0
-
-    features['plan_type'] = df['floor_plan'].apply(get_plan_type)
-
-    # 建物类型编码
-    def get_building_type(t):
-        if pd.isna(t):
-            return 0
-        if 'マンション' in str(t):
-            return 2
-        elif 'アパート' in str(t):
-            return 1
-        return 0
-
-    features['building_type'] = df['property_type'].apply(get_building_type)
-
-    # 租金等级
-    def get_rent_level(r):
-        if r < 60000:
-            return 0
-        elif r < 80000:
-            return 1
-        elif r < 100000:
-            return 2
-        elif r < 150000:
-            return 3
-        return 4
-
-    features['rent_level'] = features['rent'].apply(get_rent_level)
-
-    # 面积等级
-    def get_area_level(a):
-        if a < 20:
-            return 0
-        elif a < 30:
-            return 1
-        elif a < 50:
-            return 2
-        return 3
-
-    features['area_level'] = features['area_sqm'].apply(get_area_level)
-
-    # 城市编码
-    city_mapping = config.get('city_mapping', {})
-    features['city_encoded'] = df['city'].fillna('').apply(lambda x: city_mapping.get(x, 0))
-
-    return features
+    """准备模型特征（与特征表 property_features 的计算相同）"""
+    return compute_features(df, config)
 
 
 def main():
+    parser = argparse.ArgumentParser(description='训练推定反響数预测模型 V2')
+    parser.add_argument('--parquet', action='store_true',
+                        help='从Parquet快照读取训练数据（先运行 python main.py export）')
+    parser.add_argument('--recompute', action='store_true',
+                        help='不使用特征表，从原始列重新计算特征')
+    parser.add_argument('--static-tiers', action='store_true',
+                        help='使用 model_config.json 中的区域热度/户型列表，而不是反響数汇总表的分档')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("训练推定反響数预测模型 V2")
     print("=" * 60)
@@ -184,34 +77,35 @@ def main():
     # 加载配置
     with open('models/model_config.json', 'r', encoding='utf-8') as f:
         config = json.load(f)
+    if not args.static_tiers:
+        # 区域热度/户型分档取自汇总表，随 model_config_v2.json 一起保存，预测时使用相同的分档
+        refresh_aggregates()
+        config = apply_tiers(config)
+        print(f"高热度区域: {config.get('high_heat_areas')}")
+        print(f"高反響户型: {config.get('high_response_plans')}")
+
+    # 特征列表 (V2: 21个特征，顺序见 analysis.features.FEATURE_COLUMNS)
+    feature_cols = list(FEATURE_COLUMNS)
 
     # 加载数据
-    df = load_training_data()
-    print(f"总数据量: {len(df)}")
+    if args.parquet or args.recompute:
+        df = load_training_data(from_parquet=args.parquet)
+        features = prepare_features(df, config)
+        target = df['estimated_response']
+    else:
+        # 特征表：只重算新增/更新过的物件
+        refreshed = refresh_features(config)
+        print(f"特征版本 {feature_version(config)}: 重算 {refreshed} 个物件")
+        features = load_features(config, target='estimated_response', required=REQUIRED_COLUMNS)
+        target = features['estimated_response']
+        print(f"从特征表加载: {len(features)} 条")
+    print(f"总数据量: {len(target)}")
 
     # 数据统计
     print(f"\n目标变量分布:")
-    print(f"  min: {df['estimated_response'].min()}")
-    print(f"  max: {df['estimated_response'].max()}")
-    print(f"  mean: {df['estimated_response'].mean():.2f}")
-
-    # 准备特征
-    features = prepare_features(df, config)
-    target = df['estimated_response']
-
-    # 特征列表 (V2: 19个特征)
-    feature_cols = [
-        # 基础特征
-        'rent', 'area_sqm', 'built_year', 'walk_minutes', 'management_fee',
-        # 费用相关
-        'total_rent', 'deposit', 'key_money', 'initial_cost',
-        'zero_deposit', 'zero_key_money',
-        # 派生特征
-        'rent_per_sqm', 'total_rent_per_sqm', 'age',
-        # 分类编码
-        'city_encoded', 'heat_level', 'walk_level',
-        'plan_type', 'building_type', 'rent_level', 'area_level'
-    ]
+    print(f"  min: {target.min()}")
+    print(f"  max: {target.max()}")
+    print(f"  mean: {target.mean():.2f}")
 
     X = features[feature_cols]
     y = target
@@ -277,7 +171,7 @@ def main():
     config_v2['model_name'] = 'XGBoost Property Response Model V2'
     config_v2['version'] = '5.0'
     config_v2['feature_cols'] = feature_cols
-    config_v2['training_samples'] = len(df)
+    config_v2['training_samples'] = len(target)
     config_v2['metrics'] = {
         'regressor': {
             'train_mae': round(train_mae, 4),